@@ -2,7 +2,7 @@ import json
 from logging import getLogger
 from uuid import uuid4
 
-from fastapi import APIRouter, Request, Response, HTTPException, status, Depends
+from fastapi import APIRouter, Request, Response, HTTPException, status, Depends, Query, Header
 
 from app.api.endpoints import ValidateAndReturnUser
 from app.core.auth.user import User
@@ -14,9 +14,10 @@ from app.core.schemas.applications import (
     ApplicationRequest,
     ApplicationResponse,
 )
-from app.core.services.applications import filter_apps_not_authorized, fetch_applications
+from app.core.services.applications import fetch_applications, fetch_applications_page, iter_applications
 from app.core.services.namespaces import is_part_of_namespace_group
 from app.core.services.onboarder import ApplicationOnboarder
+from app.core.services.placements import update_application_placements
 from app.utils.common import init_common_model_attributes
 from app.utils.constants import (
     CREATE_APPLICATION_ROUTE_SUMMARY,
@@ -24,6 +25,8 @@ from app.utils.constants import (
     GET_APPLICATION_BY_ID_ROUTE_SUMMARY
 )
 from app.utils.enums import OnboardStatus
+from app.utils.projection import parse_fields
+from app.utils.streaming import accepts_ndjson, ndjson_response
 
 router = APIRouter()
 log = getLogger(__name__)
@@ -79,6 +82,8 @@ async def create_application(
         app = init_common_model_attributes(app, user)
         app.onboard_status = await ApplicationOnboarder(app, user).onboard()
         await app.save()
+        if settings.PLACEMENTS_ENABLED:
+            await update_application_placements(app)
         if app.onboard_status == OnboardStatus.FAILURE:
             response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return app
@@ -95,25 +100,42 @@ async def create_application(
     summary=GET_ALL_APPLICATIONS_ROUTE_SUMMARY,
     response_model_exclude_none=True,
 )
-async def get_applications(query: str = None, user: User = Depends(
-    ValidateAndReturnUser(expected_roles=[settings.READER_ROLE_NAME]))) -> ApplicationListResponse:
+async def get_applications(query: str = None,
+                           limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                           cursor: str = None, unpaginated: bool = False, accept: str = Header(None),
+                           fields: str = None, user: User = Depends(
+                               ValidateAndReturnUser(expected_roles=[settings.READER_ROLE_NAME]))) -> ApplicationListResponse:
     """
-    Returns all applications
+    Returns all applications, a page at a time
     Args:
         query: Query string to filter applications
+        limit: Maximum number of applications of the page
+        cursor: next_cursor of the previous page, none for the first page
+        unpaginated: Returns all applications at once, limit and cursor are ignored
+        accept: application/x-ndjson streams all applications, one per line, limit and cursor are ignored
+        fields: Comma separated fields of the applications to return, e.g. name,namespace,metadata.app_type, all
+            when none
         user: User object (validated by decorator ValidateAndReturnUser, reader role is checked in decorator)  
     Returns:
-        ApplicationListResponse: List of applications
+        ApplicationListResponse: List of applications, with the cursor of the next page
     """
     log.debug(
         f"Received GET request for all Applications  \
               with query params: ${query} "
     )
 
-    apps = await fetch_applications(query=query, user=user)
-
+    fields = parse_fields(fields)
+    if accepts_ndjson(accept):
+        return ndjson_response(iter_applications(query=query, user=user, fields=fields))
+    if unpaginated:
+        return ApplicationListResponse(
+            items=await fetch_applications(query=query, user=user, fields=fields),
+        )
+    apps, next_cursor = await fetch_applications_page(query=query, user=user, limit=limit, cursor=cursor,
+                                                      fields=fields)
     return ApplicationListResponse(
-        items=await filter_apps_not_authorized(user, apps),
+        items=apps,
+        next_cursor=next_cursor,
     )
 
 
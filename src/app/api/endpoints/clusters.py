@@ -3,7 +3,7 @@ from logging import getLogger
 from uuid import uuid4
 
 from beanie.odm.operators.find.comparison import In
-from fastapi import APIRouter, Request, Response, HTTPException, status, Depends
+from fastapi import APIRouter, Request, Response, HTTPException, status, Depends, Query, Header
 
 from app.api.endpoints import ValidateAndReturnUser
 from app.core.auth.user import User
@@ -14,7 +14,7 @@ from app.core.schemas.clusters import (
     ClusterRequest,
     ClusterResponse,
 )
-from app.core.services import clusters
+from app.core.services import clusters, placements
 from app.core.services.onboarder import ClusterOnboarder
 from app.utils.common import init_common_model_attributes
 from app.utils.constants import (
@@ -23,6 +23,8 @@ from app.utils.constants import (
     GET_CLUSTER_BY_ID_ROUTE_SUMMARY,
 )
 from app.utils.enums import OnboardStatus
+from app.utils.projection import parse_fields
+from app.utils.streaming import accepts_ndjson, ndjson_response
 
 router = APIRouter()
 
@@ -79,6 +81,8 @@ async def create_cluster(
         cluster_obj.onboard_status = await ClusterOnboarder(cluster_obj, user).onboard()
 
         await cluster_obj.save()
+        if settings.PLACEMENTS_ENABLED:
+            await placements.update_cluster_placements(cluster_obj)
         if cluster_obj.onboard_status == OnboardStatus.FAILURE:
             response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
 
@@ -95,22 +99,35 @@ async def create_cluster(
     response_model_exclude_none=True,
     summary=GET_ALL_CLUSTERS_ROUTE_SUMMARY,
 )
-async def get_clusters(query: str = None, user: User = Depends(ValidateAndReturnUser(expected_roles=[
-    settings.READER_ROLE_NAME]))) -> ClusterListResponse:
+async def get_clusters(query: str = None, limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                       cursor: str = None, unpaginated: bool = False, accept: str = Header(None),
+                       fields: str = None, user: User = Depends(ValidateAndReturnUser(expected_roles=[
+                           settings.READER_ROLE_NAME]))) -> ClusterListResponse:
     """
-    Returns all clusters
+    Returns all clusters, a page at a time
     Args:
         query: Query string
+        limit: Maximum number of clusters of the page
+        cursor: next_cursor of the previous page, none for the first page
+        unpaginated: Returns all clusters at once, limit and cursor are ignored
+        accept: application/x-ndjson streams all clusters, one per line, limit and cursor are ignored
+        fields: Comma separated fields of the clusters to return, e.g. name,environment,metadata.region, all when none
         user: User (expected role - reader)
     Returns:
-        ClusterListResponse: List of all clusters
+        ClusterListResponse: List of clusters, with the cursor of the next page
     """
     log.debug("Received GET request for all Clusters")
 
-    cluster_list = await clusters.fetch_clusters(query,
-                                                 In(Cluster.environment, await user.role_collection.get_environments()))
+    environment_filter = In(Cluster.environment, await user.role_collection.get_environments())
+    fields = parse_fields(fields)
+    if accepts_ndjson(accept):
+        return ndjson_response(clusters.iter_clusters(query, environment_filter, fields))
+    if unpaginated:
+        return ClusterListResponse(items=await clusters.fetch_clusters(query, environment_filter, fields=fields))
+    cluster_list, next_cursor = await clusters.fetch_clusters_page(query, limit, cursor, environment_filter, fields)
     return ClusterListResponse(
         items=cluster_list,
+        next_cursor=next_cursor,
     )
 
 
@@ -3,7 +3,7 @@ from logging import getLogger
 from uuid import uuid4
 
 from beanie.odm.operators.find.comparison import Eq
-from fastapi import APIRouter, Request, Response, HTTPException, status
+from fastapi import APIRouter, Request, Response, HTTPException, status, Query
 from fastapi.params import Depends
 
 from app.api.endpoints import ValidateAndReturnUser
@@ -15,7 +15,7 @@ from app.core.schemas.namespaces import (
     NamespaceRequest,
     NamespaceResponse,
 )
-from app.core.services.namespaces import get_all_namespaces
+from app.core.services.namespaces import get_all_namespaces, get_namespaces_page
 from app.utils.common import init_common_model_attributes
 from app.utils.constants import (
     CREATE_NAMESPACES_ROUTE_SUMMARY,
@@ -76,19 +76,27 @@ async def create_namespaces(
     summary=GET_ALL_NAMESPACES_ROUTE_SUMMARY,
 )
 async def get_namespaces(
+        limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE), cursor: str = None,
+        unpaginated: bool = False,
         user: User = Depends(
             ValidateAndReturnUser(expected_roles=[settings.READER_ROLE_NAME]))) -> NamespaceListResponse:
     """
-    Returns all Namespaces
+    Returns all Namespaces, a page at a time
     Args:
+        limit: Maximum number of Namespaces of the page
+        cursor: next_cursor of the previous page, none for the first page
+        unpaginated: Returns all Namespaces at once, limit and cursor are ignored
         user: User (expected role - reader)
     Returns:
-        NamespaceListResponse: List of all Namespaces
+        NamespaceListResponse: List of Namespaces, with the cursor of the next page
     """
     log.debug("Received GET request for all Namespaces")
-    namespaces = await get_all_namespaces(user)
+    if unpaginated:
+        return NamespaceListResponse(items=await get_all_namespaces(user))
+    namespaces, next_cursor = await get_namespaces_page(user, limit, cursor)
     return NamespaceListResponse(
         items=namespaces,
+        next_cursor=next_cursor,
     )
 
 
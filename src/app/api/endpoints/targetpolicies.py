@@ -12,7 +12,7 @@ from app.core.schemas.targetpolicies import (
     TargetPolicyRequest,
     TargetPolicyResponse,
 )
-from app.core.services import targetpolicies
+from app.core.services import targetpolicies, placements
 from app.core.services.onboarder import TargetPolicyOnboarder
 from app.core.services.targetpolicies import is_authorized_to_target
 from app.utils.common import init_common_model_attributes
@@ -70,6 +70,8 @@ async def create_target_policy(
         target_policy.onboard_status = await TargetPolicyOnboarder(target_policy, user).onboard()
         target_policy = init_common_model_attributes(target_policy, user)
         await target_policy.save()
+        if settings.PLACEMENTS_ENABLED:
+            await placements.update_target_policy_placements(target_policy)
         if target_policy.onboard_status == OnboardStatus.FAILURE:
             response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return target_policy
@@ -88,20 +90,29 @@ async def create_target_policy(
     response_model_exclude_none=True,
     summary=GET_ALL_TARGETPOLICY_ROUTE_SUMMARY,
 )
-async def get_target_policies(query: str = None, user: User = Depends(ValidateAndReturnUser(
-    expected_roles=[settings.CONTRIBUTOR_ROLE_NAME]))) -> TargetPolicyListResponse:
-    """Get TargetPolicies Based on query
+async def get_target_policies(query: str = None,
+                              limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                              cursor: str = None, unpaginated: bool = False,
+                              user: User = Depends(ValidateAndReturnUser(
+                                  expected_roles=[settings.CONTRIBUTOR_ROLE_NAME]))) -> TargetPolicyListResponse:
+    """Get TargetPolicies Based on query, a page at a time
     Args:
         query (str, optional): Query to filter TargetPolicies. Defaults to None.
+        limit (int, optional): Maximum number of TargetPolicies of the page. Defaults to settings.PAGE_SIZE.
+        cursor (str, optional): next_cursor of the previous page, none for the first page.
+        unpaginated (bool, optional): Returns all TargetPolicies at once, limit and cursor are ignored.
         user (User, optional): user (expected role - contributor)
     Returns:
-        TargetPolicyListResponse: List of TargetPolicies        
+        TargetPolicyListResponse: List of TargetPolicies, with the cursor of the next page
     """
     log.debug("Received GET request for all TargetPolicies")
-    target_policies = await targetpolicies.fetch_target_policies(query=query)
+    if unpaginated:
+        return TargetPolicyListResponse(items=await targetpolicies.fetch_target_policies(query=query))
+    target_policies, next_cursor = await targetpolicies.fetch_target_policies_page(limit, cursor, query=query)
 
     return TargetPolicyListResponse(
         items=target_policies,
+        next_cursor=next_cursor,
     )
 
 @router.get(
@@ -7,7 +7,10 @@ from starlette.middleware import Middleware
 
 from app.api.api import api_router
 from app.core.config import get_settings
-from app.core.models.models import init_odm, init_env_cache
+from app.core.migrations import backfill_labels, backfill_namespace_groups
+from app.core.models.models import init_odm, init_env_cache, init_label_index
+from app.core.services.placements import init_placements
+from app.core.services.template import compile_templates, shutdown_render_pool
 from app.utils.exceptions import add_exception_handler
 from app.utils.instrumentation_utils import configure_instrumentation, TraceIdInjectionMiddleware
 
@@ -45,8 +48,29 @@ async def startup_event():
     log.info("Starting the Application Up.")
     log.info("Establishing connection with Cosmos DB.")
     await init_odm(settings=settings)
+    # Admins are authorized on namespaces by their environments, which older namespaces lack
+    log.info("Backfilling namespace environments")
+    await backfill_namespace_groups()
+    if settings.LABEL_QUERIES_ENABLED:
+        log.info("Backfilling labels")
+        await backfill_labels()
     log.info("Populating environment cache")
     await init_env_cache()
+    if settings.LABEL_INDEX_ENABLED:
+        log.info("Building label index")
+        await init_label_index()
+    if settings.PLACEMENTS_ENABLED:
+        log.info("Initializing placements")
+        await init_placements()
+    log.info("Compiling manifest templates")
+    compile_templates()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    log = getLogger(__name__)
+    log.info("Stopping manifest render processes")
+    shutdown_render_pool()
 
 
 app.include_router(api_router, prefix=settings.VERSION)
@@ -1,5 +1,6 @@
+import tempfile
 from functools import lru_cache
-from os import environ
+from os import environ, path
 from typing import Optional
 
 from pydantic import BaseSettings
@@ -16,6 +17,26 @@ class settings(BaseSettings):
     AZURE_COSMOS_DATABASE_NAME: str = ""
     APPLICATIONINSIGHTS_CONNECTION_STRING: Optional[str] = None
     ARGOCD_MASTER_APPLICATION_REPO_URL: str = "https://dev.azure.com/contoso/_git/plat_manifests"
+    GIT_WARM_CLONE_ENABLED: bool = True  # keep one working copy per process and refresh it instead of cloning per request
+    GIT_WARM_CLONE_DIRECTORY: str = path.join(tempfile.gettempdir(), "plat-manifests-warm-clone")
+    GIT_COMMIT_COALESCE_WINDOW_SECONDS: float = 0.2  # manifest changes arriving within the window share one commit
+    GIT_COMMIT_COALESCE_MAX_CHANGES: int = 50
+    GIT_PUSH_ATTEMPTS: int = 3
+    GIT_EXECUTOR_MAX_WORKERS: int = 4  # threads running blocking git calls off the event loop
+    GIT_SPARSE_CHECKOUT_ENABLED: bool = False  # partial clone + sparse checkout of only the clusters being changed
+    MANIFEST_SINK: str = "filesystem"  # "git" writes manifests straight into git objects, without a working tree
+    TEMPLATE_TYPE: str = "jinja"  # "native" emits the ArgoCD Application manifest without jinja
+    MANIFEST_RENDER_PROCESSES: int = 0  # >0 renders the manifests of different clusters in parallel processes
+    LABEL_INDEX_ENABLED: bool = False  # match selectors and policies in memory, only safe when a single process writes to the database
+    PLACEMENTS_ENABLED: bool = False  # keep the app x cluster placement collection and read effective target policies from it
+    LABEL_QUERIES_ENABLED: bool = False  # query metadata and selectors through the indexed labels arrays, backfilled at startup
+    SELECTOR_ENGINE: str = "python"  # "numpy" evaluates the selectors and purge policies of a deployment as vectorized masks
+    PAGE_SIZE: int = 100  # items per page of the list endpoints, unless they are called with unpaginated=true
+    MAX_PAGE_SIZE: int = 1000
+    STREAM_BATCH_SIZE: int = 500  # documents read from the cursor and written per chunk of the NDJSON list responses
+    NAMESPACE_AUTHORIZATION_CACHE_TTL_SECONDS: float = 60  # 0 disables the cache of namespace authorization decisions
+    NAMESPACE_AUTHORIZATION_CACHE_SIZE: int = 10000
+    TEMPLATE_BYTECODE_CACHE_DIRECTORY: str = path.join(tempfile.gettempdir(), "plat-jinja-bytecode-cache")
     OTEL_SERVICE_NAME: str = "Control Plane API"  # https://github.com/microsoft/ApplicationInsights-Python/tree/main/azure-monitor-opentelemetry
     CONSOLE_LOG_LEVEL: str = "INFO"  # has to be caps
     OTEL_PYTHON_LOG_LEVEL: str = "INFO"  # https://opentelemetry-python-contrib.readthedocs.io/en/latest/instrumentation/logging/logging.html
@@ -0,0 +1,71 @@
+"""One-time data migrations. They are idempotent, only documents still missing the migrated fields are touched, so
+they run at startup, backfill_labels only when label queries are enabled. To run them by hand:
+python -m app.core.migrations"""
+import asyncio
+from logging import getLogger
+
+from pymongo import UpdateOne
+
+from app.core.config import get_settings
+from app.core.models.applications import Application
+from app.core.models.clusters import Cluster
+from app.core.models.namespaces import Namespace
+from app.core.models.targetpolicies import TargetPolicy
+from app.utils.common import labels_of, group_fields
+
+log = getLogger(__name__)
+
+settings = get_settings()
+
+BATCH_SIZE = 1000
+
+# Labels array to fill from each label map, per model
+_LABELS_BY_MODEL = {Cluster: {"labels": "metadata"},
+                    Application: {"labels": "metadata"},
+                    TargetPolicy: {"app_selector_labels": "app_selector", "cluster_selector_labels": "cluster_selector"}}
+
+
+async def _backfill(model, fields: list[str], source_fields: list[str], derive):
+    """Sets the fields derived from the source fields, with derive, on the documents missing one of the fields"""
+    collection = model.get_motor_collection()
+    missing = {"$or": [{field: {"$exists": False}} for field in fields]}
+    requests = []
+    updated = 0
+    async for document in collection.find(missing, projection=source_fields):
+        requests.append(UpdateOne({"_id": document["_id"]}, {"$set": derive(document)}))
+        if len(requests) == BATCH_SIZE:
+            await collection.bulk_write(requests, ordered=False)
+            updated += len(requests)
+            requests = []
+    if requests:
+        await collection.bulk_write(requests, ordered=False)
+        updated += len(requests)
+    log.info(f"Backfilled {', '.join(fields)} of {updated} {model.__name__} documents")
+
+
+async def backfill_labels():
+    """Fills the labels arrays of the documents saved before they existed"""
+    for model, labels_fields in _LABELS_BY_MODEL.items():
+        await _backfill(model, list(labels_fields), list(labels_fields.values()), lambda document: {
+            labels_field: labels_of(document.get(label_map)) for labels_field, label_map in labels_fields.items()})
+
+
+async def backfill_namespace_groups():
+    """Fills the environments of the namespaces saved before they existed"""
+    await _backfill(Namespace, ["environments"], ["group"],
+                    lambda document: group_fields(document.get("group")))
+
+
+async def migrate():
+    await backfill_labels()
+    await backfill_namespace_groups()
+
+
+if __name__ == "__main__":
+    from app.core.models.models import init_odm
+
+    async def main():
+        await init_odm(settings=settings)
+        await migrate()
+
+    asyncio.run(main())
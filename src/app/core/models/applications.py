@@ -1,10 +1,14 @@
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from beanie import Document
+import pymongo
+from beanie import Document, after_event, before_event, Insert, Replace
 from pydantic import Field
 
+from app.utils.common import labels_of
+
 from app.utils.enums import OnboardStatus
+from app.utils.label_index import application_label_index
 
 
 class Application(Document):
@@ -31,7 +35,21 @@ class Application(Document):
     )
     namespace: str = Field(None, description="The namespace for the application")
     onboard_status: OnboardStatus = Field(None, description="Onboarding status of application")
+    labels: List[str] = Field(default_factory=list, description="The metadata as key=value strings")
+
+    class Settings:
+        indexes = [pymongo.IndexModel([("name", pymongo.ASCENDING), ("onboard_status", pymongo.ASCENDING)]),
+                   pymongo.IndexModel([("namespace", pymongo.ASCENDING)]),
+                   pymongo.IndexModel([("labels", pymongo.ASCENDING)])]
 
     def __hash__(self):
         # Include the relevant attributes in the hash calculation
         return hash(self.name)
+
+    @before_event(Insert, Replace)
+    async def sync_labels(self):
+        self.labels = labels_of(self.metadata)
+
+    @after_event(Insert, Replace)
+    async def update_label_index(self):
+        application_label_index.add(self)
@@ -1,10 +1,12 @@
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from beanie import Document, after_event, Insert, Replace
+import pymongo
+from beanie import Document, after_event, before_event, Insert, Replace
 from pydantic import Field
 
-from app.utils.common import popualate_env_cache
+from app.utils.common import popualate_env_cache, labels_of
+from app.utils.label_index import cluster_label_index
 from app.utils.enums import OnboardStatus
 
 
@@ -26,7 +28,21 @@ class Cluster(Document):
         None, description="The metadata for the cluster"
     )
     onboard_status: OnboardStatus = Field(None, description="Onboarding status of cluster")
+    labels: List[str] = Field(default_factory=list, description="The metadata as key=value strings")
+
+    class Settings:
+        indexes = [pymongo.IndexModel([("name", pymongo.ASCENDING), ("onboard_status", pymongo.ASCENDING)]),
+                   pymongo.IndexModel([("environment", pymongo.ASCENDING)]),
+                   pymongo.IndexModel([("labels", pymongo.ASCENDING)])]
+
+    @before_event(Insert, Replace)
+    async def sync_labels(self):
+        self.labels = labels_of(self.metadata)
 
     @after_event(Insert, Replace)
     async def populate_env_cache(self):
         await popualate_env_cache([self.environment])
+
+    @after_event(Insert, Replace)
+    async def update_label_index(self):
+        cluster_label_index.add(self)
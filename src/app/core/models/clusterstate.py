@@ -1,29 +1,30 @@
 import time
-from typing import List, Optional
-from uuid import uuid4
+from typing import Dict, List, Optional
 
+import pymongo
 from beanie import Document
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 from app.core.schemas.applications import ApplicationResponse
 from app.core.schemas.clusters import ClusterResponse
 
 
+class ManifestDigest(BaseModel):
+    input: str = Field(description="Digest of the template name and render data the manifest was rendered from")
+    blob: str = Field(description="Git blob id of the rendered manifest")
+
+
 class ClusterState(Document):
     id: Optional[str] = Field(
         None, description="The unique identifier of the Deployment", alias="_id"
     )
     cluster: ClusterResponse = Field(ClusterResponse, description="Cluster details")
     applications: List[ApplicationResponse] = Field(ApplicationResponse, description="List of Application objects")
+    manifest_digests: Dict[str, ManifestDigest] = Field(default_factory=dict,
+                                                        description="Digests of the generated manifests by path "
+                                                                    "relative to the cluster directory")
     createdOn: Optional[float] = Field(time.time(), description="created date epoch")
     ModifiedOn: Optional[float] = Field(time.time(), description="created date epoch")
 
-    @staticmethod
-    async def upsert_cluster_state(cluster_id: str, cluster: ClusterResponse, applications: List[ApplicationResponse]):
-        cluster_state_obj = await ClusterState.find_one(ClusterState.cluster._id == cluster_id)
-        if not cluster_state_obj:
-            cluster_state_obj = ClusterState(
-                id=str(uuid4()), cluster=cluster)
-        cluster_state_obj.applications = applications if applications is not None else cluster_state_obj.applications
-        cluster_state_obj.cluster = cluster if cluster is not None else cluster_state_obj.cluster
-        return await cluster_state_obj.save()
+    class Settings:
+        indexes = [pymongo.IndexModel([("cluster._id", pymongo.ASCENDING)], unique=True)]
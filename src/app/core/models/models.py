@@ -1,20 +1,29 @@
-from typing import List
+from contextlib import contextmanager
+from logging import getLogger
+from typing import Dict, List
 
 import motor
 from beanie import init_beanie
+from pymongo.errors import OperationFailure
 
 from .applications import Application
 from .clusters import Cluster
 from .clusterstate import ClusterState
 from .deployment import Deployment
 from .namespaces import Namespace
+from .placements import Placement
 from .targetpolicies import TargetPolicy
 
 __beanie_models__ = {"application": Application, "cluster": Cluster, "namespace": Namespace,
-                     "targetpolicy": TargetPolicy, "deployment": Deployment, "clusterstate": ClusterState
+                     "targetpolicy": TargetPolicy, "deployment": Deployment, "clusterstate": ClusterState,
+                     "placement": Placement
                     }
 
 from ...utils.common import popualate_env_cache
+from ...utils.label_index import cluster_label_index, application_label_index, target_policy_index
+
+
+log = getLogger(__name__)
 
 
 def get_model(name: str):
@@ -25,11 +34,61 @@ async def init_odm(settings):
     client = motor.motor_asyncio.AsyncIOMotorClient(
         settings.AZURE_COSMOS_CONNECTION_STRING
     )
+    database = client[settings.AZURE_COSMOS_DATABASE_NAME]
 
-    await init_beanie(
-        database=client[settings.AZURE_COSMOS_DATABASE_NAME],
-        document_models=__beanie_models__.values(),
-    )
+    indexes = await reconcile_indexes(database)
+    with _model_indexes(indexes):
+        await init_beanie(
+            database=database,
+            document_models=__beanie_models__.values(),
+        )
+
+
+async def reconcile_indexes(database) -> Dict[type, list]:
+    """Creates the indexes declared in the Settings of the models that are missing, one by one. An index that can't be
+    created, e.g. a unique one over duplicate data, is logged and left out of the indexes returned per model, so that
+    init_beanie can be given only the indexes that exist. Indexes of the collections that no model declares are
+    logged, they are candidates for dropping"""
+    indexes = {}
+    for model in __beanie_models__.values():
+        model_settings = getattr(model, "Settings", None)
+        declared = getattr(model_settings, "indexes", None) or []
+        collection = database[getattr(model_settings, "name", None) or model.__name__]
+        existing = await collection.index_information()
+        created = []
+        indexes[model] = []
+        for index in declared:
+            index_name = index.document["name"]
+            if index_name not in existing:
+                try:
+                    await collection.create_indexes([index])
+                    created.append(index_name)
+                except OperationFailure as ex:
+                    log.error(f"Unable to create index {index_name} of {collection.name}: {ex}")
+                    continue
+            indexes[model].append(index)
+        if created:
+            log.info(f"Created indexes {created} of {collection.name}")
+        undeclared = set(existing) - {"_id_"} - {index.document["name"] for index in declared}
+        if undeclared:
+            log.warning(f"Indexes {sorted(undeclared)} of {collection.name} are not declared by {model.__name__}, "
+                        f"drop them if they are unused")
+    return indexes
+
+
+@contextmanager
+def _model_indexes(indexes: Dict[type, list]):
+    """init_beanie reads the indexes from the Settings of the models, the given ones are set there while it runs and
+    the declared ones are put back afterwards"""
+    declared = {model: model.Settings.indexes for model in indexes
+                if "indexes" in getattr(getattr(model, "Settings", None), "__dict__", {})}
+    try:
+        for model in declared:
+            model.Settings.indexes = indexes[model]
+        yield
+    finally:
+        for model, model_indexes in declared.items():
+            model.Settings.indexes = model_indexes
 
 
 async def init_env_cache(env: List[str] = None):
@@ -37,3 +96,9 @@ async def init_env_cache(env: List[str] = None):
     await popualate_env_cache(env)
     groups_envs = await Namespace.distinct("group")
     await popualate_env_cache([groups_env.split("-")[-1] for groups_env in groups_envs])
+
+
+async def init_label_index():
+    cluster_label_index.build(await Cluster.find_all().to_list())
+    application_label_index.build(await Application.find_all().to_list())
+    target_policy_index.build(await TargetPolicy.find_all().to_list())
@@ -1,10 +1,12 @@
 import time
 from typing import Optional, List
 
-from beanie import Document, after_event, Insert, Replace
+import pymongo
+from beanie import Document, after_event, before_event, Insert, Replace
 from pydantic import Field
 
-from app.utils.common import popualate_env_cache
+from app.utils.authorization_cache import clear_namespace_authorization_caches
+from app.utils.common import popualate_env_cache, group_fields
 
 
 class Namespace(Document):
@@ -21,6 +23,7 @@ class Namespace(Document):
         description="Group name of the team owning this namespace. The contributors need to be "
                     "added to group name-contributors and readers to be added to group name-reader"
     )
+    environments: List[str] = Field(default_factory=list, description="Environments of the groups, derived from group")
     created_by: Optional[str] = Field(
         None, description="details of user who created the namespace"
     )
@@ -30,6 +33,19 @@ class Namespace(Document):
     created_on: Optional[float] = Field(time.time(), description="created date epoch")
     updated_on: Optional[float] = Field(time.time(), description="updated date epoch")
 
+    class Settings:
+        indexes = [pymongo.IndexModel([("name", pymongo.ASCENDING)], unique=True),
+                   pymongo.IndexModel([("group", pymongo.ASCENDING)]),
+                   pymongo.IndexModel([("environments", pymongo.ASCENDING)])]
+
+    @before_event(Insert, Replace)
+    async def sync_group_fields(self):
+        self.environments = group_fields(self.group)["environments"]
+
     @after_event(Insert, Replace)
     async def populate_env_cache(self):
         await popualate_env_cache([group.split("-")[-1] for group in self.group])
+
+    @after_event(Insert, Replace)
+    async def invalidate_authorization_cache(self):
+        clear_namespace_authorization_caches()
@@ -0,0 +1,31 @@
+import time
+from typing import List, Optional
+
+import pymongo
+from beanie import Document
+from pydantic import Field
+
+from app.core.schemas.targetpolicies import TargetPolicyResponse
+
+
+class Placement(Document):
+    """Target policies placing an application on a cluster, kept up to date when clusters, applications and target
+    policies are onboarded. Application and cluster names are the name labels of their metadata"""
+    id: Optional[str] = Field(None, description="application_id:cluster_id", alias="_id")
+    application_id: str = Field(None, description="Id of the application")
+    application_name: Optional[str] = Field(None, description="Name label of the application")
+    namespace: Optional[str] = Field(None, description="Namespace of the application")
+    cluster_id: str = Field(None, description="Id of the cluster")
+    cluster_name: Optional[str] = Field(None, description="Name label of the cluster")
+    environment: Optional[str] = Field(None, description="Environment of the cluster")
+    target_policy_ids: List[str] = Field(default_factory=list,
+                                         description="Ids of all target policies placing the application on the cluster")
+    target_policy: TargetPolicyResponse = Field(None, description="The most recently updated of the target policies")
+    updated_on: Optional[float] = Field(time.time(), description="updated date epoch")
+
+    class Settings:
+        indexes = [
+            pymongo.IndexModel([("application_name", pymongo.ASCENDING), ("cluster_name", pymongo.ASCENDING)]),
+            pymongo.IndexModel([("application_id", pymongo.ASCENDING)]),
+            pymongo.IndexModel([("cluster_id", pymongo.ASCENDING)]),
+        ]
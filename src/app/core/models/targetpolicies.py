@@ -1,10 +1,13 @@
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from beanie import Document
+import pymongo
+from beanie import Document, after_event, before_event, Insert, Replace
 from pydantic import Field
 
+from app.utils.common import labels_of
 from app.utils.enums import OnboardStatus, Operation
+from app.utils.label_index import target_policy_index
 
 
 class TargetPolicy(Document):
@@ -38,7 +41,24 @@ class TargetPolicy(Document):
     operation: Operation = Field(None, description="Target policy operation. It could be either create "
                                                                 "or purge")
 
+    app_selector_labels: List[str] = Field(default_factory=list, description="The app selector as key=value strings")
+    cluster_selector_labels: List[str] = Field(default_factory=list,
+                                               description="The cluster selector as key=value strings")
+
+    class Settings:
+        indexes = [pymongo.IndexModel([("app_selector_labels", pymongo.ASCENDING)]),
+                   pymongo.IndexModel([("cluster_selector_labels", pymongo.ASCENDING)])]
+
     def __hash__(self):
         return hash((
             self.name
         ))
+
+    @before_event(Insert, Replace)
+    async def sync_labels(self):
+        self.app_selector_labels = labels_of(self.app_selector)
+        self.cluster_selector_labels = labels_of(self.cluster_selector)
+
+    @after_event(Insert, Replace)
+    async def update_policy_index(self):
+        target_policy_index.add(self)
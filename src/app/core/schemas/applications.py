@@ -75,3 +75,6 @@ class ApplicationListResponse(BaseModel):
     items: Optional[List[ApplicationResponse]] = Field(
         None, description="The list of Applications"
     )
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor of the next page, none on the last page"
+    )
@@ -67,3 +67,6 @@ class ClusterListResponse(BaseModel):
     items: Optional[List[ClusterResponse]] = Field(
         None, description="The list of Clusters"
     )
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor of the next page, none on the last page"
+    )
@@ -66,3 +66,6 @@ class NamespaceListResponse(BaseModel):
     items: Optional[List[NamespaceResponse]] = Field(
         None, description="The list of Namespaces"
     )
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor of the next page, none on the last page"
+    )
@@ -79,3 +79,6 @@ class TargetPolicyListResponse(BaseModel):
     items: Optional[List[TargetPolicyResponse]] = Field(
         None, description="The list of DataStreams"
     )
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor of the next page, none on the last page"
+    )
@@ -2,30 +2,85 @@ from logging import getLogger
 from typing import List
 
 from app.core.auth.user import User
+from app.core.config import get_settings
 from app.core.models.applications import Application
-from app.core.services.namespaces import get_authorized_namespace_by_names
-from app.utils.common import create_filter_condition, dict_to_query_string
+from app.core.models.namespaces import Namespace
+from app.core.schemas.applications import ApplicationResponse
+from app.core.services.namespaces import get_authorized_namespace_by_names, authorized_namespace_condition
+from app.utils.common import create_filter_condition, dict_to_query_string, selectors_filter_condition, \
+    matches_selector
 from app.utils.enums import OnboardStatus
+from app.utils.label_index import application_label_index
+from app.utils.pagination import aggregate_page
+from app.utils.projection import projection_model
+from app.utils.streaming import batched
 
 log = getLogger(__name__)
 
+settings = get_settings()
 
-# TODO: Never return unauthorized apps. Is there way to add this everywhere
-async def fetch_applications(query, user, filter_failed=True):
-    """Fetch Applications from the database based on the query"""
+
+async def fetch_applications(query, user, filter_failed=True, fields=None):
+    """Fetch the Applications the user is authorized on from the database based on the query, or only their fields
+    when given, see projection_model"""
     log.info(f"Fetching Applications with query: {query}")
 
-    if filter_failed:
-        app = await Application.find(
-            create_filter_condition(query_params=query), Application.onboard_status != OnboardStatus.FAILURE
-        ).to_list()
-    else:
-        app = await Application.find(
-            create_filter_condition(query_params=query)
-        ).to_list()
+    authorization_stages = _authorization_stages(user)
+    if authorization_stages is None:
+        return []
+    app = await _find_applications(query, filter_failed).aggregate(
+        authorization_stages, projection_model=_projection_model(fields)).to_list()
 
     log.info(f"Found {len(app)} Applications, value: {app}")
-    return await filter_apps_not_authorized(user, app)
+    return app
+
+
+async def fetch_applications_page(query, user, limit: int, cursor: str = None, fields=None):
+    """Page of fetch_applications, see aggregate_page"""
+    log.info(f"Fetching {limit} Applications with query: {query} after cursor: {cursor}")
+    authorization_stages = _authorization_stages(user)
+    if authorization_stages is None:
+        return [], None
+    apps, next_cursor = await aggregate_page(_find_applications(query), authorization_stages, limit, cursor,
+                                             projection_model=_projection_model(fields))
+    log.info(f"Found {len(apps)} Applications, next cursor: {next_cursor}")
+    return apps, next_cursor
+
+
+async def iter_applications(query, user, fields=None):
+    """Applications of fetch_applications as ApplicationResponses, read from the cursor and yielded
+    STREAM_BATCH_SIZE at a time"""
+    log.info(f"Streaming Applications with query: {query}")
+    authorization_stages = _authorization_stages(user)
+    if authorization_stages is None:
+        return
+    async for apps in batched(_find_applications(query).aggregate(
+            authorization_stages, projection_model=_projection_model(fields, ApplicationResponse),
+            batchSize=settings.STREAM_BATCH_SIZE), settings.STREAM_BATCH_SIZE):
+        yield apps
+
+
+def _find_applications(query, filter_failed=True):
+    if filter_failed:
+        return Application.find(create_filter_condition(query_params=query),
+                                Application.onboard_status != OnboardStatus.FAILURE)
+    return Application.find(create_filter_condition(query_params=query))
+
+
+def _authorization_stages(user: User):
+    """Aggregation stages keeping the applications whose namespace the user is authorized on, so that the others
+    never leave the database. None when the user is authorized on no namespace"""
+    namespace_condition = authorized_namespace_condition(user)
+    if namespace_condition is None:
+        return None
+    return [{"$lookup": {"from": Namespace.get_motor_collection().name, "localField": "namespace",
+                         "foreignField": "name", "as": "_namespaces"}},
+            {"$match": {"_namespaces": {"$elemMatch": namespace_condition}}}]
+
+
+def _projection_model(fields, default=Application):
+    # The projection also drops the _namespaces looked up by the authorization stages
+    return projection_model(ApplicationResponse, fields) if fields else default
 
 
 async def filter_apps_not_authorized(user, apps: List[Application]):
@@ -38,6 +93,31 @@ async def filter_apps_not_authorized(user, apps: List[Application]):
 
 
 async def get_apps_by_selector(app_selector, user: User):
+    if settings.LABEL_INDEX_ENABLED and application_label_index.ready and app_selector:
+        apps = [app for app in application_label_index.match(app_selector)
+                if app.onboard_status != OnboardStatus.FAILURE]
+        return await filter_apps_not_authorized(user, apps)
     apps_query_string = dict_to_query_string(app_selector, parent_key="metadata")
     matched_apps = await fetch_applications(query=apps_query_string, user=user)
     return matched_apps
+
+
+async def fetch_apps_by_selectors(app_selectors: list[dict], user: User) -> list[Application]:
+    """Authorized applications matching any of the selectors, with a single query"""
+    if settings.LABEL_INDEX_ENABLED and application_label_index.ready and all(app_selectors):
+        apps = [app for app in application_label_index.match_any(app_selectors)
+                if app.onboard_status != OnboardStatus.FAILURE]
+    else:
+        apps = await Application.find(selectors_filter_condition(app_selectors, parent_key="metadata"),
+                                      Application.onboard_status != OnboardStatus.FAILURE).to_list()
+        log.info(f"Found {len(apps)} Applications for {len(app_selectors)} selectors")
+    return await filter_apps_not_authorized(user, apps)
+
+
+async def get_apps_by_selectors(app_selectors: list[dict], user: User) -> list[list[Application]]:
+    """Same as get_apps_by_selector for several selectors at once, with a single query and a single authorization
+    check. Returns the matched applications of each selector"""
+    if not app_selectors:
+        return []
+    apps = await fetch_apps_by_selectors(app_selectors, user)
+    return [[app for app in apps if matches_selector(app.metadata, app_selector)] for app_selector in app_selectors]
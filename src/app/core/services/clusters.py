@@ -3,26 +3,58 @@ from logging import getLogger
 from beanie.odm.operators.find.comparison import NE
 
 from app.core.auth.user import User
+from app.core.config import get_settings
 from app.core.models.clusters import Cluster
-from app.utils.common import create_filter_condition, dict_to_query_string
+from app.core.schemas.clusters import ClusterResponse
+from app.utils.common import create_filter_condition, dict_to_query_string, selectors_filter_condition, \
+    matches_selector
 from app.utils.enums import OnboardStatus
+from app.utils.label_index import cluster_label_index
+from app.utils.pagination import find_page
+from app.utils.projection import projection_model
+from app.utils.streaming import batched
 
 log = getLogger(__name__)
 
+settings = get_settings()
 
-async def fetch_clusters(query, find_operator=None, filter_failed=True):
+
+def _find_clusters(query, find_operator=None, filter_failed=True, fields=None):
     onboard_status_filer = {}
     if filter_failed:
         onboard_status_filer = NE(Cluster.onboard_status, OnboardStatus.FAILURE)
     if find_operator is None:
         find_operator = {}
+    clusters = Cluster.find(create_filter_condition(query_params=query), find_operator, onboard_status_filer)
+    if fields:
+        return clusters.project(projection_model(ClusterResponse, fields))
+    return clusters
+
+
+async def fetch_clusters(query, find_operator=None, filter_failed=True, fields=None):
+    """Clusters matching the query, or only their fields when given, see projection_model"""
     log.info(f"Fetching Clusters with query: {query}")
-    clusters = await Cluster.find(create_filter_condition(query_params=query), find_operator,
-                                  onboard_status_filer).to_list()
+    clusters = await _find_clusters(query, find_operator, filter_failed, fields).to_list()
     log.info(f"Found {len(clusters)} Clusters, values: {clusters}")
     return clusters
 
 
+async def fetch_clusters_page(query, limit: int, cursor: str = None, find_operator=None, fields=None):
+    """Page of fetch_clusters, see find_page"""
+    log.info(f"Fetching {limit} Clusters with query: {query} after cursor: {cursor}")
+    clusters, next_cursor = await find_page(_find_clusters(query, find_operator, fields=fields), limit, cursor)
+    log.info(f"Found {len(clusters)} Clusters, next cursor: {next_cursor}")
+    return clusters, next_cursor
+
+
+def iter_clusters(query, find_operator=None, fields=None):
+    """Clusters of fetch_clusters as ClusterResponses, read from the cursor and yielded STREAM_BATCH_SIZE at a time"""
+    log.info(f"Streaming Clusters with query: {query}")
+    return batched(_find_clusters(query, find_operator).find(batch_size=settings.STREAM_BATCH_SIZE)
+                   .project(projection_model(ClusterResponse, fields) if fields else ClusterResponse),
+                   settings.STREAM_BATCH_SIZE)
+
+
 async def is_allowed_on_cluster(user: User, clusters: list[Cluster]):
     allowed_envs = await user.role_collection.get_environments()
     envs_in_cluster = {cluster.environment for cluster in clusters}
@@ -30,8 +62,34 @@ async def is_allowed_on_cluster(user: User, clusters: list[Cluster]):
 
 
 async def get_clusters_by_selector(cluster_selector):
+    if settings.LABEL_INDEX_ENABLED and cluster_label_index.ready and cluster_selector:
+        return [cluster for cluster in cluster_label_index.match(cluster_selector)
+                if cluster.onboard_status != OnboardStatus.FAILURE]
     clusters_query_string = dict_to_query_string(
         cluster_selector, parent_key="metadata"
     )
     matched_clusters = await fetch_clusters(clusters_query_string)
     return matched_clusters
+
+
+async def fetch_clusters_by_selectors(cluster_selectors: list[dict]) -> list[Cluster]:
+    """Clusters matching any of the selectors, with a single query"""
+    if settings.LABEL_INDEX_ENABLED and cluster_label_index.ready and all(cluster_selectors):
+        return [cluster for cluster in cluster_label_index.match_any(cluster_selectors)
+                if cluster.onboard_status != OnboardStatus.FAILURE]
+    clusters = await Cluster.find(selectors_filter_condition(cluster_selectors, parent_key="metadata"),
+                                  NE(Cluster.onboard_status, OnboardStatus.FAILURE)).to_list()
+    log.info(f"Found {len(clusters)} Clusters for {len(cluster_selectors)} selectors")
+    return clusters
+
+
+async def get_clusters_by_selectors(cluster_selectors: list[dict]) -> list[list[Cluster]]:
+    """Same as get_clusters_by_selector for several selectors at once, with a single query. Returns the matched
+    clusters of each selector"""
+    if not cluster_selectors:
+        return []
+    if settings.LABEL_INDEX_ENABLED and cluster_label_index.ready and all(cluster_selectors):
+        return [await get_clusters_by_selector(cluster_selector) for cluster_selector in cluster_selectors]
+    clusters = await fetch_clusters_by_selectors(cluster_selectors)
+    return [[cluster for cluster in clusters if matches_selector(cluster.metadata, cluster_selector)]
+            for cluster_selector in cluster_selectors]
@@ -0,0 +1,73 @@
+from logging import getLogger
+from typing import Iterable, List, Optional
+from uuid import uuid4
+
+from beanie.odm.operators.find.comparison import In
+from beanie.odm.utils.dump import get_dict
+from pymongo import UpdateOne
+
+from app.core.models.clusterstate import ClusterState
+from app.core.schemas.applications import ApplicationResponse
+from app.core.schemas.clusters import ClusterResponse
+
+log = getLogger(__name__)
+
+
+class ClusterStateRepository:
+    """Cluster states of a set of clusters. They are fetched with a single $in query and the changed ones are written
+    back with one unordered bulk write of upserts, instead of a find and a save per cluster. Upserts are keyed by the
+    unique cluster._id, so that states created concurrently for a new cluster update one document instead of failing
+    on the unique index"""
+
+    def __init__(self):
+        self.states: dict[str, ClusterState] = {}
+        self.changed: dict[str, ClusterState] = {}
+
+    async def load(self, cluster_ids: Iterable[str]) -> dict[str, ClusterState]:
+        cluster_ids = [cluster_id for cluster_id in cluster_ids if cluster_id not in self.states]
+        if cluster_ids:
+            for cluster_state in await ClusterState.find(In(ClusterState.cluster._id, cluster_ids)).to_list():
+                self.states[cluster_state.cluster.id] = cluster_state
+            log.debug(f"Loaded cluster states of {len(cluster_ids)} clusters")
+        return self.states
+
+    def get(self, cluster_id: str) -> Optional[ClusterState]:
+        return self.states.get(cluster_id)
+
+    def put(self, cluster_state: ClusterState):
+        """Marks the cluster state to be written by save"""
+        if cluster_state.id is None:
+            cluster_state.id = str(uuid4())
+        self.states[cluster_state.cluster.id] = cluster_state
+        self.changed[cluster_state.cluster.id] = cluster_state
+
+    async def save(self) -> bool:
+        if not self.changed:
+            return True
+        requests = [self._upsert(cluster_state) for cluster_state in self.changed.values()]
+        result = await ClusterState.get_motor_collection().bulk_write(requests, ordered=False)
+        log.debug(f"Saved cluster states of {len(requests)} clusters")
+        self.changed = {}
+        return result.acknowledged
+
+    @staticmethod
+    def _upsert(cluster_state: ClusterState) -> UpdateOne:
+        document = get_dict(cluster_state, to_db=True)
+        state_id = document.pop("_id")
+        return UpdateOne({"cluster._id": cluster_state.cluster.id},
+                         {"$set": document, "$setOnInsert": {"_id": state_id}}, upsert=True)
+
+    @staticmethod
+    async def upsert_cluster_state(cluster_id: str, cluster: ClusterResponse,
+                                   applications: Optional[List[ApplicationResponse]]) -> bool:
+        """Sets the cluster and, if given, the applications of a cluster state, creating it if missing, in a single
+        round trip"""
+        new_cluster_state = get_dict(ClusterState(id=str(uuid4()), cluster=cluster, applications=applications or []),
+                                     to_db=True)
+        updated_fields = {"cluster", "applications"} if applications is not None else {"cluster"}
+        result = await ClusterState.get_motor_collection().update_one(
+            {"cluster._id": cluster_id},
+            {"$set": {key: value for key, value in new_cluster_state.items() if key in updated_fields},
+             "$setOnInsert": {key: value for key, value in new_cluster_state.items() if key not in updated_fields}},
+            upsert=True)
+        return result.acknowledged
@@ -9,13 +9,18 @@ from app.core.models.clusters import Cluster
 from app.core.models.deployment import Deployment
 from app.core.models.targetpolicies import TargetPolicy
 from app.core.schemas.deployment import DeploymentState
-from app.core.services.applications import get_apps_by_selector
-from app.core.services.clusters import get_clusters_by_selector
-from app.core.services.purge_policies import ApplyOnceCronologicalOrderedPurgePolicy
+from app.core.config import get_settings
+from app.core.services.applications import get_apps_by_selector, get_apps_by_selectors, fetch_apps_by_selectors
+from app.core.services.clusters import get_clusters_by_selector, get_clusters_by_selectors, \
+    fetch_clusters_by_selectors
+from app.core.services.purge_policies import CompiledApplyOnceCronologicalOrderedPurgePolicy
 from app.utils.enums import DeploymentStatus, Operation
+from app.utils.label_store import ColumnarLabelStore
 
 log = getLogger(__name__)
 
+settings = get_settings()
+
 
 class DeploymentMappingCreator(ABC):
     """This creates the deployment state and populates it into deployment mappings"""
@@ -83,12 +88,16 @@ async def split_policies(target_policies):
 
 
 class ClusterOrApplicationDeploymentService(DeploymentService, ABC):
+    """selector_field is the selector of the policies that picks the metadata_based_resources, app_selector or
+    cluster_selector"""
+    selector_field: str = None
+
     def __init__(self, operation=Operation.CREATE):
         self.deployment_mapping_creator = _deployment_mapping_registry.get(Operation.CREATE)
-        self.purge_policy_evaluator = ApplyOnceCronologicalOrderedPurgePolicy()
+        self.purge_policy_evaluator = CompiledApplyOnceCronologicalOrderedPurgePolicy()
 
     async def create_deployment_object(self, parameters: DeploymentParameters):
-        """Find matching metadata_based_resources
+        """Find matching metadata_based_resources of all policies at once
                 2) Apply Purge policies and filter the matching metadata_based_resources
                 3) Invoke deployment mapping creator to create deployment mappings
                 4) Create deployment object and return back"""
@@ -97,13 +106,14 @@ class ClusterOrApplicationDeploymentService(DeploymentService, ABC):
             f"Creating Deployment object for target_policies: {target_policies} "
         )
         non_purge_policies, purge_policies = await split_policies(target_policies)
+        non_purge_policies = list(non_purge_policies)
+        matched_resources = await self._match_metadata_based_resources(non_purge_policies, purge_policies, parameters)
         target_policy_ids = []
         master_deployment_mapping: Dict[str, DeploymentState] = {}
-        already_evaluate_purged_policies = []  # so that it gets matched only once for each create
-        for target_policy in non_purge_policies:
+        for target_policy, metadata_based_resources in zip(non_purge_policies, matched_resources):
             log.info(f"Creating Deployment object for target_policy: {target_policy}")
-            deployment_mapping = await self._create_deployment_mapping(already_evaluate_purged_policies, parameters,
-                                                                       purge_policies, target_policy)
+            deployment_mapping = await self._create_deployment_mapping(parameters, target_policy,
+                                                                       metadata_based_resources)
             target_policy_ids.append(target_policy.id)
             for cluster_id, deployment_state in deployment_mapping.items():
                 deploy_state: DeploymentState = master_deployment_mapping.get(cluster_id)
@@ -116,28 +126,59 @@ class ClusterOrApplicationDeploymentService(DeploymentService, ABC):
                                     deployment_mappings=master_deployment_mapping,
                                     status=DeploymentStatus.PENDING).save()  # type: ignore
 
+    async def _match_metadata_based_resources(self, target_policies: list[TargetPolicy],
+                                              purge_policies: set[TargetPolicy],
+                                              parameters: DeploymentParameters) -> list[list]:
+        """Finds the metadata_based_resources of each policy, without the purged ones. Purge policies are applied in the
+        order of the policies"""
+        if not target_policies:
+            return []
+        selectors = [getattr(target_policy, self.selector_field) for target_policy in target_policies]
+        already_evaluate_purged_policies = []  # so that it gets matched only once for each create
+        if settings.SELECTOR_ENGINE == "numpy":
+            store = ColumnarLabelStore(await self._fetch_metadata_based_resources(selectors, parameters))
+            return [store.select(self.purge_policy_evaluator.filter_purged_mask(
+                store, store.mask(selector), purge_policies, target_policy, self.selector_field,
+                already_evaluate_purged_policies)) for target_policy, selector in zip(target_policies, selectors)]
+        matched_resources = await self._resolve_metadata_based_resources(selectors, parameters)
+        return [self.purge_policy_evaluator.filter_purged(metadata_based_resources=metadata_based_resources,
+                                                          purge_policies=purge_policies,
+                                                          policy_under_evaluation=target_policy,
+                                                          already_evaluate_purged_policies=already_evaluate_purged_policies)
+                for target_policy, metadata_based_resources in zip(target_policies, matched_resources)]
+
+    @abstractmethod
+    async def _fetch_metadata_based_resources(self, selectors: list[dict], parameters: DeploymentParameters) -> list:
+        """Finds the metadata_based_resources matched by any of the selectors, in a single query"""
+        raise NotImplemented("Need concrete class for implementation of fetch_metadata_based_resources")
+
+    @abstractmethod
+    async def _resolve_metadata_based_resources(self, selectors: list[dict],
+                                                parameters: DeploymentParameters) -> list[list]:
+        """Finds the metadata_based_resources matched by each of the selectors, in a single query"""
+        raise NotImplemented("Need concrete class for implementation of resolve_metadata_based_resources")
+
     @abstractmethod
-    async def _create_deployment_mapping(self, already_evaluate_purged_policies, parameters, purge_policies,
-                                         target_policy):
+    async def _create_deployment_mapping(self, parameters, target_policy, metadata_based_resources):
         raise NotImplemented("Need concrete class for implementation of create_deployment_mapping")
 
 
 class ClusterDeploymentService(ClusterOrApplicationDeploymentService):
+    selector_field = "app_selector"
 
     def __init__(self, operation=Operation.CREATE):
         self.deployment_mapping_creator = _deployment_mapping_registry.get(operation)
-        self.purge_policy_evaluator = ApplyOnceCronologicalOrderedPurgePolicy()
-
-    async def _create_deployment_mapping(self, already_evaluate_purged_policies, parameters, purge_policies,
-                                         current_target_policy):
-        log.info(f"Creating Deployment object for target_policy: {current_target_policy}")
-        matched_apps: list[Application] = self.purge_policy_evaluator.filter_purged(
-            metadata_based_resources=await get_apps_by_selector(current_target_policy.app_selector,
-                                                                user=parameters.user),
-            purge_policies=purge_policies,
-            policy_under_evaluation=current_target_policy,
-            already_evaluate_purged_policies=already_evaluate_purged_policies,
-        )
+        self.purge_policy_evaluator = CompiledApplyOnceCronologicalOrderedPurgePolicy()
+
+    async def _fetch_metadata_based_resources(self, selectors: list[dict],
+                                              parameters: DeploymentParameters) -> list[Application]:
+        return await fetch_apps_by_selectors(selectors, user=parameters.user)
+
+    async def _resolve_metadata_based_resources(self, selectors: list[dict],
+                                                parameters: DeploymentParameters) -> list[list[Application]]:
+        return await get_apps_by_selectors(selectors, user=parameters.user)
+
+    async def _create_deployment_mapping(self, parameters, current_target_policy, matched_apps: list[Application]):
         log.debug(
             f"Matched Apps: {matched_apps} for target_policy: {current_target_policy} and cluster: {parameters.cluster}")
         deployment_mapping = await self.deployment_mapping_creator.create_deployment_mappings(matched_apps,
@@ -146,17 +187,21 @@ class ClusterDeploymentService(ClusterOrApplicationDeploymentService):
 
 
 class AppDeploymentService(ClusterOrApplicationDeploymentService):
+    selector_field = "cluster_selector"
+
     def __init__(self, operation=Operation.CREATE):
         self.deployment_mapping_creator = _deployment_mapping_registry.get(operation)
-        self.purge_policy_evaluator = ApplyOnceCronologicalOrderedPurgePolicy()
-
-    async def _create_deployment_mapping(self, already_evaluate_purged_policies, parameters, purge_policies,
-                                         current_target_policy):
-        matched_clusters = self.purge_policy_evaluator.filter_purged(
-            metadata_based_resources=await get_clusters_by_selector(current_target_policy.cluster_selector),
-            user=parameters.user, purge_policies=purge_policies,
-            policy_under_evaluation=current_target_policy,
-            already_evaluate_purged_policies=already_evaluate_purged_policies)
+        self.purge_policy_evaluator = CompiledApplyOnceCronologicalOrderedPurgePolicy()
+
+    async def _fetch_metadata_based_resources(self, selectors: list[dict],
+                                              parameters: DeploymentParameters) -> list[Cluster]:
+        return await fetch_clusters_by_selectors(selectors)
+
+    async def _resolve_metadata_based_resources(self, selectors: list[dict],
+                                                parameters: DeploymentParameters) -> list[list[Cluster]]:
+        return await get_clusters_by_selectors(selectors)
+
+    async def _create_deployment_mapping(self, parameters, current_target_policy, matched_clusters: list[Cluster]):
         log.info(
             f"Matched Clusters: {matched_clusters} for app: {parameters.application} and target_policy: {current_target_policy}")
 
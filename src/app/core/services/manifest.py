@@ -1,26 +1,28 @@
+import hashlib
+import json
 import logging
 import os.path
-import tempfile
 from abc import ABC, abstractmethod
 from logging import getLogger
+from typing import Dict
 from uuid import uuid4
 
-from beanie.odm.operators.find.comparison import Eq
-
 from app.core.config import get_settings
 from app.core.models.clusters import Cluster
-from app.core.models.clusterstate import ClusterState
+from app.core.models.clusterstate import ClusterState, ManifestDigest
+from app.core.services.clusterstate import ClusterStateRepository
 from app.core.models.deployment import Deployment
 from app.core.schemas.deployment import DeploymentState
 from app.core.services import OperationRegistry, template
-from app.utils import git_handler
+from app.utils.commit_coordinator import get_commit_coordinator
 from app.utils.common import find_delta_items
 from app.utils.constants import (
     TEMPLATES_BASE_PATH, KUSTOMIZE_TEMPLATE_NAME,
     ARGOCD_APPLICATION_TEMPLATE_NAME, ARGOCD_PROJECT_NAME,
     ARGOCD_MASTER_FILE_NAME, ARGOCD_APPLICATION_FILE_SUFFIX,
-    KUSTOMIZE_FILE_NAME, MANIFESTS_GIT_BRANCH, GIT_COMMIT_MESSAGE)
+    KUSTOMIZE_FILE_NAME)
 from app.utils.manifest import prepare_consumer_application_data, prepare_master_application_data
+from app.utils.manifest_sink import ManifestWriter, git_blob_id
 from app.utils.template import JinjaTempalte
 
 logger = logging.getLogger(__name__)
@@ -35,6 +37,34 @@ def get_argocd_application_file_name(app, cluster, output_directory):
     return application_file_name, argocd_application_output_dir
 
 
+def manifest_digest(template_name: str, render_data: dict) -> str:
+    return hashlib.sha256(json.dumps([template_name, render_data], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def render_if_changed(template: ManifestWriter, template_name: str, output_dir: str, output_file_name: str,
+                      render_data: dict, digests: Dict[str, ManifestDigest], cluster_dir: str) -> bool:
+    """
+    Renders a manifest unless it was rendered from the same data before and is still in place unmodified.
+
+    Args:
+        digests: Digests recorded for the cluster, keyed by path relative to cluster_dir. Updated for what is rendered.
+
+    Returns:
+        bool: False if the manifest could not be written.
+    """
+    path = os.path.join(output_dir, output_file_name)
+    digest_key = os.path.relpath(path, cluster_dir)
+    digest = manifest_digest(template_name, render_data)
+    recorded = digests.get(digest_key)
+    if recorded is not None and recorded.input == digest and template.blob_id(path) == recorded.blob:
+        return True
+
+    def record_digest(output: str):
+        digests[digest_key] = ManifestDigest(input=digest, blob=git_blob_id(output.encode()))
+
+    return template.submit(template_name, path, render_data, record_digest)
+
+
 def generate_kustomize_data(cluster, mappings):
     """
     Generates Kustomize data for the specified cluster to app mappings.
@@ -56,7 +86,7 @@ def generate_kustomize_data(cluster, mappings):
     return kustomize_items
 
 
-def generate_kustomize_file(project_name, cluster_name, kustomize_items, output_directory, template):
+def generate_kustomize_file(project_name, cluster_name, kustomize_items, output_directory, template, digests=None):
     """
     Generates a Kustomization file for the specified project, cluster and Kustomize items.
 
@@ -64,6 +94,7 @@ def generate_kustomize_file(project_name, cluster_name, kustomize_items, output_
         project_name (str): The name of the project.
         cluster_name (str): The name of the target cluster.
         kustomize_items (dict): A dictionary containing the Kustomize items to include in the file.
+        digests (dict): Manifest digests of the cluster, the file is only rendered if it changed. Optional.
 
     Returns:
         None
@@ -85,8 +116,24 @@ def generate_kustomize_file(project_name, cluster_name, kustomize_items, output_
     output_dir = f"{output_directory}/{cluster_name}/consumer"
     logger.info(
         f"Generating Kustomize file for {cluster_name}at  {output_dir} with items - {kustomize_items}")
+    render_data = {'shortProjectName': project_name, 'items': kustomize_items}
+    if digests is not None:
+        return render_if_changed(template, f"{TEMPLATES_BASE_PATH}/{KUSTOMIZE_TEMPLATE_NAME}", output_dir,
+                                 KUSTOMIZE_FILE_NAME, render_data, digests, f"{output_directory}/{cluster_name}")
     return template.render(f"{TEMPLATES_BASE_PATH}/{KUSTOMIZE_TEMPLATE_NAME}", output_dir, KUSTOMIZE_FILE_NAME,
-                           {'shortProjectName': project_name, 'items': kustomize_items})
+                           render_data)
+
+
+def get_manifest_paths(deployment_or_cluster: [Deployment | Cluster]) -> list[str] | None:
+    """Returns the repository directories the manifests of a deployment or cluster are written to, None if unknown"""
+    if isinstance(deployment_or_cluster, Deployment):
+        cluster_names = {deployment_state.cluster_context.name for deployment_state in
+                         deployment_or_cluster.deployment_mappings.values()}
+    elif isinstance(deployment_or_cluster, Cluster):
+        cluster_names = {deployment_or_cluster.name}
+    else:
+        return None
+    return sorted(f"{ARGOCD_PROJECT_NAME}/{cluster_name}" for cluster_name in cluster_names)
 
 
 class ManifestGenerator(ABC):
@@ -94,19 +141,17 @@ class ManifestGenerator(ABC):
         try:
             template_obj = template.init_template()
 
-            with tempfile.TemporaryDirectory() as manifest_output_directory:
-                # Use module name here to monkeypatch
-                git_manager = git_handler.initialize_git_manager(settings.ARGOCD_MASTER_APPLICATION_REPO_URL,
-                                                                 manifest_output_directory, MANIFESTS_GIT_BRANCH)
-
-                is_manifest_generated = await self._generate(deployment_obj, template_obj,
-                                                             f"{manifest_output_directory}/{ARGOCD_PROJECT_NAME}")
-
+            async def generate(git_manager) -> bool:
+                is_manifest_generated = await self._generate(deployment_obj,
+                                                             git_manager.manifest_writer(template_obj,
+                                                                                         template.get_render_pool()),
+                                                             f"{git_manager.local_folder}/{ARGOCD_PROJECT_NAME}")
                 if not is_manifest_generated:
                     logger.info(f"Unable to generate manifest files for {type(deployment_obj)}-{deployment_obj}")
-                    return False
-                else:
-                    return git_manager.commit_and_push(GIT_COMMIT_MESSAGE, MANIFESTS_GIT_BRANCH, user)
+                return is_manifest_generated
+
+            # Concurrent onboardings are committed and pushed together
+            return await get_commit_coordinator().submit(generate, user, get_manifest_paths(deployment_obj))
         except Exception as e:
             logger.error(f"Error in generating and pushing files due to {str(e)}")
             return False
@@ -158,11 +203,14 @@ class ManifestOperation(ABC):
     def can_process(self, deploymentOrCluster) -> bool:
         """Check if it can process the deployment state"""
 
-    def render_manifest(self, cluster, data, output_dir, output_file_name, template: JinjaTempalte):
+    def render_manifest(self, cluster, data, output_dir, output_file_name, template: JinjaTempalte,
+                        digests: Dict[str, ManifestDigest] = None, cluster_dir: str = None):
         """
-       Renders manifest as per data.
+       Renders manifest as per data. With digests it is only rendered if it changed, see render_if_changed.
         """
-
+        if digests is not None:
+            return render_if_changed(template, f"{TEMPLATES_BASE_PATH}/{ARGOCD_APPLICATION_TEMPLATE_NAME}", output_dir,
+                                     output_file_name, data, digests, cluster_dir)
         return template.render(f"{TEMPLATES_BASE_PATH}/{ARGOCD_APPLICATION_TEMPLATE_NAME}", output_dir,
                                output_file_name,
                                data)
@@ -189,7 +237,7 @@ class ClusterManifestAddOperation(ManifestOperation):
         self.render_manifest(
             cluster, master_application_template_data, argocd_master_application_output_dir, ARGOCD_MASTER_FILE_NAME, template)
 
-        return True
+        return await template.flush()
 
     def can_process(self, received_model: [Cluster | Deployment]) -> bool:
         return isinstance(received_model, Cluster)
@@ -199,15 +247,24 @@ OperationRegistry.get_instance().add_operation(ClusterManifestAddOperation())
 
 
 class DeploymentManifestOperation(ManifestOperation):
-    async def perform(self, deployment: Deployment, template: JinjaTempalte, output_dir: str) -> bool:
+    async def perform(self, deployment: Deployment, template: ManifestWriter, output_dir: str) -> bool:
+        # The states of all clusters are loaded upfront and written back together once every cluster is processed
+        cluster_states = ClusterStateRepository()
+        await cluster_states.load(deployment.deployment_mappings.keys())
         for cluster_id, deployment_state in deployment.deployment_mappings.items():
-            if not await self._process_for_each_cluster(deployment.target_policy_id, cluster_id, deployment_state, template, output_dir):
+            # Clusters are independent of each other, with a render pool they are rendered in parallel
+            template.start_render_job()
+            if not await self._process_for_each_cluster(deployment.target_policy_id, cluster_id, deployment_state,
+                                                        template, output_dir, cluster_states):
                 return False
-        return True
+        # Saved once the manifests are rendered, as the states hold their digests
+        if not await template.after_render(cluster_states.save):
+            return False
+        return await template.flush()
 
     @abstractmethod
     async def _process_for_each_cluster(self, target_policy_id: str, cluster_id: str, deployment_state: DeploymentState,
-                                        template: JinjaTempalte, output_dir: str):
+                                        template: JinjaTempalte, output_dir: str, cluster_states: ClusterStateRepository):
         raise NotImplemented("Need concrete implementation")
 
 
@@ -217,7 +274,7 @@ class DeploymentManifestAddOperation(DeploymentManifestOperation):
         self.logger = getLogger(__name__)
 
     async def _process_for_each_cluster(self, target_policy_id: str, cluster_id: str, deployment_state: DeploymentState,
-                                        template: JinjaTempalte, output_dir: str):
+                                        template: JinjaTempalte, output_dir: str, cluster_states: ClusterStateRepository):
         """
         Generates the ArgoCD manifest for a deployment.
 
@@ -225,6 +282,7 @@ class DeploymentManifestAddOperation(DeploymentManifestOperation):
         from it and compares them with the applications for that cluster in the database.
         It generates the manifest only for newly added applications, saves it back to
         the database, and generates the kustomize file for all the applications.
+        Manifests whose content did not change since they were last generated are skipped.
 
         Returns:
             The method does not return anything.
@@ -238,7 +296,7 @@ class DeploymentManifestAddOperation(DeploymentManifestOperation):
         cluster = deployment_state.cluster_context
 
         # Get the applications for the cluster from the database and compare them with the new applications
-        cluster_state_obj = await ClusterState.find_one(ClusterState.cluster._id == cluster_id)
+        cluster_state_obj = cluster_states.get(cluster_id)
         if not cluster_state_obj:
             cluster_state_obj = ClusterState(
                 id=str(uuid4()), cluster=cluster, applications=deployment_state.add)
@@ -248,21 +306,23 @@ class DeploymentManifestAddOperation(DeploymentManifestOperation):
                 deployment_state.add, cluster_state_obj.applications, key=lambda item: item.id)
             cluster_state_obj.applications += delta_apps
 
-        # Save the cluster state to the database.
-        if not await cluster_state_obj.save():
-            return False
-
         # Generate the argocd & kustomizes file for all the applications.
         self.__generate_argocd_manifests(
-            cluster_state_obj.applications, cluster, target_policy_id, output_dir, template)
+            cluster_state_obj.applications, cluster, target_policy_id, output_dir, template,
+            cluster_state_obj.manifest_digests)
         kustomize_template_data = generate_kustomize_data(
             cluster, cluster_state_obj)
         generate_kustomize_file(
-            ARGOCD_PROJECT_NAME, cluster.name, kustomize_template_data, output_dir, template)
+            ARGOCD_PROJECT_NAME, cluster.name, kustomize_template_data, output_dir, template,
+            cluster_state_obj.manifest_digests)
+
+        # The cluster state, including the digests of the generated manifests, is saved with the others.
+        cluster_states.put(cluster_state_obj)
 
         return True
 
-    def __generate_argocd_manifests(self, apps, cluster, target_policy_id, output_directory, template: JinjaTempalte):
+    def __generate_argocd_manifests(self, apps, cluster, target_policy_id, output_directory, template: JinjaTempalte,
+                                    digests: Dict[str, ManifestDigest]):
         """
         Generate ArgoCD manifests for a given application on a specified cluster.
 
@@ -270,6 +330,7 @@ class DeploymentManifestAddOperation(DeploymentManifestOperation):
         app (ApplicationResponse): An instance of the ApplicationResponse containing information about the application.
         cluster (ClusterResponse): An instance of the ClusterResponse class representing the target cluster.
         target_policy_id (str): Target policy id
+        digests (dict): Manifest digests of the cluster, unchanged manifests are not rendered again
 
         Returns:
         None
@@ -286,6 +347,7 @@ class DeploymentManifestAddOperation(DeploymentManifestOperation):
             raise ValueError("The app argument cannot be empty or None.")
         if not cluster:
             raise ValueError("The cluster argument cannot be empty or None.")
+        cluster_dir = f"{output_directory}/{cluster.name}"
         for app in apps:
             application_file_name, argocd_application_output_dir = get_argocd_application_file_name(app, cluster,
                                                                                                     output_directory)
@@ -295,7 +357,7 @@ class DeploymentManifestAddOperation(DeploymentManifestOperation):
             # for each app create application manifest
             self.render_manifest(
                 cluster, consumer_application_template_data, argocd_application_output_dir, application_file_name,
-                template)
+                template, digests, cluster_dir)
 
         argocd_master_application_output_dir = f"{output_directory}/{cluster.name}/consumer/argocd/"
         master_application_template_data = prepare_master_application_data(
@@ -303,7 +365,7 @@ class DeploymentManifestAddOperation(DeploymentManifestOperation):
         # Generate argocd master application manifest
         self.render_manifest(
             cluster, master_application_template_data, argocd_master_application_output_dir, ARGOCD_MASTER_FILE_NAME,
-            template)
+            template, digests, cluster_dir)
 
     def can_process(self, deployment: [Deployment | Cluster]) -> bool:
         if isinstance(deployment, Deployment):
@@ -319,17 +381,18 @@ class DeploymentManifestRemoveOperation(DeploymentManifestOperation):
         self.logger = getLogger(__name__)
 
     async def _process_for_each_cluster(self, target_policy_id: str, cluster_id: str, deployment_state: DeploymentState,
-                                        template: JinjaTempalte, output_dir: str):
+                                        template: JinjaTempalte, output_dir: str, cluster_states: ClusterStateRepository):
         self.logger.info(
             f"Removing the ArgoCD manifest for {target_policy_id}")
         cluster = deployment_state.cluster_context
-        cluster_state_obj = await ClusterState.find_one(Eq(ClusterState.cluster._id, cluster_id))
+        cluster_state_obj = cluster_states.get(cluster_id)
 
         if not cluster_state_obj:
             self.logger.warning(
                 f"{[apps.name for apps in deployment_state.purge]} were never deployed on {cluster.name}")
         else:
             await self._remove_app_from_cluster_state(cluster, cluster_state_obj, deployment_state, output_dir, template)
+            cluster_states.put(cluster_state_obj)
         return True
 
     def can_process(self, deployment: [Deployment | Cluster]) -> bool:
@@ -341,8 +404,8 @@ class DeploymentManifestRemoveOperation(DeploymentManifestOperation):
 
     async def _remove_app_from_cluster_state(self, cluster, cluster_state: ClusterState,
                                              deployment_state: DeploymentState,
-                                             output_directory, template):
-        """This removes app from the cluster state object, delete the app manifest from argocd_application_output_dir and saves back cluster state.
+                                             output_directory, template: ManifestWriter):
+        """This removes app from the cluster state object and delete the app manifest from argocd_application_output_dir.
         In case yaml files are not found in output dir (will happen only if anyone has manually delete application) then it throws warning"""
         for application in deployment_state.purge:
             if len(cluster_state.applications) == 0:
@@ -354,17 +417,18 @@ class DeploymentManifestRemoveOperation(DeploymentManifestOperation):
                                                                                                     cluster,
                                                                                                     output_directory)
             application_file_path = os.path.join(argocd_application_output_dir, application_file_name)
-            if os.path.exists(application_file_path):
-                os.remove(application_file_path)
+            cluster_state.manifest_digests.pop(
+                os.path.relpath(application_file_path, f"{output_directory}/{cluster.name}"), None)
+            if template.exists(application_file_path):
+                template.remove(application_file_path)
                 self.logger.info(f"Removed {application_file_path}")
             else:
                 logger.warning(f"Manifest {application_file_path} not found for removal")
         kustomize_template_data = generate_kustomize_data(
             cluster, cluster_state)
         generate_kustomize_file(
-            ARGOCD_PROJECT_NAME, cluster.name, kustomize_template_data, output_directory, template)
-
-        await cluster_state.save()
+            ARGOCD_PROJECT_NAME, cluster.name, kustomize_template_data, output_directory, template,
+            cluster_state.manifest_digests)
 
 
 OperationRegistry.get_instance().add_operation(DeploymentManifestRemoveOperation(), DeploymentManifestAddOperation())
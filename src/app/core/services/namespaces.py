@@ -1,9 +1,10 @@
 from beanie.odm.operators.find.comparison import In
-from beanie.odm.operators.find.evaluation import RegEx
 
 from app.core.auth.user import User
 from app.core.config import get_settings
 from app.core.models.namespaces import Namespace
+from app.utils.authorization_cache import authorized_namespace_cache, namespace_membership_cache
+from app.utils.pagination import find_page
 
 settings = get_settings()
 
@@ -13,7 +14,26 @@ async def get_authorized_namespace_by_name(user, namespace_name):
 
 
 async def get_authorized_namespace_by_names(user, namespace_names):
-    return await _get_authorized_namespace(user, namespace_names=namespace_names)
+    """The namespaces among namespace_names the user is authorized on. The decisions are cached per group set of the
+    user and namespace, only the namespaces missing from the cache are read, with a single query"""
+    groups = _group_set(user)
+    namespaces = {}
+    missing = []
+    for namespace_name in set(namespace_names):
+        found, namespace = authorized_namespace_cache.get((groups, namespace_name))
+        if found:
+            namespaces[namespace_name] = namespace
+        else:
+            missing.append(namespace_name)
+    if missing:
+        namespace_condition = authorized_namespace_condition(user)
+        authorized = {} if namespace_condition is None else {
+            namespace.name: namespace
+            for namespace in await Namespace.find(In(Namespace.name, missing), namespace_condition).to_list()}
+        for namespace_name in missing:
+            namespaces[namespace_name] = authorized.get(namespace_name)
+            authorized_namespace_cache.set((groups, namespace_name), namespaces[namespace_name])
+    return [namespace for namespace in namespaces.values() if namespace is not None]
 
 
 # TODO: Refactor this- duplicate code
@@ -36,28 +56,56 @@ async def _get_authorized_namespace(user, namespace_id=None, namespace_name=None
 
 
 async def search_by_env_for_admin(admin_roles_list, namespace_id, namespace_name, namespace_names):
-    group_separator = settings.GROUP_NAME_SEPARATOR
-    environments = '|'.join([f'{group_separator}{role.env}' for role in admin_roles_list])
+    environments = [role.env for role in admin_roles_list]
     if namespace_id is None:
-        namespaces = await Namespace.find(RegEx(Namespace.group, environments)).to_list()
+        namespaces = await Namespace.find(In(Namespace.environments, environments)).to_list()
         return namespaces
     elif namespace_name is None and namespace_names is None:
         return await Namespace.find_one(Namespace.id == namespace_id,
-                                        RegEx(Namespace.group, environments))
+                                        In(Namespace.environments, environments))
     elif namespace_names is None and namespace_name is not None:
         return await Namespace.find_one(Namespace.name == namespace_name,
-                                        RegEx(Namespace.group, environments))
+                                        In(Namespace.environments, environments))
     else:
         return Namespace.find(In(Namespace.name, namespace_names),
-                              RegEx(Namespace.group, environments))
+                              In(Namespace.environments, environments))
 
 
 async def get_all_namespaces(user: User):
     return await _get_authorized_namespace(user)
 
 
+async def get_namespaces_page(user: User, limit: int, cursor: str = None):
+    """Page of get_all_namespaces, see find_page"""
+    namespace_condition = authorized_namespace_condition(user)
+    if namespace_condition is None:
+        return [], None
+    return await find_page(Namespace.find(namespace_condition), limit, cursor)
+
+
+def authorized_namespace_condition(user: User):
+    """Condition of the namespaces the user is authorized on, the same as _get_authorized_namespace, for queries and
+    aggregations to apply. None when the user is authorized on no namespace"""
+    admin_roles_list = user.get_admin_roles()
+    if len(admin_roles_list) != 0:
+        return {"environments": {"$in": [role.env for role in admin_roles_list]}}
+    user_groups = user.role_collection.get_in_group_format()
+    if len(user_groups) == 0:
+        return None
+    return {"group": {"$in": [role.rsplit('-', 1)[0] for role in user_groups]}}
+
+
 async def is_part_of_namespace_group(user, namespace_name):
+    key = (_group_set(user), namespace_name)
+    found, is_part = namespace_membership_cache.get(key)
+    if found:
+        return is_part
     namespace = await get_authorized_namespace_by_name(user=user, namespace_name=namespace_name)
-    if namespace is not None:
-        return True
-    return False
+    is_part = namespace is not None
+    namespace_membership_cache.set(key, is_part)
+    return is_part
+
+
+def _group_set(user: User):
+    # The authorization decisions only depend on the groups of the user, users of the same teams share them
+    return frozenset(user.role_collection.get_in_group_format())
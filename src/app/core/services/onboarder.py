@@ -3,9 +3,9 @@ from logging import getLogger
 
 from app.core.config import get_settings
 from app.core.models.clusters import Cluster
-from app.core.models.clusterstate import ClusterState
 from app.core.models.targetpolicies import TargetPolicy
 from app.core.services import targetpolicies
+from app.core.services.clusterstate import ClusterStateRepository
 from app.core.services.deployment import DeploymentParameters, TargetPolicyDeploymentService, ClusterDeploymentService, AppDeploymentService
 from app.core.services.manifest import ArgoCDDeploymentManifestGenerator
 from app.utils.enums import EventType
@@ -73,7 +73,7 @@ class ClusterOnboarder(Onboarder):
             if deployment_obj:
                 return deployment_obj
 
-        await ClusterState.upsert_cluster_state(self.cluster.id, self.cluster, [])
+        await ClusterStateRepository.upsert_cluster_state(self.cluster.id, self.cluster, [])
         return self.cluster
 
 
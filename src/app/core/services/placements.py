@@ -0,0 +1,160 @@
+import time
+from logging import getLogger
+from typing import Iterable
+
+from beanie.odm.operators.find.comparison import In, NE
+from beanie.odm.utils.dump import get_dict
+from pymongo import DeleteMany, ReplaceOne
+
+from app.core.auth.user import User
+from app.core.models.applications import Application
+from app.core.models.clusters import Cluster
+from app.core.models.placements import Placement
+from app.core.models.targetpolicies import TargetPolicy
+from app.core.schemas.targetpolicies import TargetPolicyResponse
+from app.core.services.namespaces import get_authorized_namespace_by_names
+from app.utils.common import label_map_condition
+from app.utils.enums import OnboardStatus
+
+log = getLogger(__name__)
+
+
+def targets_cluster(target_policy: TargetPolicy, cluster_metadata: dict) -> bool:
+    """A target policy applies to a cluster when one label of its cluster_selector is found in the cluster metadata"""
+    cluster_selector = target_policy.cluster_selector or {}
+    return any(cluster_selector.get(key) == value for key, value in cluster_metadata.items())
+
+
+def targets_application(target_policy: TargetPolicy, app_metadata: dict) -> bool:
+    """A target policy applies to an application when all labels of its app_selector are found in the application
+    metadata"""
+    return all(app_metadata.get(key) == value for key, value in (target_policy.app_selector or {}).items())
+
+
+def _placement(application: Application, cluster: Cluster, target_policies: list[TargetPolicyResponse]) -> Placement:
+    return Placement(id=f"{application.id}:{cluster.id}", application_id=application.id,
+                     application_name=(application.metadata or {}).get("name"), namespace=application.namespace,
+                     cluster_id=cluster.id, cluster_name=(cluster.metadata or {}).get("name"),
+                     environment=cluster.environment,
+                     target_policy_ids=[target_policy.id for target_policy in target_policies],
+                     target_policy=max(target_policies, key=lambda target_policy: target_policy.updated_on),
+                     updated_on=time.time())
+
+
+def _target_policy_response(target_policy: TargetPolicy) -> TargetPolicyResponse:
+    return TargetPolicyResponse.parse_obj(target_policy.dict(by_alias=True))
+
+
+async def _write_placements(placements: Iterable[Placement], stale: dict = None):
+    """Upserts the placements. stale selects placements to delete unless they are among the written ones"""
+    placements = list(placements)
+    requests = [ReplaceOne({"_id": placement.id}, get_dict(placement, to_db=True), upsert=True)
+                for placement in placements]
+    if stale is not None:
+        requests.append(DeleteMany({**stale, "_id": {"$nin": [placement.id for placement in placements]}}))
+    if requests:
+        await Placement.get_motor_collection().bulk_write(requests, ordered=False)
+    log.debug(f"Wrote {len(placements)} placements")
+
+
+async def update_cluster_placements(cluster: Cluster):
+    """Recomputes the placements of all applications on the cluster"""
+    placements = []
+    if cluster.onboard_status != OnboardStatus.FAILURE and cluster.metadata:
+        target_policies = await TargetPolicy.find(
+            {"$or": [label_map_condition("cluster_selector", {key: value})
+                     for key, value in cluster.metadata.items()]}).to_list()
+        if target_policies:
+            applications = await Application.find(
+                {"$or": [label_map_condition("metadata", target_policy.app_selector)
+                         for target_policy in target_policies]},
+                NE(Application.onboard_status, OnboardStatus.FAILURE)).to_list()
+            for application in applications:
+                contributing = [_target_policy_response(target_policy) for target_policy in target_policies
+                                if targets_application(target_policy, application.metadata or {})]
+                if contributing:
+                    placements.append(_placement(application, cluster, contributing))
+    await _write_placements(placements, stale={"cluster_id": cluster.id})
+
+
+async def update_application_placements(application: Application):
+    """Recomputes the placements of the application on all clusters"""
+    placements = []
+    if application.onboard_status != OnboardStatus.FAILURE and application.metadata:
+        target_policies = [target_policy for target_policy in await TargetPolicy.find(
+            {"$or": [label_map_condition("app_selector", {key: value})
+                     for key, value in application.metadata.items()]}).to_list()
+                           if targets_application(target_policy, application.metadata)]
+        if target_policies:
+            clusters = await Cluster.find(
+                {"$or": [label_map_condition("metadata", {key: value}) for target_policy in target_policies
+                         for key, value in target_policy.cluster_selector.items()]},
+                NE(Cluster.onboard_status, OnboardStatus.FAILURE)).to_list()
+            for cluster in clusters:
+                contributing = [_target_policy_response(target_policy) for target_policy in target_policies
+                                if targets_cluster(target_policy, cluster.metadata or {})]
+                if contributing:
+                    placements.append(_placement(application, cluster, contributing))
+    await _write_placements(placements, stale={"application_id": application.id})
+
+
+async def update_target_policy_placements(target_policy: TargetPolicy):
+    """Adds the target policy to the placements of the applications and clusters it selects"""
+    applications = await Application.find(label_map_condition("metadata", target_policy.app_selector),
+                                          NE(Application.onboard_status, OnboardStatus.FAILURE)).to_list()
+    if not applications:
+        return
+    clusters = await Cluster.find(
+        {"$or": [label_map_condition("metadata", {key: value})
+                 for key, value in target_policy.cluster_selector.items()]},
+        NE(Cluster.onboard_status, OnboardStatus.FAILURE)).to_list()
+    if not clusters:
+        return
+    existing = {placement.id: placement for placement in await Placement.find(
+        In(Placement.application_id, [application.id for application in applications]),
+        In(Placement.cluster_id, [cluster.id for cluster in clusters])).to_list()}
+    target_policy_response = _target_policy_response(target_policy)
+    placements = []
+    for application in applications:
+        for cluster in clusters:
+            placement = existing.get(f"{application.id}:{cluster.id}")
+            if placement is None:
+                placements.append(_placement(application, cluster, [target_policy_response]))
+                continue
+            if target_policy.id not in placement.target_policy_ids:
+                placement.target_policy_ids.append(target_policy.id)
+            if placement.target_policy.id == target_policy.id or \
+                    placement.target_policy.updated_on <= target_policy.updated_on:
+                placement.target_policy = target_policy_response
+            placement.updated_on = time.time()
+            placements.append(placement)
+    await _write_placements(placements)
+
+
+async def rebuild_placements():
+    """Recomputes the placements of all clusters"""
+    clusters = await Cluster.find(NE(Cluster.onboard_status, OnboardStatus.FAILURE)).to_list()
+    for cluster in clusters:
+        await update_cluster_placements(cluster)
+    log.info(f"Rebuilt placements of {len(clusters)} clusters")
+
+
+async def init_placements():
+    """Fills the placement collection the first time placements are enabled"""
+    if await Placement.find_all().count() == 0:
+        await rebuild_placements()
+
+
+async def get_placed_target_policies(user: User, app_name: str, cluster_name: str) -> list[TargetPolicyResponse]:
+    """Target policies placing the application on the cluster, most recently updated first, read from the placement
+    collection"""
+    placements = await Placement.find(Placement.application_name == app_name,
+                                      Placement.cluster_name == cluster_name).to_list()
+    if not placements:
+        return []
+    allowed_envs = await user.role_collection.get_environments()
+    authorized_namespaces = {namespace.name for namespace in await get_authorized_namespace_by_names(
+        user=user, namespace_names={placement.namespace for placement in placements})}
+    target_policies = [placement.target_policy for placement in placements
+                       if placement.environment in allowed_envs and placement.namespace in authorized_namespaces]
+    return sorted(target_policies, reverse=True, key=lambda target_policy: target_policy.updated_on)
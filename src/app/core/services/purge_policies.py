@@ -2,9 +2,12 @@ import copy
 from abc import ABC, abstractmethod
 from typing import Dict
 
+import numpy as np
+
 from app.core.models.applications import Application
 from app.core.models.clusters import Cluster
 from app.core.models.targetpolicies import TargetPolicy
+from app.utils.label_store import ColumnarLabelStore
 
 
 class PurgePolicy(ABC):
@@ -61,3 +64,91 @@ class ApplyOnceCronologicalOrderedPurgePolicy(PurgePolicy):
 
     def should_skip_evaluation(self, policy_under_evaluation, purge_policy, skip, skipped_purged_policies):
         return skip or purge_policy.id in skipped_purged_policies or purge_policy.updated_on < policy_under_evaluation.updated_on
+
+
+class _CompiledPurgePolicy:
+    """Selectors of a purge policy split once into value sets. consumed_by_match tells whether a match leaves no value
+    of the selector key over, which is what marks the purge policy as applied"""
+
+    def __init__(self, purge_policy: TargetPolicy):
+        self.id = purge_policy.id
+        self.app_selector = self._compile(purge_policy.app_selector)
+        self.cluster_selector = self._compile(purge_policy.cluster_selector)
+
+    @staticmethod
+    def _compile(selector: Dict[str, str] | None) -> list[tuple[str, frozenset[str], bool]] | None:
+        if selector is None:
+            return None
+        compiled = []
+        for key, value in selector.items():
+            values = value.split(",")
+            compiled.append((key, frozenset(values), len(values) == 1))
+        return compiled
+
+
+class CompiledApplyOnceCronologicalOrderedPurgePolicy(ApplyOnceCronologicalOrderedPurgePolicy):
+    """Same results as ApplyOnceCronologicalOrderedPurgePolicy, but the purge policies that apply are compiled once per
+    call instead of being deep copied and having their selector values split for every resource"""
+
+    def filter_purged(self, metadata_based_resources: list[Application | Cluster], purge_policies: set[TargetPolicy], policy_under_evaluation: TargetPolicy, **kwargs) -> list[
+        Application | Cluster]:
+        skipped_purged_policies = kwargs.pop("already_evaluate_purged_policies")
+        compiled_policies = [_CompiledPurgePolicy(p_policy) for p_policy in purge_policies
+                             if not self.should_skip_evaluation(policy_under_evaluation, p_policy, False,
+                                                                skipped_purged_policies)]
+        appOrCluster: list[Application | Cluster] = []
+        evaluated_purged_policies = set()
+        for resource in metadata_based_resources:
+            if not compiled_policies:
+                appOrCluster.append(resource)
+                continue
+            if isinstance(resource, Application):
+                selector_field = "app_selector"
+            elif isinstance(resource, Cluster):
+                selector_field = "cluster_selector"
+            else:
+                raise TypeError(f"Purge policies can not be evaluated against {type(resource).__name__}")
+            metadata: Dict[str, str] | None = resource.metadata
+            skip = False
+            for purge_policy in compiled_policies:
+                # The first purge policy matching the resource is the only one evaluated, all its keys are though
+                for key, values, consumed_by_match in getattr(purge_policy, selector_field):
+                    if metadata[key] in values:
+                        skip = True
+                        if consumed_by_match:
+                            evaluated_purged_policies.add(purge_policy.id)
+                if skip:
+                    break
+            if not skip:
+                appOrCluster.append(resource)
+        for policy in evaluated_purged_policies:
+            skipped_purged_policies.append(policy)
+        return appOrCluster
+
+    def filter_purged_mask(self, store: ColumnarLabelStore, mask: np.ndarray, purge_policies: set[TargetPolicy],
+                           policy_under_evaluation: TargetPolicy, selector_field: str,
+                           already_evaluate_purged_policies: list) -> np.ndarray:
+        """filter_purged for the documents of mask in a label store, evaluated for all of them at once. Returns the
+        mask of the documents that are not purged. selector_field is the selector of the purge policies to apply,
+        app_selector or cluster_selector"""
+        compiled_policies = [_CompiledPurgePolicy(p_policy) for p_policy in purge_policies
+                             if not self.should_skip_evaluation(policy_under_evaluation, p_policy, False,
+                                                                already_evaluate_purged_policies)]
+        remaining = mask.copy()
+        evaluated_purged_policies = set()
+        for purge_policy in compiled_policies:
+            if not remaining.any():
+                break
+            # Documents matched by an earlier purge policy are not evaluated again, the others against all keys
+            purged = np.zeros_like(remaining)
+            for key, values, consumed_by_match in getattr(purge_policy, selector_field):
+                if not store.has_label(key)[remaining].all():
+                    raise KeyError(key)
+                matched = remaining & store.isin(key, values)
+                if consumed_by_match and matched.any():
+                    evaluated_purged_policies.add(purge_policy.id)
+                purged |= matched
+            remaining &= ~purged
+        for policy in evaluated_purged_policies:
+            already_evaluate_purged_policies.append(policy)
+        return remaining
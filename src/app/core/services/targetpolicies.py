@@ -1,15 +1,24 @@
 from logging import getLogger
 
 from app.core.auth.user import User
+from app.core.config import get_settings
 from app.core.models.targetpolicies import TargetPolicy
 from app.core.services.clusters import fetch_clusters, is_allowed_on_cluster
 from app.core.services.applications import get_apps_by_selector
+from app.core.services.placements import get_placed_target_policies
 from app.utils.common import create_filter_condition
 from app.utils.common import dict_to_query_string
 from app.utils.enums import EventType, Operation
+from app.utils.label_index import target_policy_index
+from app.utils.pagination import find_page
 
 log = getLogger(__name__)
 
+settings = get_settings()
+
+selector_field_by_event_type = {EventType.CLUSTER_ONBOARDING: "cluster_selector",
+                                EventType.APP_ONBOARDING: "app_selector"}
+
 
 async def fetch_affected_target_policies(metadata, eventype):
     actualTargetPolicies = []
@@ -18,6 +27,10 @@ async def fetch_affected_target_policies(metadata, eventype):
     log.info(
         f"Fetching affected target_policies for metadata: {metadata} and eventype: {eventype}"
     )
+    if settings.LABEL_INDEX_ENABLED and target_policy_index.ready and eventype in selector_field_by_event_type:
+        # Policies whose whole selector is found in the metadata, without a query per metadata key
+        return target_policy_index.match(metadata, selector_field_by_event_type[eventype])
+
     # We will iterate through "each" metadata(key:value) pair from the onboarded cluster "metadata" object or app "metadata" object
     for key, value in metadata.items():
         queryString = None
@@ -77,6 +90,15 @@ async def fetch_target_policies(query: str = None):
     return target_policies
 
 
+async def fetch_target_policies_page(limit: int, cursor: str = None, query: str = None):
+    """Page of fetch_target_policies, see find_page"""
+    log.info(f"Fetching {limit} TargetPolicies with query: {query} after cursor: {cursor}")
+    target_policies, next_cursor = await find_page(TargetPolicy.find(create_filter_condition(query_params=query)),
+                                                   limit, cursor)
+    log.info(f"Found {len(target_policies)} TargetPolicies, next cursor: {next_cursor}")
+    return target_policies, next_cursor
+
+
 async def compare_metadata(target_policySelector, metadata):
     """A helper function to check if the metadata of the newly onboarded cluster or app matches the target_policySelector app_selector or cluster_selector
 
@@ -116,6 +138,8 @@ async def get_effective_target_policies_for_application_on_cluster(user: User,ap
         log.info(
         f"Fetching effected target_policies for application: {app_name} and Cluster: {cluster_name}"
     )
+        if settings.PLACEMENTS_ENABLED:
+            return await get_placed_target_policies(user, app_name, cluster_name)
         # Fetch the cluster metadata
         matched_clusters = await fetch_clusters(dict_to_query_string({"name": cluster_name}, parent_key="metadata"))
         if not matched_clusters:
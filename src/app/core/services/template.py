@@ -1,17 +1,43 @@
-from app.utils.template import Template,TemplateFactory
+from app.core.config import get_settings
+from app.utils.template import Template, TemplateRegistry, TemplateRenderPool
 import os
 from logging  import getLogger
 
 log = getLogger(__name__)
 
-def init_template():
-    # Define the relative path to the directory containing your templates
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    log.info(f"current file directory {current_dir}")
-    # Update with the relative path to your templates directory
-    template_dir = os.path.join(current_dir, '../../templates')
-
-    log.info(f"template directory {template_dir}")
-    template_factory = TemplateFactory()
-    template = template_factory.create_template("jinja", template_dir)
-    return template
\ No newline at end of file
+settings = get_settings()
+
+# Define the relative path to the directory containing your templates
+template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../templates')
+
+template_registry = TemplateRegistry()
+
+render_pool = None
+
+
+def init_template() -> Template:
+    """Returns the shared jinja template, compiled templates are reused across requests"""
+    return template_registry.get(settings.TEMPLATE_TYPE, template_dir, settings.TEMPLATE_BYTECODE_CACHE_DIRECTORY)
+
+
+def compile_templates():
+    log.info(f"Compiling templates of {template_dir}")
+    template = init_template()
+    template.compile_all()
+    return template
+
+
+def get_render_pool() -> TemplateRenderPool | None:
+    """Process pool for rendering manifests, None if MANIFEST_RENDER_PROCESSES is not set"""
+    global render_pool
+    if render_pool is None and settings.MANIFEST_RENDER_PROCESSES > 0:
+        render_pool = TemplateRenderPool(settings.MANIFEST_RENDER_PROCESSES, settings.TEMPLATE_TYPE, template_dir)
+    return render_pool
+
+
+def shutdown_render_pool():
+    """Stops the worker processes of the render pool, a later get_render_pool starts new ones"""
+    global render_pool
+    if render_pool is not None:
+        render_pool.shutdown()
+        render_pool = None
@@ -1,4 +1,11 @@
+import os
+import tempfile
+
+import git
 import pytest
+
+from app.core.auth.user import User
+from app.utils import git_handler
 from app.tests.test_data.clusters import *
 from app.tests.test_data.applications import *
 from app.tests.test_data.namespaces import *
@@ -57,3 +64,65 @@ def app_payload_missing_required():
 @pytest.fixture(autouse=True)
 def app_post_in_valid_payload():
     return app_post_in_valid_payload_data
+
+
+### Manifest repository test config
+
+class GitOrigin:
+    """Bare manifest repository served over file://, seeded with one commit of files on main"""
+
+    actor = git.Actor("upstream", "upstream@example.com")
+
+    def __init__(self, folder, files: dict):
+        self.folder = folder
+        seed = git.Repo.init(folder / "seed", initial_branch="main")
+        self._commit(seed, files, "seed")
+        self.repo = git.Repo.clone_from(seed.working_dir, folder / "origin.git", bare=True)
+        # allows partial clones
+        self.repo.git.config("uploadpack.allowFilter", "true")
+        self.url = f"file://{self.repo.git_dir}"
+
+    def _commit(self, repo: git.Repo, files: dict, message: str):
+        for path, content in files.items():
+            os.makedirs(os.path.dirname(os.path.join(repo.working_dir, path)), exist_ok=True)
+            with open(os.path.join(repo.working_dir, path), "w") as f:
+                f.write(content)
+        repo.index.add(list(files))
+        repo.index.commit(message, author=self.actor, committer=self.actor)
+
+    def push(self, files: dict, message: str = "upstream change"):
+        """Commits files on top of main from another clone, as a concurrent writer would"""
+        clone = git.Repo.clone_from(self.url, tempfile.mkdtemp(dir=self.folder), branch="main")
+        self._commit(clone, files, message)
+        clone.remotes.origin.push("main")
+
+    def read(self, path: str):
+        """Content of path on main, None if there is no such file"""
+        try:
+            return self.repo.git.show(f"main:{path}")
+        except git.GitCommandError:
+            return None
+
+    def messages(self) -> list[str]:
+        """Commit messages of main, latest first"""
+        return [commit.message.strip() for commit in self.repo.iter_commits("main")]
+
+
+@pytest.fixture()
+def git_origin(tmp_path):
+    return GitOrigin(tmp_path / "origin", {"README.md": "manifests",
+                                           "ieb/cluster1/consumer/app1.yaml": "name: app1",
+                                           "ieb/cluster2/consumer/app2.yaml": "name: app2"})
+
+
+@pytest.fixture()
+def git_workspaces(tmp_path, monkeypatch):
+    """Warm clones are made below tmp_path and not shared with other tests"""
+    monkeypatch.setattr(git_handler.settings, "GIT_WARM_CLONE_DIRECTORY", str(tmp_path / "warm"))
+    monkeypatch.setattr(git_handler, "_warm_workspaces", {})
+    return git_handler.settings
+
+
+@pytest.fixture()
+def git_user():
+    return User(name="bot", claims={"email": "bot@example.com"})
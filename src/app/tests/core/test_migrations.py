@@ -0,0 +1,47 @@
+import asyncio
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.migrations import backfill_labels, backfill_namespace_groups
+from app.core.models.applications import Application
+from app.core.models.clusters import Cluster
+from app.core.models.namespaces import Namespace
+from app.core.models.targetpolicies import TargetPolicy
+
+
+def test_backfill_labels_fills_documents_saved_without_labels():
+    async def scenario():
+        await init_beanie(database=AsyncMongoMockClient().get_database(name="migrations"),
+                          document_models=[Application, Cluster, TargetPolicy])
+        await Cluster.get_motor_collection().insert_many([
+            {"_id": "c1", "name": "c1", "metadata": {"region": "eu", "gpu": "true"}},
+            {"_id": "c2", "name": "c2"}])
+        await TargetPolicy.get_motor_collection().insert_one(
+            {"_id": "tp1", "name": "tp1", "app_selector": {"name": "app1"}, "cluster_selector": {"gpu": "true"}})
+        saved = await Application(_id="a1", name="a1", metadata={"name": "a1"}).insert()
+
+        await backfill_labels()
+
+        assert (await Cluster.get("c1")).labels == ["region=eu", "gpu=true"]
+        assert (await Cluster.get("c2")).labels == []
+        target_policy = await TargetPolicy.get("tp1")
+        assert target_policy.app_selector_labels == ["name=app1"]
+        assert target_policy.cluster_selector_labels == ["gpu=true"]
+        assert (await Application.get(saved.id)).labels == ["name=a1"]
+
+    asyncio.run(scenario())
+
+
+def test_backfill_namespace_groups_derives_environments():
+    async def scenario():
+        await init_beanie(database=AsyncMongoMockClient().get_database(name="migrations"),
+                          document_models=[Namespace])
+        await Namespace.get_motor_collection().insert_one(
+            {"_id": "n1", "name": "ns1", "group": ["team1-dev", "team-two-prod", "team1-prod"]})
+
+        await backfill_namespace_groups()
+
+        assert (await Namespace.get("n1")).environments == ["dev", "prod"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.models import models
+from app.core.models.models import reconcile_indexes
+from app.core.models.namespaces import Namespace
+
+
+def test_reconcile_indexes_creates_missing_and_reports_undeclared_indexes(caplog):
+    async def scenario():
+        database = AsyncMongoMockClient().get_database(name="indexes")
+        await database["Cluster"].create_index("short_name")
+        await reconcile_indexes(database)
+        return await database["Cluster"].index_information(), await database["ClusterState"].index_information()
+
+    with caplog.at_level(logging.INFO):
+        cluster_indexes, cluster_state_indexes = asyncio.run(scenario())
+    assert {"name_1_onboard_status_1", "environment_1", "labels_1", "short_name_1"} <= set(cluster_indexes)
+    assert cluster_state_indexes["cluster._id_1"]["unique"]
+    assert "Indexes ['short_name_1'] of Cluster are not declared by Cluster" in caplog.text
+
+
+def test_index_that_cannot_be_created_is_left_out_of_init_beanie_only(caplog, monkeypatch):
+    declared = [index.document["name"] for index in Namespace.Settings.indexes]
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(models.motor.motor_asyncio, "AsyncIOMotorClient", lambda connection_string: client)
+
+    async def scenario():
+        database = client.get_database(name="indexes")
+        await database["Namespace"].insert_many([{"_id": "1", "name": "ns"}, {"_id": "2", "name": "ns"}])
+        await models.init_odm(SimpleNamespace(AZURE_COSMOS_CONNECTION_STRING="mongodb://db",
+                                              AZURE_COSMOS_DATABASE_NAME="indexes"))
+        return await database["Namespace"].index_information()
+
+    namespace_indexes = asyncio.run(scenario())
+    assert "name_1" not in namespace_indexes
+    assert {"group_1", "environments_1"} <= set(namespace_indexes)
+    assert "Unable to create index name_1 of Namespace" in caplog.text
+    assert [index.document["name"] for index in Namespace.Settings.indexes] == declared == [
+        "name_1", "group_1", "environments_1"]
@@ -0,0 +1,46 @@
+import asyncio
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.auth.rbac import RoleCollection, Role
+from app.core.auth.user import User
+from app.core.models.applications import Application
+from app.core.models.namespaces import Namespace
+from app.core.services.applications import fetch_applications, fetch_applications_page
+
+
+def user(*roles):
+    role_collection = RoleCollection()
+    role_collection.add_roles([Role(app_name, env, role) for app_name, env, role in roles])
+    return User(name="user", role_collection=role_collection)
+
+
+async def init():
+    await init_beanie(database=AsyncMongoMockClient().get_database(name="applications"),
+                      document_models=[Application, Namespace])
+    await Namespace(_id="n1", name="ns1", group=["team1-dev"]).insert()
+    await Namespace(_id="n2", name="ns2", group=["team2-prod"]).insert()
+    for name, namespace in [("a1", "ns1"), ("a2", "ns2"), ("a3", "ns1"), ("a4", "unknown")]:
+        await Application(_id=name, name=name, namespace=namespace).insert()
+
+
+def test_fetch_applications_only_returns_applications_of_authorized_namespaces():
+    async def scenario():
+        await init()
+        return ([app.id for app in await fetch_applications(None, user(("team1", "dev", "reader")))],
+                [app.id for app in await fetch_applications(None, user(("plat", "prod", "admin")))],
+                await fetch_applications(None, user()))
+
+    assert asyncio.run(scenario()) == (["a1", "a3"], ["a2"], [])
+
+
+def test_fetch_applications_page_is_filled_with_authorized_applications():
+    async def scenario():
+        await init()
+        team1 = user(("team1", "dev", "reader"))
+        first_page, cursor = await fetch_applications_page(None, team1, limit=1)
+        second_page, last_cursor = await fetch_applications_page(None, team1, limit=1, cursor=cursor)
+        return [app.id for app in first_page], [app.id for app in second_page], last_cursor
+
+    assert asyncio.run(scenario()) == (["a1"], ["a3"], None)
@@ -0,0 +1,117 @@
+import asyncio
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.models.clusterstate import ClusterState
+from app.core.schemas.applications import ApplicationResponse
+from app.core.schemas.clusters import ClusterResponse
+from app.core.services.clusterstate import ClusterStateRepository
+
+
+def application(name):
+    return ApplicationResponse(_id=name, name=name, repo_url="https://github.com/org/repo.git", repo_branch="main",
+                               repo_path=f"apps/{name}", namespace=f"{name}-ns")
+
+
+def cluster_state(cluster_id, *applications, id=None):
+    return ClusterState(id=id, cluster=ClusterResponse(_id=cluster_id, name=cluster_id),
+                        applications=[application(name) for name in applications])
+
+
+async def init_cluster_states():
+    await init_beanie(database=AsyncMongoMockClient().get_database(name="cluster_states"),
+                      document_models=[ClusterState])
+
+
+def test_load_fetches_the_states_of_all_clusters_in_one_query(monkeypatch):
+    queries = []
+    find = ClusterState.find
+
+    def recording_find(*args, **kwargs):
+        query = find(*args, **kwargs)
+        queries.append(query.get_filter_query())
+        return query
+
+    async def scenario():
+        await init_cluster_states()
+        await cluster_state("c1", "a1", id="s1").insert()
+        await cluster_state("c2", id="s2").insert()
+        monkeypatch.setattr(ClusterState, "find", recording_find)
+        cluster_states = ClusterStateRepository()
+        states = await cluster_states.load(["c1", "c2", "c3"])
+        await cluster_states.load(["c1", "c2"])
+        return cluster_states, states
+
+    cluster_states, states = asyncio.run(scenario())
+    assert queries == [{"cluster._id": {"$in": ["c1", "c2", "c3"]}}]
+    assert sorted(states) == ["c1", "c2"]
+    assert [app.name for app in cluster_states.get("c1").applications] == ["a1"]
+    assert cluster_states.get("c3") is None
+
+
+def test_save_upserts_the_changed_states_in_one_unordered_bulk_write(monkeypatch):
+    bulk_writes = []
+
+    async def scenario():
+        await init_cluster_states()
+        await cluster_state("c1", "a1", id="s1").insert()
+        await cluster_state("c2", "a2", id="s2").insert()
+        collection = ClusterState.get_motor_collection()
+        bulk_write = collection.bulk_write
+
+        async def recording_bulk_write(requests, **kwargs):
+            bulk_writes.append((requests, kwargs))
+            return await bulk_write(requests, **kwargs)
+
+        monkeypatch.setattr(collection, "bulk_write", recording_bulk_write)
+
+        cluster_states = ClusterStateRepository()
+        assert await cluster_states.save()
+        await cluster_states.load(["c1", "c2", "c3"])
+        changed = cluster_states.get("c1")
+        changed.applications.append(application("a3"))
+        cluster_states.put(changed)
+        cluster_states.put(cluster_state("c3", "a1"))
+        assert await cluster_states.save()
+        assert await cluster_states.save()
+        return {state.cluster.id: [app.name for app in state.applications]
+                for state in await ClusterState.find_all().to_list()}
+
+    saved = asyncio.run(scenario())
+    assert saved == {"c1": ["a1", "a3"], "c2": ["a2"], "c3": ["a1"]}
+    [(requests, kwargs)] = bulk_writes
+    assert kwargs == {"ordered": False}
+    assert [(request._filter, request._upsert) for request in requests] == [
+        ({"cluster._id": "c1"}, True), ({"cluster._id": "c3"}, True)]
+    assert requests[0]._doc["$setOnInsert"] == {"_id": "s1"}
+
+
+def test_states_saved_concurrently_for_a_new_cluster_update_one_document():
+    async def scenario():
+        await init_cluster_states()
+        first, second = ClusterStateRepository(), ClusterStateRepository()
+        await first.load(["c1"])
+        await second.load(["c1"])
+        first.put(cluster_state("c1", "a1"))
+        second.put(cluster_state("c1", "a2"))
+        assert await first.save()
+        assert await second.save()
+        return await ClusterState.find_all().to_list()
+
+    [state] = asyncio.run(scenario())
+    assert [app.name for app in state.applications] == ["a2"]
+
+
+def test_upsert_cluster_state_creates_the_state_and_keeps_its_applications():
+    async def scenario():
+        await init_cluster_states()
+        cluster = ClusterResponse(_id="c1", name="c1")
+        await ClusterStateRepository.upsert_cluster_state("c1", cluster, [application("a1")])
+        await ClusterStateRepository.upsert_cluster_state("c1", ClusterResponse(_id="c1", name="renamed"), None)
+        return await ClusterState.find_all().to_list()
+
+    [state] = asyncio.run(scenario())
+    assert state.id is not None
+    assert state.cluster.name == "renamed"
+    assert [app.name for app in state.applications] == ["a1"]
@@ -0,0 +1,78 @@
+import os
+
+from app.core.schemas.applications import ApplicationResponse
+from app.core.schemas.clusters import ClusterResponse
+from app.core.services.manifest import manifest_digest, render_if_changed
+from app.utils.constants import TEMPLATES_BASE_PATH, ARGOCD_APPLICATION_TEMPLATE_NAME
+from app.utils.manifest import prepare_consumer_application_data
+from app.utils.manifest_sink import FileSystemManifestSink, ManifestWriter, git_blob_id
+from app.utils.template import TemplateFactory
+
+template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../templates')
+application_template_name = f"{TEMPLATES_BASE_PATH}/{ARGOCD_APPLICATION_TEMPLATE_NAME}"
+
+
+class RecordingSink(FileSystemManifestSink):
+    def __init__(self):
+        self.written = []
+
+    def write(self, path: str, content: str) -> bool:
+        self.written.append(path)
+        return super().write(path, content)
+
+
+def application_data(target_policy_id="tp1", repo_branch="main"):
+    application = ApplicationResponse(_id="a1", name="app1", repo_url="https://github.com/org/repo.git",
+                                      repo_branch=repo_branch, repo_path="apps/app1", namespace="app1-ns")
+    return prepare_consumer_application_data(application, ClusterResponse(_id="c1", name="cluster1"), target_policy_id)
+
+
+def render(sink, cluster_dir, render_data, digests):
+    writer = ManifestWriter(TemplateFactory.create_template("native", template_dir), sink)
+    return render_if_changed(writer, application_template_name, f"{cluster_dir}/consumer", "app1.yaml", render_data,
+                             digests, cluster_dir)
+
+
+def test_manifest_digest_covers_template_and_whole_render_data():
+    data = application_data()
+    assert manifest_digest(application_template_name, data) == manifest_digest(application_template_name,
+                                                                                application_data())
+    assert manifest_digest(application_template_name, data) != manifest_digest("other.j2", data)
+    assert manifest_digest(application_template_name, data) != manifest_digest(application_template_name,
+                                                                                application_data("tp2"))
+
+
+def test_unchanged_manifest_is_skipped(tmp_path):
+    sink, digests = RecordingSink(), {}
+    assert render(sink, str(tmp_path), application_data(), digests)
+    assert render(sink, str(tmp_path), application_data(), digests)
+
+    assert sink.written == [f"{tmp_path}/consumer/app1.yaml"]
+    content = (tmp_path / "consumer" / "app1.yaml").read_bytes()
+    assert digests["consumer/app1.yaml"].blob == git_blob_id(content)
+    assert digests["consumer/app1.yaml"].input == manifest_digest(application_template_name, application_data())
+
+
+def test_manifest_with_changed_input_is_rewritten(tmp_path):
+    sink, digests = RecordingSink(), {}
+    render(sink, str(tmp_path), application_data(), digests)
+    render(sink, str(tmp_path), application_data(repo_branch="release"), digests)
+    render(sink, str(tmp_path), application_data("tp2", repo_branch="release"), digests)
+
+    assert len(sink.written) == 3
+    assert b"tp2" in (tmp_path / "consumer" / "app1.yaml").read_bytes()
+    assert digests["consumer/app1.yaml"].input == manifest_digest(application_template_name,
+                                                                  application_data("tp2", repo_branch="release"))
+
+
+def test_manifest_modified_in_repository_is_rewritten(tmp_path):
+    sink, digests = RecordingSink(), {}
+    render(sink, str(tmp_path), application_data(), digests)
+    content = (tmp_path / "consumer" / "app1.yaml").read_bytes()
+    (tmp_path / "consumer" / "app1.yaml").write_text("edited by hand")
+    render(sink, str(tmp_path), application_data(), digests)
+    (tmp_path / "consumer" / "app1.yaml").unlink()
+    render(sink, str(tmp_path), application_data(), digests)
+
+    assert len(sink.written) == 3
+    assert (tmp_path / "consumer" / "app1.yaml").read_bytes() == content
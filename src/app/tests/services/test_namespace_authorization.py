@@ -0,0 +1,43 @@
+import asyncio
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.auth.rbac import RoleCollection, Role
+from app.core.auth.user import User
+from app.core.models.namespaces import Namespace
+from app.core.services.namespaces import get_authorized_namespace_by_names, is_part_of_namespace_group
+from app.utils.authorization_cache import authorized_namespace_cache, namespace_membership_cache, \
+    clear_namespace_authorization_caches
+
+
+def user(name, *roles):
+    role_collection = RoleCollection()
+    role_collection.add_roles([Role(app_name, env, role) for app_name, env, role in roles])
+    return User(name=name, role_collection=role_collection)
+
+
+def test_authorization_decisions_are_cached_per_group_set_until_a_namespace_changes():
+    async def scenario():
+        await init_beanie(database=AsyncMongoMockClient().get_database(name="namespace_authorization"),
+                          document_models=[Namespace])
+        clear_namespace_authorization_caches()
+        await Namespace(_id="n1", name="ns1", group=["team1-dev"]).insert()
+        alice, bob = user("alice", ("team1", "dev", "reader")), user("bob", ("team1", "dev", "reader"))
+
+        assert await is_part_of_namespace_group(alice, "ns1")
+        assert not await is_part_of_namespace_group(alice, "ns2")
+        assert [namespace.name for namespace in await get_authorized_namespace_by_names(alice, {"ns1", "ns2"})] == [
+            "ns1"]
+        misses = namespace_membership_cache.misses, authorized_namespace_cache.misses
+
+        await Namespace.get_motor_collection().delete_many({})
+        assert await is_part_of_namespace_group(bob, "ns1")
+        assert [namespace.name for namespace in await get_authorized_namespace_by_names(bob, ["ns1"])] == ["ns1"]
+        assert (namespace_membership_cache.misses, authorized_namespace_cache.misses) == misses
+
+        await Namespace(_id="n2", name="ns2", group=["team1-dev"]).insert()
+        assert await is_part_of_namespace_group(bob, "ns2")
+        assert not await is_part_of_namespace_group(bob, "ns1")
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import asyncio
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.models.applications import Application
+from app.core.models.clusters import Cluster
+from app.core.models.placements import Placement
+from app.core.models.targetpolicies import TargetPolicy
+from app.core.services.placements import update_target_policy_placements, update_cluster_placements, \
+    update_application_placements, rebuild_placements
+from app.utils.enums import OnboardStatus, Operation
+
+
+async def init():
+    await init_beanie(database=AsyncMongoMockClient().get_database(name="placements"),
+                      document_models=[Application, Cluster, TargetPolicy, Placement])
+
+
+def cluster(name, **metadata):
+    return Cluster(_id=name, name=name, environment="dev", onboard_status=OnboardStatus.COMPLETED,
+                   metadata={"name": name, **metadata})
+
+
+def application(name, **metadata):
+    return Application(_id=name, name=name, namespace="ns", onboard_status=OnboardStatus.COMPLETED,
+                       metadata={"name": name, **metadata})
+
+
+def target_policy(name, updated_on, app_selector, cluster_selector):
+    return TargetPolicy(_id=name, name=name, operation=Operation.CREATE, updated_on=updated_on,
+                        app_selector=app_selector, cluster_selector=cluster_selector)
+
+
+async def placements():
+    return {placement.id: (sorted(placement.target_policy_ids), placement.target_policy.name)
+            for placement in await Placement.find_all().to_list()}
+
+
+def test_placements_are_updated_incrementally():
+    async def scenario():
+        await init()
+        for document in [cluster("c1", gpu="true"), cluster("c2", gpu="false"), application("a1", need_gpu="true"),
+                         application("a2", need_gpu="false")]:
+            await document.insert()
+
+        tp1 = await target_policy("tp1", 1.0, {"need_gpu": "true"}, {"gpu": "true"}).insert()
+        await update_target_policy_placements(tp1)
+        assert await placements() == {"a1:c1": (["tp1"], "tp1")}
+
+        tp2 = await target_policy("tp2", 2.0, {"need_gpu": "true"}, {"gpu": "true"}).insert()
+        await update_target_policy_placements(tp2)
+        assert await placements() == {"a1:c1": (["tp1", "tp2"], "tp2")}
+
+        c3 = await cluster("c3", gpu="true").insert()
+        await update_cluster_placements(c3)
+        a3 = await application("a3", need_gpu="true").insert()
+        await update_application_placements(a3)
+        incremental = await placements()
+        assert incremental == {"a1:c1": (["tp1", "tp2"], "tp2"), "a1:c3": (["tp1", "tp2"], "tp2"),
+                               "a3:c1": (["tp1", "tp2"], "tp2"), "a3:c3": (["tp1", "tp2"], "tp2")}
+
+        await Placement.find_all().delete()
+        await rebuild_placements()
+        assert await placements() == incremental
+
+    asyncio.run(scenario())
+
+
+def test_failed_cluster_has_no_placements():
+    async def scenario():
+        await init()
+        await application("a1", need_gpu="true").insert()
+        c1 = await cluster("c1", gpu="true").insert()
+        tp1 = await target_policy("tp1", 1.0, {"need_gpu": "true"}, {"gpu": "true"}).insert()
+        await update_target_policy_placements(tp1)
+        assert list(await placements()) == ["a1:c1"]
+
+        c1.onboard_status = OnboardStatus.FAILURE
+        await update_cluster_placements(c1)
+        assert await placements() == {}
+
+    asyncio.run(scenario())
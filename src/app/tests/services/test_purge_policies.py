@@ -0,0 +1,140 @@
+import asyncio
+import random
+
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.models.applications import Application
+from app.core.models.clusters import Cluster
+from app.core.models.targetpolicies import TargetPolicy
+from app.core.services.purge_policies import ApplyOnceCronologicalOrderedPurgePolicy, \
+    CompiledApplyOnceCronologicalOrderedPurgePolicy
+from app.utils.common import matches_selector
+from app.utils.enums import Operation
+from app.utils.label_store import ColumnarLabelStore
+
+KEYS = ["region", "tier", "zone"]
+VALUES = ["eu", "us", "ap", "gold"]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def models():
+    asyncio.run(init_beanie(database=AsyncMongoMockClient().get_database(name="purge"),
+                            document_models=[Application, Cluster, TargetPolicy]))
+
+
+def random_selector(rng):
+    return {key: ",".join(rng.choice(VALUES) for _ in range(rng.randint(1, 3)))
+            for key in rng.sample(KEYS, rng.randint(1, len(KEYS)))}
+
+
+def random_metadata(rng):
+    # Mostly complete metadata, sometimes a key is missing, which fails both evaluators
+    keys = KEYS if rng.random() < 0.9 else rng.sample(KEYS, len(KEYS) - 1)
+    return {key: rng.choice(VALUES) for key in keys}
+
+
+def random_policy(rng, name, operation):
+    return TargetPolicy(_id=name, name=name, operation=operation, updated_on=float(rng.randint(0, 5)),
+                        app_selector=random_selector(rng), cluster_selector=random_selector(rng))
+
+
+def random_resource(rng, name):
+    if rng.random() < 0.5:
+        return Application(_id=name, name=name, metadata=random_metadata(rng))
+    return Cluster(_id=name, name=name, metadata=random_metadata(rng))
+
+
+def evaluate(evaluator, deployment):
+    """Filters the resources of every policy of a deployment like create_deployment_object does"""
+    resources, purge_policies, policies = deployment
+    already_evaluate_purged_policies = []
+    results = []
+    for policy in policies:
+        try:
+            matched = evaluator.filter_purged(metadata_based_resources=resources, purge_policies=purge_policies,
+                                              policy_under_evaluation=policy,
+                                              already_evaluate_purged_policies=already_evaluate_purged_policies)
+        except (KeyError, TypeError):
+            return results, "error"
+        results.append(([resource.id for resource in matched], sorted(already_evaluate_purged_policies)))
+    return results, None
+
+
+def test_compiled_purge_policy_matches_reference_implementation():
+    rng = random.Random(20230605)
+    for _ in range(300):
+        resources = [random_resource(rng, f"r{i}") for i in range(rng.randint(0, 12))]
+        purge_policies = {random_policy(rng, f"p{i}", Operation.PURGE) for i in range(rng.randint(0, 5))}
+        policies = [random_policy(rng, f"t{i}", Operation.CREATE) for i in range(rng.randint(1, 3))]
+        deployment = (resources, purge_policies, policies)
+        assert evaluate(CompiledApplyOnceCronologicalOrderedPurgePolicy(), deployment) == \
+               evaluate(ApplyOnceCronologicalOrderedPurgePolicy(), deployment)
+
+
+def evaluate_vectorized(deployment, selector_field):
+    """Filters the resources of every policy of a deployment like create_deployment_object does with numpy"""
+    resources, purge_policies, policies = deployment
+    store = ColumnarLabelStore(resources)
+    evaluator = CompiledApplyOnceCronologicalOrderedPurgePolicy()
+    already_evaluate_purged_policies = []
+    results = []
+    for policy in policies:
+        try:
+            kept = evaluator.filter_purged_mask(store, store.mask(getattr(policy, selector_field)), purge_policies,
+                                                policy, selector_field, already_evaluate_purged_policies)
+        except KeyError:
+            return results, "error"
+        results.append(([resource.id for resource in store.select(kept)], sorted(already_evaluate_purged_policies)))
+    return results, None
+
+
+def evaluate_per_resource(deployment, selector_field):
+    resources, purge_policies, policies = deployment
+    evaluator = CompiledApplyOnceCronologicalOrderedPurgePolicy()
+    already_evaluate_purged_policies = []
+    results = []
+    for policy in policies:
+        matched = [resource for resource in resources if matches_selector(resource.metadata,
+                                                                          getattr(policy, selector_field))]
+        try:
+            matched = evaluator.filter_purged(metadata_based_resources=matched, purge_policies=purge_policies,
+                                              policy_under_evaluation=policy,
+                                              already_evaluate_purged_policies=already_evaluate_purged_policies)
+        except KeyError:
+            return results, "error"
+        results.append(([resource.id for resource in matched], sorted(already_evaluate_purged_policies)))
+    return results, None
+
+
+def test_vectorized_purge_policy_matches_per_resource_evaluation():
+    rng = random.Random(20230612)
+    for _ in range(300):
+        document, selector_field = rng.choice([(Application, "app_selector"), (Cluster, "cluster_selector")])
+        resources = [document(_id=f"r{i}", name=f"r{i}", metadata=random_metadata(rng))
+                     for i in range(rng.randint(0, 12))]
+        purge_policies = {random_policy(rng, f"p{i}", Operation.PURGE) for i in range(rng.randint(0, 5))}
+        policies = [random_policy(rng, f"t{i}", Operation.CREATE) for i in range(rng.randint(1, 3))]
+        deployment = (resources, purge_policies, policies)
+        assert evaluate_vectorized(deployment, selector_field) == evaluate_per_resource(deployment, selector_field)
+
+
+def test_purge_policy_with_single_value_is_applied_once():
+    purge = TargetPolicy(_id="p", name="p", operation=Operation.PURGE, updated_on=2.0,
+                         cluster_selector={"region": "eu"}, app_selector={"region": "eu"})
+    policy = TargetPolicy(_id="t", name="t", operation=Operation.CREATE, updated_on=1.0,
+                          cluster_selector={"region": "eu"})
+    clusters = [Cluster(_id="c1", name="c1", metadata={"region": "eu"}),
+                Cluster(_id="c2", name="c2", metadata={"region": "us"})]
+    already_evaluate_purged_policies = []
+    evaluator = CompiledApplyOnceCronologicalOrderedPurgePolicy()
+    first = evaluator.filter_purged(metadata_based_resources=clusters, purge_policies={purge},
+                                    policy_under_evaluation=policy,
+                                    already_evaluate_purged_policies=already_evaluate_purged_policies)
+    second = evaluator.filter_purged(metadata_based_resources=clusters, purge_policies={purge},
+                                     policy_under_evaluation=policy,
+                                     already_evaluate_purged_policies=already_evaluate_purged_policies)
+    assert [c.id for c in first] == ["c2"]
+    assert [c.id for c in second] == ["c1", "c2"]
+    assert already_evaluate_purged_policies == ["p"]
@@ -0,0 +1,156 @@
+import asyncio
+import os
+
+from app.utils import git_handler
+from app.utils.commit_coordinator import CommitCoordinator, _PendingChange
+from app.utils.constants import GIT_COMMIT_MESSAGE
+
+
+def write(files: dict, result=True, error: Exception = None, calls: list = None):
+    """Change writing files into the working copy, then returning result or raising error"""
+
+    async def generate(git_manager) -> bool:
+        if calls is not None:
+            calls.append(git_manager)
+        for path, content in files.items():
+            os.makedirs(os.path.dirname(os.path.join(git_manager.local_folder, path)), exist_ok=True)
+            with open(os.path.join(git_manager.local_folder, path), "w") as f:
+                f.write(content)
+        if error is not None:
+            raise error
+        return result
+
+    return generate
+
+
+def test_changes_submitted_within_the_window_share_one_commit(git_origin, git_workspaces, git_user):
+    async def scenario():
+        coordinator = CommitCoordinator(git_origin.url, "main", window_seconds=0.5, max_changes=50)
+        first = asyncio.create_task(coordinator.submit(write({"ieb/c1/a.yaml": "a"}), git_user))
+        await asyncio.sleep(0.05)
+        second = coordinator.submit(write({"ieb/c2/b.yaml": "b"}), git_user)
+        results = await asyncio.gather(first, second)
+        later = await coordinator.submit(write({"ieb/c3/c.yaml": "c"}), git_user)
+        return results, later
+
+    assert asyncio.run(scenario()) == ([True, True], True)
+    assert git_origin.messages() == [GIT_COMMIT_MESSAGE, f"{GIT_COMMIT_MESSAGE} (2 changes)", "seed"]
+    assert [git_origin.read(path) for path in ["ieb/c1/a.yaml", "ieb/c2/b.yaml", "ieb/c3/c.yaml"]] == ["a", "b", "c"]
+
+
+def test_full_batch_is_committed_without_waiting_for_the_window(git_origin, git_workspaces, git_user):
+    async def scenario():
+        coordinator = CommitCoordinator(git_origin.url, "main", window_seconds=60, max_changes=2)
+        return await asyncio.wait_for(asyncio.gather(
+            *[coordinator.submit(write({f"ieb/c{i}/app.yaml": str(i)}), git_user) for i in range(4)]), timeout=30)
+
+    assert asyncio.run(scenario()) == [True] * 4
+    assert git_origin.messages() == [f"{GIT_COMMIT_MESSAGE} (2 changes)"] * 2 + ["seed"]
+
+
+def test_each_caller_gets_the_result_of_its_own_change(git_origin, git_workspaces, git_user):
+    async def scenario():
+        coordinator = CommitCoordinator(git_origin.url, "main", window_seconds=0.2, max_changes=50)
+        return await asyncio.gather(
+            coordinator.submit(write({"ieb/cluster1/consumer/app1.yaml": "changed"}), git_user),
+            coordinator.submit(write({"ieb/cluster1/consumer/app1.yaml": "broken", "ieb/c2/b.yaml": "b"},
+                                     error=ValueError("boom")), git_user),
+            coordinator.submit(write({"ieb/c3/c.yaml": "c"}, result=False), git_user),
+            coordinator.submit(write({"ieb/c4/d.yaml": "d"}), git_user))
+
+    assert asyncio.run(scenario()) == [True, False, False, True]
+    assert git_origin.messages() == [f"{GIT_COMMIT_MESSAGE} (2 changes)", "seed"]
+    assert git_origin.read("ieb/cluster1/consumer/app1.yaml") == "changed"
+    assert git_origin.read("ieb/c2/b.yaml") is None
+    assert git_origin.read("ieb/c3/c.yaml") is None
+    assert git_origin.read("ieb/c4/d.yaml") == "d"
+
+
+def test_failed_change_is_rolled_back_without_the_rest_of_the_batch(git_origin, git_workspaces, git_user):
+    async def remove_and_fail(git_manager) -> bool:
+        os.remove(os.path.join(git_manager.local_folder, "ieb/cluster2/consumer/app2.yaml"))
+        return await write({"ieb/cluster1/consumer/app1.yaml": "broken", "ieb/c3/junk.yaml": "junk"},
+                           error=ValueError("boom"))(git_manager)
+
+    async def scenario():
+        async with git_handler.manifest_workspace(git_origin.url, "main") as git_manager:
+            applied = await CommitCoordinator._apply(git_manager, _PendingChange(
+                write({"ieb/cluster1/consumer/app1.yaml": "changed", "ieb/c2/b.yaml": "b"}), git_user, None))
+            failed = await CommitCoordinator._apply(git_manager, _PendingChange(remove_and_fail, git_user, None))
+            repo = git_manager.git_manager.repo
+            staged = sorted(repo.git.diff("--cached", "--name-only").splitlines())
+            status = repo.git.status("--porcelain", "--untracked-files=all").splitlines()
+            return applied, failed, staged, status
+
+    applied, failed, staged, status = asyncio.run(scenario())
+    assert (applied, failed) == (True, False)
+    assert staged == ["ieb/c2/b.yaml", "ieb/cluster1/consumer/app1.yaml"]
+    assert sorted(status) == ["A  ieb/c2/b.yaml", "M  ieb/cluster1/consumer/app1.yaml"]
+
+
+def test_rejected_push_generates_the_batch_again(git_origin, git_workspaces, git_user):
+    calls = []
+
+    async def generate(git_manager) -> bool:
+        if not calls:
+            git_origin.push({"ieb/cluster2/consumer/app2.yaml": "upstream"})
+        return await write({"ieb/cluster1/consumer/app1.yaml": "changed"}, calls=calls)(git_manager)
+
+    async def scenario():
+        coordinator = CommitCoordinator(git_origin.url, "main", window_seconds=0, max_changes=50, push_attempts=3)
+        return await coordinator.submit(generate, git_user)
+
+    assert asyncio.run(scenario())
+    assert len(calls) == 2
+    assert git_origin.messages() == [GIT_COMMIT_MESSAGE, "upstream change", "seed"]
+    assert git_origin.read("ieb/cluster1/consumer/app1.yaml") == "changed"
+    assert git_origin.read("ieb/cluster2/consumer/app2.yaml") == "upstream"
+
+
+def test_batch_fails_once_every_push_attempt_is_rejected(git_origin, git_workspaces, git_user):
+    calls = []
+
+    async def generate(git_manager) -> bool:
+        git_origin.push({"ieb/cluster2/consumer/app2.yaml": f"upstream {len(calls)}"})
+        return await write({"ieb/cluster1/consumer/app1.yaml": "changed"}, calls=calls)(git_manager)
+
+    async def scenario():
+        coordinator = CommitCoordinator(git_origin.url, "main", window_seconds=0, max_changes=50, push_attempts=3)
+        return await asyncio.gather(coordinator.submit(generate, git_user),
+                                    coordinator.submit(write({"ieb/c2/b.yaml": "b"}), git_user))
+
+    assert asyncio.run(scenario()) == [False, False]
+    assert len(calls) == 3
+    assert git_origin.messages() == ["upstream change"] * 3 + ["seed"]
+    assert git_origin.read("ieb/cluster1/consumer/app1.yaml") == "name: app1"
+
+
+def test_sparse_checkout_of_a_batch_covers_the_paths_of_all_its_changes(git_origin, git_workspaces, git_user,
+                                                                         monkeypatch):
+    monkeypatch.setattr(git_workspaces, "GIT_SPARSE_CHECKOUT_ENABLED", True)
+    checked_out = []
+
+    def change(cluster, paths):
+        async def generate(git_manager) -> bool:
+            checked_out.append((cluster, git_manager.git_manager.sparse_paths,
+                                sorted(os.listdir(os.path.join(git_manager.local_folder, "ieb")))))
+            return await write({f"ieb/{cluster}/consumer/new.yaml": cluster})(git_manager)
+
+        return generate, git_user, paths
+
+    async def scenario():
+        coordinator = CommitCoordinator(git_origin.url, "main", window_seconds=0.2, max_changes=50)
+        results = await asyncio.gather(coordinator.submit(*change("cluster1", ["ieb/cluster1"])),
+                                       coordinator.submit(*change("cluster2", ["ieb/cluster2"])))
+        results += await asyncio.gather(coordinator.submit(*change("cluster1", ["ieb/cluster1"])))
+        results += await asyncio.gather(coordinator.submit(*change("cluster2", ["ieb/cluster2"])),
+                                        coordinator.submit(*change("cluster3", None)))
+        return results
+
+    assert asyncio.run(scenario()) == [True] * 5
+    union, all_clusters = ["ieb/cluster1", "ieb/cluster2"], ["cluster1", "cluster2"]
+    assert checked_out == [("cluster1", union, all_clusters), ("cluster2", union, all_clusters),
+                           ("cluster1", ["ieb/cluster1"], ["cluster1"]),
+                           ("cluster2", None, all_clusters), ("cluster3", None, all_clusters)]
+    assert [git_origin.read(f"ieb/cluster{i}/consumer/new.yaml") for i in range(1, 4)] == [
+        "cluster1", "cluster2", "cluster3"]
@@ -0,0 +1,42 @@
+import pytest
+from fastapi import HTTPException
+
+from app.utils.common import matches_selector, selectors_filter_condition, to_labels_condition, labels_of
+
+
+def test_selectors_filter_condition_ors_the_filter_condition_of_each_selector():
+    assert selectors_filter_condition([{"region": "eu"}, {"region": "us,ap", "tier": "gold"}],
+                                      parent_key="metadata") == {
+        "$or": [{"metadata.region": "eu"},
+                {"metadata.region": {"$in": ["us", "ap"]}, "metadata.tier": "gold"}]}
+
+
+def test_selectors_filter_condition_rejects_empty_selector():
+    with pytest.raises(HTTPException):
+        selectors_filter_condition([{"region": "eu"}, {}], parent_key="metadata")
+
+
+def test_matches_selector_agrees_with_filter_condition():
+    metadata = {"region": "eu", "tier": "gold"}
+    assert matches_selector(metadata, {"region": "eu"})
+    assert matches_selector(metadata, {"region": "us,eu", "tier": "gold"})
+    assert matches_selector(metadata, {"region": ["us", "eu"]})
+    assert not matches_selector(metadata, {"region": "eu", "tier": "silver"})
+    assert not matches_selector(metadata, {"zone": "a"})
+    assert not matches_selector(None, {"region": "eu"})
+
+
+def test_to_labels_condition_queries_the_labels_arrays():
+    assert to_labels_condition({"metadata.region": "eu", "onboard_status": "COMPLETED"}) == {
+        "onboard_status": "COMPLETED", "labels": "region=eu"}
+    assert to_labels_condition({"metadata.region": "eu", "metadata.tier": "gold"}) == {
+        "labels": {"$all": ["region=eu", "tier=gold"]}}
+    assert to_labels_condition({"metadata.region": {"$in": ["eu", "us"]}, "metadata.tier": "gold"}) == {
+        "$and": [{"labels": {"$in": ["region=eu", "region=us"]}}, {"labels": "tier=gold"}]}
+    assert to_labels_condition({"cluster_selector.gpu": "true", "app_selector.name": "app1"}) == {
+        "cluster_selector_labels": "gpu=true", "app_selector_labels": "name=app1"}
+
+
+def test_labels_of():
+    assert labels_of({"region": "eu", "tier": "gold"}) == ["region=eu", "tier=gold"]
+    assert labels_of(None) == []
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+import shutil
+import threading
+
+import pytest
+
+from app.utils import git_handler
+from app.utils.git_handler import AsyncGitManager, GitExecutor, GitManager, WarmGitWorkspace, get_git_executor, \
+    get_warm_workspace
+
+
+class RecordingInstrument:
+    """Stands in for an OpenTelemetry histogram or counter and keeps what is recorded"""
+
+    def __init__(self):
+        self.values = []
+
+    def record(self, value, attributes=None):
+        self.values.append(value)
+
+    def add(self, value, attributes=None):
+        self.values.append(value)
+
+
+def read(git_manager, path):
+    with open(os.path.join(git_manager.local_folder, path)) as f:
+        return f.read()
+
+
+def test_warm_workspace_is_refreshed_instead_of_cloned_again(git_origin, tmp_path, monkeypatch, caplog):
+    clone_duration, fetch_duration = RecordingInstrument(), RecordingInstrument()
+    monkeypatch.setattr(git_handler, "git_clone_duration", clone_duration)
+    monkeypatch.setattr(git_handler, "git_fetch_duration", fetch_duration)
+    workspace = WarmGitWorkspace(git_origin.url, str(tmp_path / "warm"), "main")
+
+    with caplog.at_level(logging.INFO):
+        git_manager = workspace.checkout()
+        with open(os.path.join(git_manager.local_folder, "ieb/cluster1/consumer/app1.yaml"), "w") as f:
+            f.write("local change")
+        os.makedirs(os.path.join(git_manager.local_folder, "ieb/cluster3"))
+        with open(os.path.join(git_manager.local_folder, "ieb/cluster3/untracked.yaml"), "w") as f:
+            f.write("untracked")
+        git_manager.repo.git.add("-A")
+        git_manager.repo.index.commit("local commit")
+        git_origin.push({"ieb/cluster2/consumer/app2.yaml": "upstream"})
+
+        refreshed = workspace.checkout()
+
+    assert refreshed is git_manager
+    assert refreshed.repo.head.commit.hexsha == git_origin.repo.commit("main").hexsha
+    assert read(refreshed, "ieb/cluster1/consumer/app1.yaml") == "name: app1"
+    assert read(refreshed, "ieb/cluster2/consumer/app2.yaml") == "upstream"
+    assert not os.path.exists(os.path.join(refreshed.local_folder, "ieb/cluster3"))
+    assert len(clone_duration.values) == 1 and len(fetch_duration.values) == 1
+    assert all(value >= 0 for value in clone_duration.values + fetch_duration.values)
+    assert f"Repo {git_origin.url} cloned successfully in" in caplog.text
+    assert "Repo refreshed to origin/main in" in caplog.text
+
+
+def corrupt_head(git_folder):
+    with open(os.path.join(git_folder, "HEAD"), "w") as f:
+        f.write("garbage")
+
+
+def remove_objects(git_folder):
+    shutil.rmtree(os.path.join(git_folder, "objects"))
+
+
+@pytest.mark.parametrize("corrupt", [corrupt_head, remove_objects])
+def test_corrupted_warm_workspace_is_cloned_again(git_origin, tmp_path, monkeypatch, caplog, corrupt):
+    clone_duration = RecordingInstrument()
+    monkeypatch.setattr(git_handler, "git_clone_duration", clone_duration)
+    workspace = WarmGitWorkspace(git_origin.url, str(tmp_path / "warm"), "main")
+    git_manager = workspace.checkout()
+    corrupt(os.path.join(git_manager.local_folder, ".git"))
+    git_origin.push({"ieb/cluster2/consumer/app2.yaml": "upstream"})
+
+    cloned = workspace.checkout()
+
+    assert cloned is not git_manager
+    assert cloned.local_folder == git_manager.local_folder
+    assert read(cloned, "ieb/cluster2/consumer/app2.yaml") == "upstream"
+    assert cloned.repo.head.commit.hexsha == git_origin.repo.commit("main").hexsha
+    assert len(clone_duration.values) == 2
+    assert f"Unable to refresh warm clone at {tmp_path / 'warm'}, cloning again" in caplog.text
+
+
+def test_warm_workspace_is_shared_per_repository_branch_and_sink(git_workspaces):
+    workspace = get_warm_workspace("file:///origin.git", "main")
+
+    assert get_warm_workspace("file:///origin.git", "main") is workspace
+    assert get_warm_workspace("file:///origin.git", "release") is not workspace
+    assert get_warm_workspace("file:///origin.git", "main", working_tree=False) is not workspace
+    assert os.path.dirname(workspace.local_folder) == git_workspaces.GIT_WARM_CLONE_DIRECTORY
+
+
+def test_manifest_workspace_reuses_the_warm_clone(git_origin, git_workspaces, git_user):
+    async def scenario():
+        async with git_handler.manifest_workspace(git_origin.url, "main") as git_manager:
+            with open(os.path.join(git_manager.local_folder, "ieb/cluster1/consumer/app1.yaml"), "w") as f:
+                f.write("changed")
+            await git_manager.stage_changes()
+            assert await git_manager.commit_and_push("change", "main", git_user)
+            first = git_manager.git_manager
+        async with git_handler.manifest_workspace(git_origin.url, "main") as git_manager:
+            return first, git_manager.git_manager
+
+    first, second = asyncio.run(scenario())
+    assert second is first
+    assert git_origin.read("ieb/cluster1/consumer/app1.yaml") == "changed"
+
+
+def test_manifest_workspace_without_warm_clone_removes_its_clone(git_origin, git_workspaces, monkeypatch):
+    monkeypatch.setattr(git_workspaces, "GIT_WARM_CLONE_ENABLED", False)
+
+    async def scenario():
+        async with git_handler.manifest_workspace(git_origin.url, "main") as git_manager:
+            assert read(git_manager.git_manager, "README.md") == "manifests"
+            return git_manager.local_folder
+
+    local_folder = asyncio.run(scenario())
+    assert not os.path.exists(local_folder)
+
+
+def test_git_executor_runs_at_most_max_workers_calls_and_reports_the_waiting_ones(monkeypatch):
+    queue_depth, wait_time = RecordingInstrument(), RecordingInstrument()
+    monkeypatch.setattr(git_handler, "git_executor_queue_depth", queue_depth)
+    monkeypatch.setattr(git_handler, "git_executor_wait_time", wait_time)
+    executor = GitExecutor(2)
+    release, lock = threading.Event(), threading.Lock()
+    running, threads = [], set()
+
+    def blocking_call(i):
+        with lock:
+            running.append(i)
+            threads.add(threading.current_thread().name)
+        release.wait(10)
+        return i
+
+    async def scenario():
+        calls = asyncio.gather(*[executor.run(blocking_call, i) for i in range(5)])
+        for _ in range(500):
+            if len(running) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        waiting = executor.queue_depth, len(running)
+        release.set()
+        return waiting, await calls
+
+    (waiting, started), results = asyncio.run(scenario())
+    assert (waiting, started) == (3, 2)
+    assert results == [0, 1, 2, 3, 4]
+    assert executor.queue_depth == 0
+    assert len(threads) == 2 and all(name.startswith("git") for name in threads)
+    assert sorted(queue_depth.values) == [-1] * 5 + [1] * 5
+    assert len(wait_time.values) == 5 and max(wait_time.values) >= 0.05
+
+
+def test_git_executor_queue_depth_is_back_to_zero_after_concurrent_calls():
+    executor = GitExecutor(8)
+
+    async def scenario():
+        return await asyncio.gather(*[executor.run(abs, -i) for i in range(2000)])
+
+    assert asyncio.run(scenario()) == list(range(2000))
+    assert executor.queue_depth == 0
+
+
+def test_git_executor_is_sized_by_settings(git_workspaces, monkeypatch):
+    monkeypatch.setattr(git_workspaces, "GIT_EXECUTOR_MAX_WORKERS", 3)
+    monkeypatch.setattr(git_handler, "_git_executor", None)
+
+    executor = get_git_executor()
+
+    assert get_git_executor() is executor
+    assert executor.executor._max_workers == 3
+
+
+def test_async_git_manager_runs_git_calls_on_the_executor(git_origin, tmp_path, git_user, monkeypatch):
+    git_manager = GitManager(git_origin.url, str(tmp_path / "clone"), "main")
+    threads = []
+    stage_changes = git_manager.stage_changes
+
+    def recording_stage_changes():
+        threads.append(threading.current_thread().name)
+        return stage_changes()
+
+    monkeypatch.setattr(git_manager, "stage_changes", recording_stage_changes)
+
+    async def scenario():
+        async_git_manager = AsyncGitManager(git_manager, GitExecutor(1))
+        with open(os.path.join(async_git_manager.local_folder, "ieb/cluster1/consumer/app1.yaml"), "w") as f:
+            f.write("changed")
+        await async_git_manager.stage_changes()
+        with open(os.path.join(async_git_manager.local_folder, "ieb/cluster1/consumer/app1.yaml"), "w") as f:
+            f.write("discarded")
+        await async_git_manager.discard_unstaged_changes()
+        return await async_git_manager.commit_and_push("change", "main", git_user)
+
+    assert asyncio.run(scenario())
+    assert len(threads) == 1 and threads[0].startswith("git")
+    assert git_origin.read("ieb/cluster1/consumer/app1.yaml") == "changed"
+
+
+def missing_objects(repo) -> set[str]:
+    """Objects of HEAD that a partial clone did not fetch, listed without fetching them"""
+    return {line[1:] for line in repo.git.rev_list("--objects", "--missing=print", "HEAD").splitlines()
+            if line.startswith("?")}
+
+
+def test_sparse_clone_checks_out_only_the_given_clusters(git_origin, tmp_path, git_user):
+    git_manager = GitManager(git_origin.url, str(tmp_path / "clone"), "main", sparse_paths=["ieb/cluster1"])
+    repo = git_manager.repo
+
+    assert repo.git.config("remote.origin.partialclonefilter") == "blob:none"
+    assert repo.git.config("core.sparseCheckoutCone") == "true"
+    assert os.listdir(os.path.join(git_manager.local_folder, "ieb")) == ["cluster1"]
+    assert read(git_manager, "README.md") == "manifests"
+    assert git_origin.repo.commit("main").tree["ieb/cluster2/consumer/app2.yaml"].hexsha in missing_objects(repo)
+
+    os.makedirs(os.path.join(git_manager.local_folder, "ieb/cluster1/consumer/environment"))
+    with open(os.path.join(git_manager.local_folder, "ieb/cluster1/consumer/environment/app3.yaml"), "w") as f:
+        f.write("name: app3")
+    git_manager.stage_changes()
+    assert git_manager.commit_and_push("change", "main", git_user)
+
+    assert git_origin.read("ieb/cluster1/consumer/environment/app3.yaml") == "name: app3"
+    assert git_origin.read("ieb/cluster2/consumer/app2.yaml") == "name: app2"
+
+
+def test_refresh_replaces_the_sparse_paths(git_origin, tmp_path):
+    git_manager = GitManager(git_origin.url, str(tmp_path / "clone"), "main", sparse_paths=["ieb/cluster1"])
+
+    git_manager.refresh(["ieb/cluster2"])
+    assert os.listdir(os.path.join(git_manager.local_folder, "ieb")) == ["cluster2"]
+    assert read(git_manager, "ieb/cluster2/consumer/app2.yaml") == "name: app2"
+
+    git_manager.refresh()
+    assert sorted(os.listdir(os.path.join(git_manager.local_folder, "ieb"))) == ["cluster1", "cluster2"]
+    assert git_manager.repo.git.config("core.sparseCheckout") == "false"
@@ -0,0 +1,75 @@
+from app.core.schemas.clusters import ClusterResponse
+from app.core.schemas.targetpolicies import TargetPolicyResponse
+from app.utils.label_index import LabelIndex, TargetPolicyIndex
+
+
+def cluster(cluster_id, **metadata):
+    return ClusterResponse(_id=cluster_id, name=cluster_id, environment="dev", metadata=metadata)
+
+
+def names(clusters):
+    return [c.name for c in clusters]
+
+
+def test_match_requires_all_labels():
+    index = LabelIndex("cluster")
+    index.build([cluster("c1", region="eu", tier="gold"), cluster("c2", region="eu", tier="silver"),
+                 cluster("c3", region="us", tier="gold")])
+    assert names(index.match({"region": "eu"})) == ["c1", "c2"]
+    assert names(index.match({"region": "eu", "tier": "gold"})) == ["c1"]
+    assert names(index.match({"region": "ap"})) == []
+
+
+def test_match_comma_separated_values_as_alternatives():
+    index = LabelIndex("cluster")
+    index.build([cluster("c1", region="eu"), cluster("c2", region="us"), cluster("c3", region="ap")])
+    assert names(index.match({"region": "eu,ap"})) == ["c1", "c3"]
+    assert names(index.match({"region": ["us", "ap"]})) == ["c2", "c3"]
+
+
+def test_add_replaces_labels_of_existing_document():
+    index = LabelIndex("cluster")
+    index.build([cluster("c1", region="eu")])
+    index.add(cluster("c1", region="us"))
+    index.add(cluster("c2", region="eu"))
+    assert names(index.match({"region": "eu"})) == ["c2"]
+    assert names(index.match({"region": "us"})) == ["c1"]
+
+
+def test_add_is_ignored_until_built():
+    index = LabelIndex("cluster")
+    index.add(cluster("c1", region="eu"))
+    index.build([])
+    assert index.match({"region": "eu"}) == []
+
+
+def test_match_returns_copies():
+    index = LabelIndex("cluster")
+    index.build([cluster("c1", region="eu")])
+    index.match({"region": "eu"})[0].metadata["region"] = "us"
+    assert names(index.match({"region": "eu"})) == ["c1"]
+
+
+def policy(policy_id, updated_on, app_selector=None, cluster_selector=None):
+    return TargetPolicyResponse(_id=policy_id, name=policy_id, updated_on=updated_on, app_selector=app_selector,
+                                cluster_selector=cluster_selector)
+
+
+def test_policy_matches_when_whole_selector_is_in_metadata():
+    index = TargetPolicyIndex()
+    index.build([policy("p1", 3, cluster_selector={"region": "eu"}),
+                 policy("p2", 1, cluster_selector={"region": "eu", "tier": "gold"}),
+                 policy("p3", 2, cluster_selector={"region": "eu", "tier": "silver"}),
+                 policy("p4", 0, app_selector={"region": "eu"}),
+                 policy("p5", 0, cluster_selector={})])
+    assert names(index.match({"region": "eu", "tier": "gold", "zone": "1"}, "cluster_selector")) == ["p2", "p1"]
+    assert names(index.match({"region": "eu"}, "app_selector")) == ["p4"]
+    assert index.match({"zone": "1"}, "cluster_selector") == []
+
+
+def test_policy_add_replaces_selector():
+    index = TargetPolicyIndex()
+    index.build([policy("p1", 1, cluster_selector={"region": "eu"})])
+    index.add(policy("p1", 2, cluster_selector={"region": "us"}))
+    assert index.match({"region": "eu"}, "cluster_selector") == []
+    assert names(index.match({"region": "us"}, "cluster_selector")) == ["p1"]
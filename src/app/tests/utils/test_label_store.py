@@ -0,0 +1,38 @@
+from app.core.schemas.clusters import ClusterResponse
+from app.utils.label_store import ColumnarLabelStore
+
+
+def cluster(cluster_id, **metadata):
+    return ClusterResponse(_id=cluster_id, name=cluster_id, environment="dev", metadata=metadata)
+
+
+def names(clusters):
+    return [c.name for c in clusters]
+
+
+def store():
+    return ColumnarLabelStore([cluster("c1", region="eu", tier="gold"), cluster("c2", region="eu", tier="silver"),
+                               cluster("c3", region="us", tier="gold"), cluster("c4", region="ap")])
+
+
+def test_match_requires_all_labels():
+    assert names(store().match({"region": "eu"})) == ["c1", "c2"]
+    assert names(store().match({"region": "eu", "tier": "gold"})) == ["c1"]
+    assert names(store().match({"region": "sa"})) == []
+    assert names(store().match({"zone": "a"})) == []
+
+
+def test_match_comma_separated_values_as_alternatives():
+    assert names(store().match({"region": "eu,ap"})) == ["c1", "c2", "c4"]
+    assert names(store().match({"region": ["us", "ap"], "tier": "gold"})) == ["c3"]
+
+
+def test_has_label_marks_missing_labels():
+    assert store().has_label("tier").tolist() == [True, True, True, False]
+    assert store().has_label("zone").tolist() == [False, False, False, False]
+
+
+def test_empty_store():
+    empty = ColumnarLabelStore([])
+    assert len(empty) == 0
+    assert empty.match({"region": "eu"}) == []
@@ -0,0 +1,123 @@
+import asyncio
+import os
+
+from app.utils.git_handler import GitManager
+from app.utils.manifest_sink import BLOB_FILE_MODE, FileSystemManifestSink, ManifestWriter, git_blob_id
+from app.utils.template import TemplateFactory
+
+
+class InProcessRenderPool:
+    """Renders the jobs the way TemplateRenderPool does, without worker processes"""
+
+    def __init__(self, template):
+        self.template = template
+
+    async def render(self, jobs):
+        return [[self.template.render_to_string(name, data) for name, data in job] for job in jobs]
+
+
+def manifest_writer(tmp_path, render_pool=True):
+    (tmp_path / "templates").mkdir(parents=True)
+    (tmp_path / "templates" / "app.j2").write_text("name: {{ name }}")
+    (tmp_path / "templates" / "empty.j2").write_text("{% if name %}{{ name }}{% endif %}")
+    template = TemplateFactory.create_template("jinja", str(tmp_path / "templates"))
+    return ManifestWriter(template, FileSystemManifestSink(), InProcessRenderPool(template) if render_pool else None)
+
+
+def test_flush_writes_deferred_manifests_and_runs_callbacks(tmp_path):
+    writer = manifest_writer(tmp_path)
+    rendered = []
+    assert writer.submit("app.j2", str(tmp_path / "out" / "a.yaml"), {"name": "a"}, rendered.append)
+
+    async def callback():
+        return (tmp_path / "out" / "a.yaml").exists()
+
+    async def scenario():
+        assert await writer.after_render(callback)
+        return await writer.flush()
+
+    assert asyncio.run(scenario())
+    assert (tmp_path / "out" / "a.yaml").read_text() == "name: a"
+    assert rendered == ["name: a"]
+
+
+def test_flush_fails_when_a_manifest_is_not_written(tmp_path):
+    writer = manifest_writer(tmp_path)
+    writer.submit("app.j2", str(tmp_path / "out" / "a.yaml"), {"name": "a"})
+    writer.start_render_job()
+    writer.submit("empty.j2", str(tmp_path / "out" / "b.yaml"), {"name": ""})
+
+    assert not asyncio.run(writer.flush())
+    assert (tmp_path / "out" / "a.yaml").read_text() == "name: a"
+    assert not manifest_writer(tmp_path / "direct", render_pool=False).submit(
+        "empty.j2", str(tmp_path / "direct" / "out" / "b.yaml"), {"name": ""})
+
+
+def tree_of(repo, rev="main") -> dict:
+    """(mode, blob id) of every file of the tree of rev, by path"""
+    entries = {}
+    for line in repo.git.ls_tree("-r", rev).splitlines():
+        mode_type_sha, path = line.split("\t")
+        mode, _, sha = mode_type_sha.split()
+        entries[path] = (int(mode, 8), sha)
+    return entries
+
+
+def test_git_object_sink_commits_the_written_tree(git_origin, tmp_path, git_user):
+    git_manager = GitManager(git_origin.url, str(tmp_path / "clone"), "main", working_tree=False)
+    sink, root = git_manager.manifest_sink, git_manager.local_folder
+    before = tree_of(git_origin.repo)
+
+    assert sink.write(os.path.join(root, "ieb/cluster3/consumer/environment/dev/app3.yaml"), "name: app3")
+    assert sink.write(os.path.join(root, "ieb/cluster1/consumer/app1.yaml"), "name: app1\nlabel: x")
+    sink.remove(os.path.join(root, "ieb/cluster2/consumer/app2.yaml"))
+    git_manager.stage_changes()
+    assert git_manager.commit_and_push("change", "main", git_user)
+
+    assert os.listdir(root) == [".git"]
+    assert tree_of(git_origin.repo) == {
+        "README.md": before["README.md"],
+        "ieb/cluster1/consumer/app1.yaml": (BLOB_FILE_MODE, git_blob_id(b"name: app1\nlabel: x")),
+        "ieb/cluster3/consumer/environment/dev/app3.yaml": (BLOB_FILE_MODE, git_blob_id(b"name: app3")),
+    }
+    assert git_origin.read("ieb/cluster3/consumer/environment/dev/app3.yaml") == "name: app3"
+    head = git_origin.repo.commit("main")
+    assert head.tree.hexsha == sink.write_tree().hexsha
+    assert [parent.message.strip() for parent in head.parents] == ["seed"]
+    assert (head.author.name, head.author.email) == ("bot", "bot@example.com")
+    assert sink.blob_id(os.path.join(root, "ieb/cluster1/consumer/app1.yaml")) == git_blob_id(b"name: app1\nlabel: x")
+    assert sink.blob_id(os.path.join(root, "ieb/cluster2/consumer/app2.yaml")) is None
+    assert git_origin.repo.git.fsck("--strict") == ""
+
+
+def test_git_object_sink_without_changes_does_not_commit(git_origin, tmp_path, git_user):
+    git_manager = GitManager(git_origin.url, str(tmp_path / "clone"), "main", working_tree=False)
+    git_manager.manifest_sink.write(os.path.join(git_manager.local_folder, "ieb/cluster1/consumer/app1.yaml"),
+                                    "name: app1")
+    git_manager.stage_changes()
+
+    assert git_manager.commit_and_push("change", "main", git_user)
+    assert git_origin.messages() == ["seed"]
+
+
+def test_git_object_sink_discard_drops_only_unstaged_writes(git_origin, tmp_path):
+    git_manager = GitManager(git_origin.url, str(tmp_path / "clone"), "main", working_tree=False)
+    sink, root = git_manager.manifest_sink, git_manager.local_folder
+    app1, app2, new = (os.path.join(root, path) for path in [
+        "ieb/cluster1/consumer/app1.yaml", "ieb/cluster2/consumer/app2.yaml", "ieb/cluster3/new.yaml"])
+
+    sink.write(app1, "staged")
+    sink.stage()
+    sink.write(app1, "unstaged")
+    sink.write(new, "unstaged")
+    sink.remove(app2)
+    assert sink.blob_id(app1) == git_blob_id(b"unstaged") and not sink.exists(app2)
+    sink.discard()
+
+    assert sink.blob_id(app1) == git_blob_id(b"staged")
+    assert sink.blob_id(app2) == git_blob_id(b"name: app2")
+    assert not sink.exists(new) and sink.blob_id(new) is None
+    tree = sink.write_tree()
+    assert sorted(blob.path for blob in tree.traverse() if blob.type == "blob") == [
+        "README.md", "ieb/cluster1/consumer/app1.yaml", "ieb/cluster2/consumer/app2.yaml"]
+    assert (tree / "ieb/cluster1/consumer/app1.yaml").hexsha == git_blob_id(b"staged")
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+from beanie import init_beanie
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.models.clusters import Cluster
+from app.utils.pagination import find_page, encode_cursor, decode_cursor
+
+
+def test_find_page_walks_all_matching_documents_once():
+    async def scenario():
+        await init_beanie(database=AsyncMongoMockClient().get_database(name="pagination"), document_models=[Cluster])
+        for i in range(7):
+            await Cluster(_id=f"c{i}", name=f"c{i}", environment="dev" if i % 3 else "prod").insert()
+        pages = []
+        cursor = None
+        while True:
+            clusters, cursor = await find_page(Cluster.find(Cluster.environment == "dev"), limit=2, cursor=cursor)
+            pages.append([cluster.id for cluster in clusters])
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(scenario()) == [["c1", "c2"], ["c4", "c5"]]
+
+
+def test_cursor_is_opaque_and_validated():
+    assert decode_cursor(encode_cursor("c1")) == "c1"
+    with pytest.raises(HTTPException):
+        decode_cursor("not a cursor")
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from beanie import init_beanie
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.models.applications import Application
+from app.core.schemas.applications import ApplicationResponse
+from app.utils.projection import parse_fields, projection_model
+
+
+def test_projection_model_reads_only_the_fields():
+    model = projection_model(ApplicationResponse, parse_fields("name, metadata.region,name"))
+    assert model.Settings.projection == {"_id": 1, "name": 1, "metadata.region": 1}
+
+    async def scenario():
+        await init_beanie(database=AsyncMongoMockClient().get_database(name="projection"),
+                          document_models=[Application])
+        await Application(_id="a1", name="a1", namespace="ns", repo_url="http://repo",
+                          metadata={"region": "eu", "tier": "gold"}).insert()
+        return await Application.find_all().project(model).to_list()
+
+    [app] = asyncio.run(scenario())
+    assert app.dict(exclude_none=True) == {"id": "a1", "name": "a1", "metadata": {"region": "eu"}}
+
+
+def test_projection_model_keeps_whole_field_over_its_keys():
+    model = projection_model(ApplicationResponse, parse_fields("metadata,metadata.region"))
+    assert model.Settings.projection == {"_id": 1, "metadata": 1}
+
+
+def test_projection_model_rejects_unknown_field():
+    assert parse_fields(None) is None
+    with pytest.raises(HTTPException):
+        projection_model(ApplicationResponse, parse_fields("name,secret"))
@@ -0,0 +1,126 @@
+import asyncio
+import copy
+import os
+import random
+
+import pytest
+
+from app.core.schemas.applications import ApplicationResponse
+from app.core.schemas.clusters import ClusterResponse
+from app.utils.constants import TEMPLATES_BASE_PATH, ARGOCD_APPLICATION_TEMPLATE_NAME, KUSTOMIZE_TEMPLATE_NAME
+from app.utils.manifest import prepare_consumer_application_data, prepare_master_application_data
+from app.utils.template import TemplateFactory, TemplateRegistry, TemplateRenderPool
+
+template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../templates')
+application_template_name = f"{TEMPLATES_BASE_PATH}/{ARGOCD_APPLICATION_TEMPLATE_NAME}"
+
+
+@pytest.fixture()
+def jinja_template():
+    return TemplateFactory.create_template("jinja", template_dir)
+
+
+@pytest.fixture()
+def native_template():
+    return TemplateFactory.create_template("native", template_dir)
+
+
+def consumer_application_data(app_name="app1", cluster_name="cluster1", environment="dev", target_policy_id="tp1"):
+    application = ApplicationResponse(_id="a1", name=app_name, repo_url="https://github.com/org/repo.git",
+                                      repo_branch="main", repo_path="apps/app1", namespace="app1-ns")
+    cluster = ClusterResponse(_id="c1", name=cluster_name, environment=environment)
+    return prepare_consumer_application_data(application, cluster, target_policy_id)
+
+
+def variants():
+    consumer = consumer_application_data()
+    yield consumer
+    yield prepare_master_application_data("ieb", "cluster1")
+
+    without_labels = copy.deepcopy(consumer)
+    del without_labels['metadata']['labels']
+    yield without_labels
+
+    none_labels = copy.deepcopy(consumer)
+    none_labels['metadata']['labels'] = None
+    yield none_labels
+
+    with_kustomize = copy.deepcopy(consumer)
+    with_kustomize['spec']['source']['kustomize_version'] = "v5.0.0"
+    yield with_kustomize
+
+    missing_values = copy.deepcopy(consumer)
+    del missing_values['spec']['project']
+    del missing_values['spec']['destination']['namespace']
+    missing_values['spec']['syncPolicy']['automated']['prune'] = False
+    missing_values['spec']['syncPolicy']['automated']['selfHeal'] = None
+    yield missing_values
+
+
+@pytest.mark.parametrize("data", list(variants()))
+def test_native_application_matches_jinja(jinja_template, native_template, data):
+    assert native_template.render_to_string(application_template_name, data) == \
+           jinja_template.render_to_string(application_template_name, data)
+
+
+def test_native_application_matches_jinja_for_random_names(jinja_template, native_template):
+    rnd = random.Random(8)
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789-"
+    for _ in range(200):
+        data = consumer_application_data(*("".join(rnd.choices(alphabet, k=rnd.randint(1, 30))) for _ in range(4)))
+        assert native_template.render_to_string(application_template_name, data) == \
+               jinja_template.render_to_string(application_template_name, data)
+
+
+def test_native_delegates_other_templates_to_jinja(jinja_template, native_template):
+    data = {'shortProjectName': "ieb", 'items': {"dev": [{'name': "app1-app-manifest.yaml"}]}}
+    template_name = f"{TEMPLATES_BASE_PATH}/{KUSTOMIZE_TEMPLATE_NAME}"
+    assert native_template.render_to_string(template_name, data) == \
+           jinja_template.render_to_string(template_name, data)
+
+
+def test_native_render_writes_file(jinja_template, native_template, tmp_path):
+    data = consumer_application_data()
+    assert native_template.render(application_template_name, str(tmp_path / "native"), "app.yaml", data)
+    assert jinja_template.render(application_template_name, str(tmp_path / "jinja"), "app.yaml", data)
+    assert (tmp_path / "native" / "app.yaml").read_bytes() == (tmp_path / "jinja" / "app.yaml").read_bytes()
+
+
+def test_registry_keeps_one_template_per_bytecode_cache_directory(tmp_path):
+    registry = TemplateRegistry()
+    template = registry.get("jinja", template_dir, str(tmp_path / "a"))
+
+    assert registry.get("jinja", template_dir, str(tmp_path / "a")) is template
+    other = registry.get("jinja", template_dir, str(tmp_path / "b"))
+    assert other is not template and other.bytecode_cache_dir == str(tmp_path / "b")
+    assert registry.get("jinja", template_dir) is not template
+
+
+@pytest.mark.parametrize("template_type", ["jinja", "native"])
+def test_pool_render_matches_in_process_render(template_type):
+    template = TemplateFactory.create_template(template_type, template_dir)
+    jobs = [[(application_template_name, data)] for data in variants()]
+    jobs.append([(f"{TEMPLATES_BASE_PATH}/{KUSTOMIZE_TEMPLATE_NAME}",
+                  {'shortProjectName': "ieb", 'items': {"dev": [{'name': "app1-app-manifest.yaml"}]}})])
+    pool = TemplateRenderPool(2, template_type, template_dir)
+    try:
+        rendered = asyncio.run(pool.render(jobs))
+    finally:
+        pool.shutdown()
+    assert rendered == [[template.render_to_string(name, data) for name, data in job] for job in jobs]
+
+
+def test_pool_renders_changed_templates_after_reload(tmp_path):
+    (tmp_path / "hello.j2").write_text("hello {{ name }}")
+    pool = TemplateRenderPool(1, "jinja", str(tmp_path))
+    try:
+        assert asyncio.run(pool.render([[("hello.j2", {"name": "a"})]])) == [["hello a"]]
+        (tmp_path / "hello.j2").write_text("bye {{ name }}")
+        assert asyncio.run(pool.render([[("hello.j2", {"name": "a"})]])) == [["hello a"]]
+        executor = pool.executor
+        pool.reload()
+        assert asyncio.run(pool.render([[("hello.j2", {"name": "a"})]])) == [["bye a"]]
+        with pytest.raises(RuntimeError):
+            executor.submit(abs, -1)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,63 @@
+from typing import Any, Hashable, Tuple
+
+from cachetools import TTLCache
+from opentelemetry import metrics
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+meter = metrics.get_meter(__name__)
+namespace_authorization_cache_hits = meter.create_counter(
+    "namespace.authorization_cache.hits", description="Namespace authorization decisions read from the cache")
+namespace_authorization_cache_misses = meter.create_counter(
+    "namespace.authorization_cache.misses", description="Namespace authorization decisions read from the database")
+
+_MISSING = object()
+
+
+class NamespaceAuthorizationCache:
+    """Namespace authorization decisions of a set of groups, per (groups, namespace name). Entries expire after ttl
+    seconds so that namespaces changed by other processes are eventually seen, the namespaces changed by this process
+    clear the caches right away"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl) if maxsize > 0 and ttl > 0 else None
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        value = _MISSING if self._cache is None else self._cache.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            namespace_authorization_cache_misses.add(1, {"cache": self.name})
+            return False, None
+        self.hits += 1
+        namespace_authorization_cache_hits.add(1, {"cache": self.name})
+        return True, value
+
+    def set(self, key: Hashable, value):
+        if self._cache is not None:
+            self._cache[key] = value
+
+    def clear(self):
+        if self._cache is not None:
+            self._cache.clear()
+
+
+# Whether the groups may use the namespace, see is_part_of_namespace_group
+namespace_membership_cache = NamespaceAuthorizationCache(
+    "membership", maxsize=settings.NAMESPACE_AUTHORIZATION_CACHE_SIZE,
+    ttl=settings.NAMESPACE_AUTHORIZATION_CACHE_TTL_SECONDS)
+# The namespace when the groups are authorized on it, None otherwise, see get_authorized_namespace_by_names
+authorized_namespace_cache = NamespaceAuthorizationCache(
+    "authorized_namespace", maxsize=settings.NAMESPACE_AUTHORIZATION_CACHE_SIZE,
+    ttl=settings.NAMESPACE_AUTHORIZATION_CACHE_TTL_SECONDS)
+
+
+def clear_namespace_authorization_caches():
+    namespace_membership_cache.clear()
+    authorized_namespace_cache.clear()
@@ -0,0 +1,121 @@
+import asyncio
+import weakref
+from logging import getLogger
+from typing import Awaitable, Callable
+
+from app.core.auth.user import User
+from app.core.config import get_settings
+from app.utils import git_handler
+from app.utils.constants import GIT_COMMIT_MESSAGE, MANIFESTS_GIT_BRANCH
+from app.utils.git_handler import AsyncGitManager
+
+settings = get_settings()
+
+log = getLogger(__name__)
+
+ManifestChange = Callable[[AsyncGitManager], Awaitable[bool]]
+
+
+class _PendingChange:
+    def __init__(self, generate: ManifestChange, user: User, paths: list[str]):
+        self.generate = generate
+        self.user = user
+        self.paths = paths
+        self.result = asyncio.get_running_loop().create_future()
+
+
+class CommitCoordinator:
+    """Coalesces manifest changes of concurrent onboardings into a single commit and push.
+
+    Callers submit a coroutine function that writes its manifests into the working copy it is given. Changes are
+    gathered for window_seconds (or until max_changes are pending), applied one after the other to the same working
+    copy and pushed with one commit. A change that fails is rolled back without affecting the rest of the batch, so
+    every caller still gets its own result. If the push is rejected the whole batch is generated again on a fresh
+    working copy, up to push_attempts times"""
+
+    def __init__(self, repo_url: str, branch_name: str, window_seconds: float, max_changes: int,
+                 push_attempts: int = 1):
+        self.repo_url = repo_url
+        self.branch_name = branch_name
+        self.window_seconds = window_seconds
+        self.max_changes = max(1, max_changes)
+        self.push_attempts = max(1, push_attempts)
+        self.pending: list[_PendingChange] = []
+        self.batch_full = asyncio.Event()
+        self.drain_task = None
+
+    async def submit(self, generate: ManifestChange, user: User, paths: list[str] = None) -> bool:
+        """paths are the repository directories the change writes to, used for sparse checkouts"""
+        change = _PendingChange(generate, user, paths)
+        self.pending.append(change)
+        if len(self.pending) >= self.max_changes:
+            self.batch_full.set()
+        if self.drain_task is None or self.drain_task.done():
+            self.drain_task = asyncio.create_task(self._drain())
+        return await change.result
+
+    async def _drain(self):
+        while self.pending:
+            try:
+                await asyncio.wait_for(self.batch_full.wait(), timeout=self.window_seconds)
+            except asyncio.TimeoutError:
+                pass
+            batch, self.pending = self.pending[:self.max_changes], self.pending[self.max_changes:]
+            if len(self.pending) < self.max_changes:
+                self.batch_full.clear()
+            try:
+                results = await self._process(batch)
+            except Exception as ex:
+                log.error(f"Error in committing batch of {len(batch)} manifest changes: {ex}")
+                results = [False] * len(batch)
+            for change, result in zip(batch, results):
+                if not change.result.done():
+                    change.result.set_result(result)
+
+    async def _process(self, batch: list[_PendingChange]) -> list[bool]:
+        log.info(f"Committing batch of {len(batch)} manifest changes")
+        results = [False] * len(batch)
+        sparse_paths = None
+        if all(change.paths is not None for change in batch):
+            sparse_paths = sorted({path for change in batch for path in change.paths})
+        for attempt in range(1, self.push_attempts + 1):
+            async with git_handler.manifest_workspace(self.repo_url, self.branch_name, sparse_paths) as git_manager:
+                generated = [await self._apply(git_manager, change) for change in batch]
+                if not any(generated):
+                    return generated
+                committer = next(change.user for change, ok in zip(batch, generated) if ok)
+                changes = sum(generated)
+                commit_msg = GIT_COMMIT_MESSAGE if changes == 1 else f"{GIT_COMMIT_MESSAGE} ({changes} changes)"
+                if await git_manager.commit_and_push(commit_msg, self.branch_name, committer):
+                    return generated
+            log.warning(f"Pushing batch of {len(batch)} manifest changes failed, attempt {attempt}/{self.push_attempts}")
+        return results
+
+    @staticmethod
+    async def _apply(git_manager: AsyncGitManager, change: _PendingChange) -> bool:
+        try:
+            generated = await change.generate(git_manager)
+        except Exception as ex:
+            log.error(f"Error in generating manifests due to {str(ex)}")
+            generated = False
+        if generated:
+            await git_manager.stage_changes()
+        else:
+            await git_manager.discard_unstaged_changes()
+        return generated
+
+
+_coordinators: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, CommitCoordinator]" = weakref.WeakKeyDictionary()
+
+
+def get_commit_coordinator() -> CommitCoordinator:
+    """Returns the coordinator of the running event loop. asyncio primitives are bound to a loop, hence one per loop"""
+    loop = asyncio.get_running_loop()
+    coordinator = _coordinators.get(loop)
+    if coordinator is None:
+        coordinator = CommitCoordinator(settings.ARGOCD_MASTER_APPLICATION_REPO_URL, MANIFESTS_GIT_BRANCH,
+                                        settings.GIT_COMMIT_COALESCE_WINDOW_SECONDS,
+                                        settings.GIT_COMMIT_COALESCE_MAX_CHANGES,
+                                        settings.GIT_PUSH_ATTEMPTS)
+        _coordinators[loop] = coordinator
+    return coordinator
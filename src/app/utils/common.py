@@ -5,10 +5,27 @@ from typing import List, Any, Callable
 
 from fastapi import HTTPException, status
 
+from app.core.config import get_settings
 from app.utils.constants import NAME_VALIDATION_PATTERN
 
 log = getLogger(__name__)
 
+settings = get_settings()
+
+# Labels array kept alongside each free-form label map, see labels_of
+LABELS_FIELDS = {"metadata": "labels", "app_selector": "app_selector_labels",
+                 "cluster_selector": "cluster_selector_labels"}
+
+
+def labels_of(label_map: dict | None) -> list[str]:
+    """Normalized form of metadata or a selector, "key=value" strings a multikey index can cover whatever the keys"""
+    return [f"{key}={value}" for key, value in (label_map or {}).items()]
+
+
+def group_fields(groups: list[str] | None) -> dict:
+    """environments of namespace groups, the group team1-nonprod has environment nonprod"""
+    return {"environments": sorted({group.rpartition(settings.GROUP_NAME_SEPARATOR)[2] for group in groups or []})}
+
 
 def create_filter_condition(query_params):
     """Create a filter condition from query parameters
@@ -38,12 +55,46 @@ def create_filter_condition(query_params):
         else:
             filter_dict[key] = value
 
+    if settings.LABEL_QUERIES_ENABLED:
+        filter_dict = to_labels_condition(filter_dict)
+
     log.debug(
         f"Created filter condition from query parameters {query_params} :  {filter_dict}"
     )
     return filter_dict
 
 
+def label_map_condition(parent_key: str, label_map: dict) -> dict:
+    """Condition matching the documents whose parent_key map holds all labels of label_map, values taken as is"""
+    filter_dict = {f"{parent_key}.{key}": value for key, value in label_map.items()}
+    return to_labels_condition(filter_dict) if settings.LABEL_QUERIES_ENABLED else filter_dict
+
+
+def to_labels_condition(filter_dict: dict) -> dict:
+    """Rewrites the conditions on metadata, app_selector and cluster_selector keys of a filter condition into
+    conditions on the matching labels arrays"""
+    label_conditions = {}
+    for path in list(filter_dict):
+        parent_key, _, key = path.partition(".")
+        labels_field = LABELS_FIELDS.get(parent_key)
+        if labels_field is None or not key:
+            continue
+        condition = filter_dict.pop(path)
+        if isinstance(condition, dict):
+            condition = {"$in": [f"{key}={value}" for value in condition["$in"]]}
+        else:
+            condition = f"{key}={condition}"
+        label_conditions.setdefault(labels_field, []).append(condition)
+    for labels_field, conditions in label_conditions.items():
+        if len(conditions) == 1:
+            filter_dict[labels_field] = conditions[0]
+        elif all(isinstance(condition, str) for condition in conditions):
+            filter_dict[labels_field] = {"$all": conditions}
+        else:
+            filter_dict.setdefault("$and", []).extend({labels_field: condition} for condition in conditions)
+    return filter_dict
+
+
 def dict_to_query_string(params, parent_key=None):
     """Convert a dictionary to a query string
     Returns:
@@ -79,6 +130,21 @@ def dict_to_query_string(params, parent_key=None):
     return query_string
 
 
+def selectors_filter_condition(selectors: list[dict], parent_key=None):
+    """Creates one filter condition matching any of the selectors, an $or of their create_filter_condition"""
+    return {"$or": [create_filter_condition(dict_to_query_string(selector, parent_key=parent_key))
+                    for selector in selectors]}
+
+
+def matches_selector(metadata: dict, selector: dict) -> bool:
+    """In memory equivalent of the filter condition of a selector, a comma separated value lists alternatives"""
+    for key, value in selector.items():
+        values = value if isinstance(value, (list, tuple)) else str(value).split(",")
+        if metadata is None or metadata.get(key) not in values:
+            return False
+    return True
+
+
 def find_delta_items(items1: List[Any], items2: List[Any], key: Callable[[Any], Any]) -> List[Any]:
     """
     Finds the delta between two lists of items.
@@ -1,17 +1,39 @@
+import asyncio
+import functools
+import hashlib
 import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from logging import getLogger
 
 import git
 from azure.devops.connection import Connection
 from msrest.authentication import BasicAuthentication
+from opentelemetry import metrics
 from requests.utils import unquote
 from app.core.auth.user import User
+from app.utils.manifest_sink import FileSystemManifestSink, GitObjectManifestSink, ManifestWriter
+from app.utils.template import Template, TemplateRenderPool
 
 from app.core.config import get_settings
 settings = get_settings()
 
 log = getLogger(__name__)
 
+meter = metrics.get_meter(__name__)
+git_clone_duration = meter.create_histogram("git.clone.duration", unit="s",
+                                            description="Time taken to clone the manifest repository")
+git_fetch_duration = meter.create_histogram("git.fetch.duration", unit="s",
+                                            description="Time taken to refresh the warm manifest repository")
+git_executor_queue_depth = meter.create_up_down_counter("git.executor.queue_depth",
+                                                        description="Git operations waiting for an executor thread")
+git_executor_wait_time = meter.create_histogram("git.executor.wait_time", unit="s",
+                                                description="Time git operations spent waiting for an executor thread")
+
 
 def get_pat() -> str:
     try:
@@ -30,19 +52,42 @@ def get_git_url(repo_url: str = None):
 class GitManager:
     logger = getLogger(__name__)
 
-    def __init__(self, repo_url, local_folder, branch_name):
+    def __init__(self, repo_url, local_folder, branch_name, sparse_paths: list[str] = None, working_tree: bool = True):
         self.repo_url = repo_url
         self.local_folder = local_folder
         self.repo = None
         self.branch_name = branch_name
+        self.sparse_paths = sparse_paths
+        self.working_tree = working_tree
+        self.manifest_sink = None
         self.clone_repo()
-        self.checkout()
+        if self.working_tree:
+            self.checkout()
+            self.manifest_sink = FileSystemManifestSink()
+        else:
+            self.manifest_sink = GitObjectManifestSink(self.repo, self.local_folder)
 
     def clone_repo(self):
+        """Shallow clones the repository. With sparse_paths it is a partial clone (blobs fetched on demand) where only
+        the given directories are checked out, so the cost scales with the change rather than the whole fleet. Without
+        a working tree nothing is checked out at all and blobs are never fetched, manifests then go straight into git
+        objects"""
         try:
-            self.repo = git.Repo.clone_from(
-                self.repo_url, self.local_folder, depth=1)
-            self.logger.info(f"Repo {self.repo_url} cloned successfully.")
+            start = time.perf_counter()
+            if not self.working_tree:
+                self.repo = git.Repo.clone_from(
+                    self.repo_url, self.local_folder, depth=1, filter='blob:none', no_checkout=True,
+                    branch=self.branch_name)
+            elif self.sparse_paths is None:
+                self.repo = git.Repo.clone_from(
+                    self.repo_url, self.local_folder, depth=1)
+            else:
+                self.repo = git.Repo.clone_from(
+                    self.repo_url, self.local_folder, depth=1, filter='blob:none', no_checkout=True, sparse=True)
+                self.repo.git.sparse_checkout('set', '--cone', *self.sparse_paths)
+            elapsed = time.perf_counter() - start
+            git_clone_duration.record(elapsed)
+            self.logger.info(f"Repo {self.repo_url} cloned successfully in {elapsed:.3f}s.")
 
         except Exception as ex:
             self.logger.error(
@@ -64,27 +109,56 @@ class GitManager:
                 f"Error checkinout out branch {branch_name if branch_name else self.branch_name}: {ex}")
             raise ex
 
+    def refresh(self, sparse_paths: list[str] = None):
+        """Brings the working copy back in line with origin. Local commits and changes (including untracked files)
+        are discarded, so the copy can be reused for the next request instead of cloning again. sparse_paths replaces
+        the directories that are checked out, None checks out everything"""
+        start = time.perf_counter()
+        self.repo.git.fetch('origin', f'+refs/heads/{self.branch_name}:refs/remotes/origin/{self.branch_name}',
+                            '--depth=1')
+        if not self.working_tree:
+            self.repo.git.reset('--soft', f'origin/{self.branch_name}')
+            self.manifest_sink.reset()
+        else:
+            self._refresh_working_tree(sparse_paths)
+        elapsed = time.perf_counter() - start
+        git_fetch_duration.record(elapsed)
+        self.logger.info(f"Repo refreshed to origin/{self.branch_name} in {elapsed:.3f}s.")
+
+    def _refresh_working_tree(self, sparse_paths: list[str] = None):
+        if sparse_paths is not None:
+            self.repo.git.sparse_checkout('set', '--cone', *sparse_paths)
+        elif self.sparse_paths is not None:
+            self.repo.git.sparse_checkout('disable')
+        self.sparse_paths = sparse_paths
+        self.repo.git.reset('--hard', f'origin/{self.branch_name}')
+        self.repo.git.clean('-fdx')
+
+    def stage_changes(self):
+        if self.working_tree:
+            self.repo.git.add('-A')
+        else:
+            self.manifest_sink.stage()
+
+    def discard_unstaged_changes(self):
+        """Reverts the working copy to the index, dropping whatever was written since the last stage_changes"""
+        if self.working_tree:
+            self.repo.git.checkout('--', '.')
+            self.repo.git.clean('-fd')
+        else:
+            self.manifest_sink.discard()
+
     def commit_and_push(self, commit_msg, branch_name: str = None, user: User = None):
         self.logger.info("Committing and pushing the manifest files to git")
         try:
+            if not self.working_tree:
+                return self._commit_tree_and_push(commit_msg, branch_name, user)
             if self.repo.is_dirty(untracked_files=True):
                 self.repo.config_writer().set_value("user", "name", user.name).release()
                 self.repo.config_writer().set_value("user", "email", user.claims["email"]).release()
                 self.repo.git.add('.')
                 self.repo.git.commit('-m', commit_msg)
-                push_results = self.repo.remotes.origin.push(
-                    refspec=f'refs/heads/{branch_name if branch_name else self.branch_name}')
-
-                for info in push_results:
-                    if info.flags & (info.ERROR | info.REJECTED):
-                        self.logger.error(
-                            f"Error pushing ref {info.local_ref} to {info.remote_ref}")
-                        # ToDo : shouldn't we raise exception here?
-                        return False
-                    else:
-                        self.logger.info(
-                            f"Ref {info.local_ref} was successfully pushed to {info.remote_ref}")
-                self.logger.info("Files committed and pushed successfully.")
+                return self._push(branch_name)
             else:
                 self.logger.info("No changes to commit and push.")
             return True
@@ -93,6 +167,34 @@ class GitManager:
             self.logger.error(f"Error committing and pushing files: {str(ex)}")
             raise ex
 
+    def _commit_tree_and_push(self, commit_msg, branch_name: str = None, user: User = None):
+        """Commits the staged tree of the manifest sink on top of HEAD, the branch ref is moved to the new commit"""
+        tree = self.manifest_sink.write_tree()
+        head_commit = self.repo.head.commit
+        if tree.binsha == head_commit.tree.binsha:
+            self.logger.info("No changes to commit and push.")
+            return True
+        actor = git.Actor(user.name, user.claims["email"])
+        git.Commit.create_from_tree(self.repo, tree, commit_msg, parent_commits=[head_commit], head=True,
+                                    author=actor, committer=actor)
+        return self._push(branch_name)
+
+    def _push(self, branch_name: str = None):
+        push_results = self.repo.remotes.origin.push(
+            refspec=f'refs/heads/{branch_name if branch_name else self.branch_name}')
+
+        for info in push_results:
+            if info.flags & (info.ERROR | info.REJECTED):
+                self.logger.error(
+                    f"Error pushing ref {info.local_ref} to {info.remote_ref}")
+                # ToDo : shouldn't we raise exception here?
+                return False
+            else:
+                self.logger.info(
+                    f"Ref {info.local_ref} was successfully pushed to {info.remote_ref}")
+        self.logger.info("Files committed and pushed successfully.")
+        return True
+
     def create_pull_request(self, feature_branch: str, title: str, description: str):
         try:
             # Extract the organization URL
@@ -156,5 +258,129 @@ class GitManager:
             self.logger.warning("Remote 'origin' does not exist")
 
 
-def initialize_git_manager(repo_url: str, local_folder: str, branch_name: str) -> GitManager:
-    return GitManager(get_git_url(repo_url), local_folder, branch_name)
+def initialize_git_manager(repo_url: str, local_folder: str, branch_name: str,
+                           sparse_paths: list[str] = None, working_tree: bool = True) -> GitManager:
+    return GitManager(get_git_url(repo_url), local_folder, branch_name, sparse_paths, working_tree)
+
+
+class WarmGitWorkspace:
+    """Long-lived working copy of the manifest repository shared by the whole process. The copy is cloned once and
+    refreshed (fetch + hard reset) before each use. If refreshing fails, e.g. because the copy got corrupted, it is
+    thrown away and cloned again. Only one request can use the copy at a time, hence the lock"""
+
+    def __init__(self, repo_url: str, local_folder: str, branch_name: str, working_tree: bool = True):
+        self.repo_url = repo_url
+        self.local_folder = local_folder
+        self.branch_name = branch_name
+        self.working_tree = working_tree
+        self.git_manager = None
+        self.lock = asyncio.Lock()
+
+    def checkout(self, sparse_paths: list[str] = None) -> GitManager:
+        if self.git_manager is not None:
+            try:
+                self.git_manager.refresh(sparse_paths)
+                return self.git_manager
+            except Exception as ex:
+                log.warning(f"Unable to refresh warm clone at {self.local_folder}, cloning again: {ex}")
+                self.git_manager = None
+        if os.path.exists(self.local_folder):
+            shutil.rmtree(self.local_folder, ignore_errors=True)
+        self.git_manager = initialize_git_manager(self.repo_url, self.local_folder, self.branch_name, sparse_paths,
+                                                  self.working_tree)
+        return self.git_manager
+
+
+_warm_workspaces: dict[tuple[str, str, bool], WarmGitWorkspace] = {}
+
+
+def get_warm_workspace(repo_url: str, branch_name: str, working_tree: bool = True) -> WarmGitWorkspace:
+    key = (repo_url, branch_name, working_tree)
+    workspace = _warm_workspaces.get(key)
+    if workspace is None:
+        local_folder = os.path.join(settings.GIT_WARM_CLONE_DIRECTORY,
+                                    hashlib.sha1(f"{repo_url}#{branch_name}#{working_tree}".encode()).hexdigest()[:12])
+        workspace = _warm_workspaces.setdefault(key, WarmGitWorkspace(repo_url, local_folder, branch_name, working_tree))
+    return workspace
+
+
+class GitExecutor:
+    """Bounded thread pool for blocking GitPython calls (clone, pull, commit, push), so that git I/O never runs on
+    the event loop and other requests served by the worker are not stalled"""
+
+    def __init__(self, max_workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="git")
+        # Incremented on the event loop and decremented on the executor threads
+        self.queue_depth = 0
+        self.queue_depth_lock = threading.Lock()
+
+    async def run(self, fn, *args, **kwargs):
+        submitted_at = time.perf_counter()
+        with self.queue_depth_lock:
+            self.queue_depth += 1
+        git_executor_queue_depth.add(1)
+
+        def started(*fn_args, **fn_kwargs):
+            with self.queue_depth_lock:
+                self.queue_depth -= 1
+            git_executor_queue_depth.add(-1)
+            git_executor_wait_time.record(time.perf_counter() - submitted_at)
+            return fn(*fn_args, **fn_kwargs)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor,
+                                                                functools.partial(started, *args, **kwargs))
+
+
+_git_executor = None
+
+
+def get_git_executor() -> GitExecutor:
+    global _git_executor
+    if _git_executor is None:
+        _git_executor = GitExecutor(settings.GIT_EXECUTOR_MAX_WORKERS)
+    return _git_executor
+
+
+class AsyncGitManager:
+    """Async facade of GitManager, each call runs on the git executor"""
+
+    def __init__(self, git_manager: GitManager, executor: GitExecutor):
+        self.git_manager = git_manager
+        self.local_folder = git_manager.local_folder
+        self.executor = executor
+
+    def manifest_writer(self, template: Template, render_pool: TemplateRenderPool = None) -> ManifestWriter:
+        """Template to hand to the manifest operations, what it renders ends up in this working copy's sink"""
+        return ManifestWriter(template, self.git_manager.manifest_sink, render_pool)
+
+    async def stage_changes(self):
+        return await self.executor.run(self.git_manager.stage_changes)
+
+    async def discard_unstaged_changes(self):
+        return await self.executor.run(self.git_manager.discard_unstaged_changes)
+
+    async def commit_and_push(self, commit_msg, branch_name: str = None, user: User = None) -> bool:
+        return await self.executor.run(self.git_manager.commit_and_push, commit_msg, branch_name, user)
+
+
+@asynccontextmanager
+async def manifest_workspace(repo_url: str, branch_name: str, sparse_paths: list[str] = None):
+    """Yields an AsyncGitManager whose working copy is up to date with origin. With GIT_WARM_CLONE_ENABLED this is
+    the process wide warm clone, otherwise a fresh clone in a temporary directory that is removed afterwards.
+    With GIT_SPARSE_CHECKOUT_ENABLED only sparse_paths are checked out. With MANIFEST_SINK "git" there is no working
+    tree, manifests are written into git objects"""
+    executor = get_git_executor()
+    working_tree = settings.MANIFEST_SINK != "git"
+    if not settings.GIT_SPARSE_CHECKOUT_ENABLED or not working_tree:
+        sparse_paths = None
+    if settings.GIT_WARM_CLONE_ENABLED:
+        workspace = get_warm_workspace(repo_url, branch_name, working_tree)
+        async with workspace.lock:
+            yield AsyncGitManager(await executor.run(workspace.checkout, sparse_paths), executor)
+    else:
+        local_folder = tempfile.mkdtemp()
+        try:
+            yield AsyncGitManager(await executor.run(initialize_git_manager, repo_url, local_folder, branch_name,
+                                                     sparse_paths, working_tree), executor)
+        finally:
+            await executor.run(shutil.rmtree, local_folder, ignore_errors=True)
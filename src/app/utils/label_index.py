@@ -0,0 +1,115 @@
+from collections import defaultdict
+from logging import getLogger
+from typing import Any, Iterable
+
+log = getLogger(__name__)
+
+
+class LabelIndex:
+    """In-memory inverted index of metadata labels, key=value -> ids of the documents carrying the label.
+
+    Selectors are answered with set operations instead of a query. Every key of the selector has to match, a value
+    may list alternatives separated by comma (the $in form of create_filter_condition). The index is only kept up to
+    date with writes of this process, so it must not be used when several processes write to the database"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.documents: dict[str, Any] = {}
+        self.postings: dict[tuple[str, str], set[str]] = defaultdict(set)
+        self.ready = False
+
+    def build(self, documents: Iterable[Any]):
+        self.documents = {}
+        self.postings = defaultdict(set)
+        for document in documents:
+            self._add(document)
+        self.ready = True
+        log.info(f"Built {self.name} label index of {len(self.documents)} documents and {len(self.postings)} labels")
+
+    def add(self, document: Any):
+        """Adds or replaces the document, ignored until the index is built"""
+        if self.ready:
+            self._add(document)
+
+    def _add(self, document: Any):
+        previous = self.documents.get(document.id)
+        if previous is not None:
+            for label in (previous.metadata or {}).items():
+                self.postings[label].discard(document.id)
+        self.documents[document.id] = document.copy(deep=True)
+        for label in (document.metadata or {}).items():
+            self.postings[label].add(document.id)
+
+    def match(self, selector: dict) -> list:
+        """Returns copies of the documents matching all labels of the selector, in the order they were added"""
+        matched_ids = None
+        for key, value in selector.items():
+            values = value if isinstance(value, (list, tuple)) else str(value).split(",")
+            ids = set().union(*(self.postings.get((key, item), set()) for item in values))
+            matched_ids = ids if matched_ids is None else matched_ids & ids
+            if not matched_ids:
+                return []
+        if matched_ids is None:
+            return []
+        return [document.copy(deep=True) for document_id, document in self.documents.items()
+                if document_id in matched_ids]
+
+    def match_any(self, selectors: list[dict]) -> list:
+        """Returns copies of the documents matching any of the selectors, in the order they were added"""
+        matched_ids = {document.id for selector in selectors for document in self.match(selector)}
+        return [document.copy(deep=True) for document_id, document in self.documents.items()
+                if document_id in matched_ids]
+
+
+class TargetPolicyIndex:
+    """In-memory reverse index of target policy selectors, selector key=value -> ids of the policies, kept separately
+    for app_selector and cluster_selector. Finds the policies whose whole selector is satisfied by the metadata of
+    an application or cluster in one pass over the metadata. Like LabelIndex it only sees writes of this process"""
+
+    selector_fields = ("app_selector", "cluster_selector")
+
+    def __init__(self):
+        self.policies: dict[str, Any] = {}
+        self.postings: dict[str, dict[tuple[str, str], set[str]]] = {}
+        self.ready = False
+
+    def build(self, policies: Iterable[Any]):
+        self.policies = {}
+        self.postings = {selector_field: defaultdict(set) for selector_field in self.selector_fields}
+        for policy in policies:
+            self._add(policy)
+        self.ready = True
+        log.info(f"Built target policy index of {len(self.policies)} policies")
+
+    def add(self, policy: Any):
+        """Adds or replaces the policy, ignored until the index is built"""
+        if self.ready:
+            self._add(policy)
+
+    def _add(self, policy: Any):
+        previous = self.policies.get(policy.id)
+        for selector_field in self.selector_fields:
+            if previous is not None:
+                for label in (getattr(previous, selector_field) or {}).items():
+                    self.postings[selector_field][label].discard(policy.id)
+            for label in (getattr(policy, selector_field) or {}).items():
+                self.postings[selector_field][label].add(policy.id)
+        self.policies[policy.id] = policy.copy(deep=True)
+
+    def match(self, metadata: dict, selector_field: str) -> list:
+        """Returns copies of the policies whose selector_field is not empty and has only labels found in metadata,
+        sorted by updated_on"""
+        hits: dict[str, int] = defaultdict(int)
+        postings = self.postings[selector_field]
+        for label in metadata.items():
+            for policy_id in postings.get(label, ()):
+                hits[policy_id] += 1
+        matched = [self.policies[policy_id] for policy_id, count in hits.items()
+                   if count == len(getattr(self.policies[policy_id], selector_field))]
+        matched.sort(key=lambda policy: policy.updated_on)
+        return [policy.copy(deep=True) for policy in matched]
+
+
+cluster_label_index = LabelIndex("cluster")
+application_label_index = LabelIndex("application")
+target_policy_index = TargetPolicyIndex()
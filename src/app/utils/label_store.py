@@ -0,0 +1,69 @@
+from logging import getLogger
+from typing import Any, Sequence
+
+import numpy as np
+
+log = getLogger(__name__)
+
+
+class ColumnarLabelStore:
+    """Metadata labels of a set of documents stored by column. Every metadata key is dictionary encoded: its values get
+    an integer code and the key becomes an array with the code of each document, MISSING where the document has no
+    such label. A selector is then evaluated for all documents at once as a boolean mask, with the semantics of
+    create_filter_condition (every key has to match, a value may list alternatives separated by comma)"""
+
+    MISSING = -1
+
+    def __init__(self, documents: Sequence[Any]):
+        self.documents = list(documents)
+        self.dictionaries: dict[str, dict[str, int]] = {}
+        self.columns: dict[str, np.ndarray] = {}
+        rows: dict[str, list[int]] = {}
+        codes: dict[str, list[int]] = {}
+        for row, document in enumerate(self.documents):
+            for key, value in (document.metadata or {}).items():
+                dictionary = self.dictionaries.setdefault(key, {})
+                rows.setdefault(key, []).append(row)
+                codes.setdefault(key, []).append(dictionary.setdefault(value, len(dictionary)))
+        for key in self.dictionaries:
+            column = np.full(len(self.documents), self.MISSING, dtype=np.int32)
+            column[rows[key]] = codes[key]
+            self.columns[key] = column
+        log.debug(f"Built label store of {len(self.documents)} documents and {len(self.columns)} keys")
+
+    def __len__(self):
+        return len(self.documents)
+
+    def has_label(self, key: str) -> np.ndarray:
+        """Mask of the documents that have the key in their metadata"""
+        column = self.columns.get(key)
+        if column is None:
+            return np.zeros(len(self.documents), dtype=bool)
+        return column != self.MISSING
+
+    def isin(self, key: str, values) -> np.ndarray:
+        """Mask of the documents whose label key has one of the values"""
+        column = self.columns.get(key)
+        if column is None:
+            return np.zeros(len(self.documents), dtype=bool)
+        dictionary = self.dictionaries[key]
+        value_codes = [dictionary[value] for value in values if value in dictionary]
+        if not value_codes:
+            return np.zeros(len(self.documents), dtype=bool)
+        if len(value_codes) == 1:
+            return column == value_codes[0]
+        return np.isin(column, value_codes)
+
+    def mask(self, selector: dict) -> np.ndarray:
+        """Mask of the documents matching all labels of the selector"""
+        mask = np.ones(len(self.documents), dtype=bool)
+        for key, value in selector.items():
+            mask &= self.isin(key, value if isinstance(value, (list, tuple)) else str(value).split(","))
+        return mask
+
+    def select(self, mask: np.ndarray) -> list:
+        """Documents of the mask, in the order they were given"""
+        return [self.documents[row] for row in np.flatnonzero(mask)]
+
+    def match(self, selector: dict) -> list:
+        return self.select(self.mask(selector))
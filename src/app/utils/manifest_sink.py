@@ -0,0 +1,224 @@
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from io import BytesIO
+from logging import getLogger
+from typing import Awaitable, Callable
+
+import git
+from git import IndexFile
+from git.index.typ import BaseIndexEntry, IndexEntry
+from gitdb import IStream
+
+from app.utils.template import Template, TemplateRenderPool
+
+log = getLogger(__name__)
+
+# Mode of regular, non executable files in a git tree
+BLOB_FILE_MODE = 0o100644
+
+
+def git_blob_id(data: bytes) -> str:
+    """Id git gives to a blob with the given content"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class ManifestSink(ABC):
+    """Destination of rendered manifests. Paths are the same absolute paths the manifest operations build below the
+    local folder of the manifest repository"""
+
+    @abstractmethod
+    def write(self, path: str, content: str) -> bool:
+        pass
+
+    @abstractmethod
+    def exists(self, path: str) -> bool:
+        pass
+
+    @abstractmethod
+    def remove(self, path: str):
+        pass
+
+    @abstractmethod
+    def blob_id(self, path: str) -> str | None:
+        """Git blob id of the current content at path, None if there is nothing"""
+
+
+class FileSystemManifestSink(ManifestSink):
+    """Writes manifests into the working tree, they are picked up by git add when the change is staged"""
+
+    def write(self, path: str, content: str) -> bool:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(path, "w") as f:
+                return f.write(content) > 0
+        except Exception:
+            return False
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def remove(self, path: str):
+        os.remove(path)
+
+    def blob_id(self, path: str) -> str | None:
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            return git_blob_id(f.read())
+
+
+class GitObjectManifestSink(ManifestSink):
+    """Writes manifests straight into the object database of the repository, no working tree is involved.
+
+    Every write stores a blob and records it as pending. stage() moves the pending entries into an in-memory index
+    that starts from HEAD, discard() drops them. write_tree() turns the index into a tree that can be committed. This
+    skips the file writes and the full tree scan of git add, which dominate for policies fanning out to thousands of
+    applications"""
+
+    def __init__(self, repo: git.Repo, root: str):
+        self.repo = repo
+        self.root = root
+        self.index = None
+        self.pending: dict[str, bytes | None] = {}
+        self.reset()
+
+    def reset(self):
+        """Starts over from the tree of HEAD"""
+        self.index = IndexFile.from_tree(self.repo, self.repo.head.commit)
+        self.pending = {}
+
+    def _repo_path(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def write(self, path: str, content: str) -> bool:
+        data = content.encode()
+        istream = self.repo.odb.store(IStream(git.Blob.type, len(data), BytesIO(data)))
+        self.pending[self._repo_path(path)] = istream.binsha
+        return len(data) > 0
+
+    def exists(self, path: str) -> bool:
+        repo_path = self._repo_path(path)
+        if repo_path in self.pending:
+            return self.pending[repo_path] is not None
+        return (repo_path, 0) in self.index.entries
+
+    def remove(self, path: str):
+        if not self.exists(path):
+            raise FileNotFoundError(path)
+        self.pending[self._repo_path(path)] = None
+
+    def blob_id(self, path: str) -> str | None:
+        repo_path = self._repo_path(path)
+        if repo_path in self.pending:
+            binsha = self.pending[repo_path]
+        else:
+            entry = self.index.entries.get((repo_path, 0))
+            binsha = entry.binsha if entry is not None else None
+        return binsha.hex() if binsha is not None else None
+
+    def stage(self):
+        for repo_path, binsha in self.pending.items():
+            if binsha is None:
+                self.index.entries.pop((repo_path, 0), None)
+            else:
+                self.index.entries[(repo_path, 0)] = IndexEntry.from_base(
+                    BaseIndexEntry((BLOB_FILE_MODE, binsha, 0, repo_path)))
+        self.pending = {}
+
+    def discard(self):
+        self.pending = {}
+
+    def write_tree(self) -> git.Tree:
+        return self.index.write_tree()
+
+
+class _PendingRender:
+    def __init__(self, template_name: str, path: str, render_data: dict, on_rendered: Callable[[str], None] = None):
+        self.template_name = template_name
+        self.path = path
+        self.render_data = render_data
+        self.on_rendered = on_rendered
+
+
+class ManifestWriter(Template):
+    """Template that hands what it renders to a ManifestSink instead of writing files itself, so the manifest
+    operations work the same whichever sink is in use.
+
+    With a render pool rendering is deferred: submitted manifests are collected in render jobs (one per cluster, see
+    start_render_job) and rendered in parallel by flush(). Work that depends on the rendered manifests is registered
+    with after_render and runs at the end of flush(). Without a render pool everything happens right away"""
+
+    def __init__(self, template: Template, sink: ManifestSink, render_pool: TemplateRenderPool = None):
+        self.template = template
+        self.sink = sink
+        self.render_pool = render_pool
+        self.render_jobs: list[list[_PendingRender]] = []
+        self.after_render_callbacks: list[Callable[[], Awaitable]] = []
+
+    def render_to_string(self, template_name, render_data) -> str:
+        return self.template.render_to_string(template_name, render_data)
+
+    def render(self, template_name, output_folder, output_file, render_data, create_out_folder=True) -> bool:
+        return self.submit(template_name, os.path.join(output_folder, output_file), render_data)
+
+    def submit(self, template_name: str, path: str, render_data: dict,
+               on_rendered: Callable[[str], None] = None) -> bool:
+        """Renders the template to path, on_rendered gets the rendered content once it is written"""
+        pending = _PendingRender(template_name, path, render_data, on_rendered)
+        if self.render_pool is None:
+            return self._write(pending, self.render_to_string(template_name, render_data))
+        if not self.render_jobs:
+            self.start_render_job()
+        self.render_jobs[-1].append(pending)
+        return True
+
+    def start_render_job(self):
+        """Manifests submitted from now on are rendered together, in one job"""
+        if self.render_pool is not None and (not self.render_jobs or self.render_jobs[-1]):
+            self.render_jobs.append([])
+
+    async def after_render(self, callback: Callable[[], Awaitable]) -> bool:
+        """Runs callback once the manifests submitted so far are written, it fails the flush if it returns nothing"""
+        if self.render_pool is None:
+            return bool(await callback())
+        self.after_render_callbacks.append(callback)
+        return True
+
+    async def flush(self) -> bool:
+        """Renders and writes the deferred manifests, then runs the after_render callbacks. Fails if a manifest could
+        not be written, like submit does without a render pool"""
+        jobs = [job for job in self.render_jobs if job]
+        callbacks = self.after_render_callbacks
+        self.render_jobs, self.after_render_callbacks = [], []
+        success = True
+        if jobs:
+            rendered_jobs = await self.render_pool.render(
+                [[(pending.template_name, pending.render_data) for pending in job] for job in jobs])
+            for job, rendered in zip(jobs, rendered_jobs):
+                for pending, output in zip(job, rendered):
+                    if not self._write(pending, output):
+                        log.warning(f"Unable to write manifest {pending.path}")
+                        success = False
+        for callback in callbacks:
+            success = bool(await callback()) and success
+        return success
+
+    def _write(self, pending: _PendingRender, output: str) -> bool:
+        if not self.write(pending.path, output):
+            return False
+        if pending.on_rendered is not None:
+            pending.on_rendered(output)
+        return True
+
+    def write(self, path: str, content: str) -> bool:
+        return self.sink.write(path, content)
+
+    def exists(self, path: str) -> bool:
+        return self.sink.exists(path)
+
+    def remove(self, path: str):
+        self.sink.remove(path)
+
+    def blob_id(self, path: str) -> str | None:
+        return self.sink.blob_id(path)
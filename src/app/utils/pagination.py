@@ -0,0 +1,43 @@
+import base64
+import binascii
+from typing import List, Optional, Tuple, Type
+
+from beanie.odm.queries.find import FindMany
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+
+def encode_cursor(last_id: str) -> str:
+    """Opaque cursor pointing after the document with the given id"""
+    return base64.urlsafe_b64encode(last_id.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid cursor {cursor}")
+
+
+async def find_page(find_query: FindMany, limit: int, cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    """Keyset pagination over _id: the next limit documents of find_query after cursor, and the cursor of the page
+    that follows them, None when there is none. Unlike skip, the cost of a page does not grow with its position"""
+    if cursor is not None:
+        find_query = find_query.find({"_id": {"$gt": decode_cursor(cursor)}})
+    return _page(await find_query.sort("_id").limit(limit + 1).to_list(), limit)
+
+
+async def aggregate_page(find_query: FindMany, pipeline: List[dict], limit: int, cursor: Optional[str] = None,
+                         projection_model: Type[BaseModel] = None) -> Tuple[list, Optional[str]]:
+    """Same as find_page for an aggregation of the documents of find_query. The pipeline gets them in _id order and
+    the page is cut from its output, so a pipeline filtering documents out does not shorten the page"""
+    after_cursor = [{"$match": {"_id": {"$gt": decode_cursor(cursor)}}}] if cursor is not None else []
+    pipeline = [*after_cursor, {"$sort": {"_id": 1}}, *pipeline, {"$limit": limit + 1}]
+    return _page(await find_query.aggregate(pipeline, projection_model=projection_model).to_list(), limit)
+
+
+def _page(documents: list, limit: int) -> Tuple[list, Optional[str]]:
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(documents[-1].id)
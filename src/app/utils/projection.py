@@ -0,0 +1,37 @@
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, create_model
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Comma separated fields of a sparse fieldset, e.g. "name,environment,metadata.region", None for all fields"""
+    if not fields:
+        return None
+    return tuple(sorted({field.strip() for field in fields.split(",") if field.strip()}))
+
+
+@lru_cache()
+def projection_model(response_model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Beanie projection model reading only fields, a key of a dict field such as metadata.region only reads that key.
+    The id is always read"""
+    model_fields = {}
+    projection = {"_id": 1}
+    for field in fields:
+        name = field.split(".", 1)[0]
+        if name != field and name in fields:
+            continue
+        model_field = response_model.__fields__.get(name)
+        if model_field is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Unknown field {field}, fields are {', '.join(response_model.__fields__)}")
+        model_fields[name] = (model_field.outer_type_, model_field.field_info)
+        projection[model_field.alias if name == field else field] = 1
+    id_field = response_model.__fields__["id"]
+    model_fields.setdefault("id", (id_field.outer_type_, id_field.field_info))
+
+    model = create_model(f"{response_model.__name__}Projection", __config__=response_model.__config__,
+                         **model_fields)
+    model.Settings = type("Settings", (), {"projection": projection})
+    return model
@@ -0,0 +1,34 @@
+from typing import AsyncIterable, AsyncIterator, List, Optional, TypeVar
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+T = TypeVar("T")
+
+
+def accepts_ndjson(accept: Optional[str]) -> bool:
+    return accept is not None and NDJSON_MEDIA_TYPE in accept
+
+
+async def batched(items: AsyncIterable[T], size: int) -> AsyncIterator[List[T]]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _ndjson_lines(batches: AsyncIterable[List[BaseModel]]) -> AsyncIterator[str]:
+    async for batch in batches:
+        yield "".join(f"{item.json(by_alias=False, exclude_none=True)}\n" for item in batch)
+
+
+def ndjson_response(batches: AsyncIterable[List[BaseModel]]) -> StreamingResponse:
+    """One JSON document per line, written a batch at a time while the batches are read, so that only one batch is
+    held in memory whatever the number of documents"""
+    return StreamingResponse(_ndjson_lines(batches), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,80 @@
+"""Compares the per document and the numpy evaluation of the cluster selectors and purge policies of a deployment,
+database access left out.
+
+Run from the src folder: python -m benchmarks.selector_engine [clusters ...]
+"""
+import asyncio
+import random
+import sys
+import timeit
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.models.clusters import Cluster
+from app.core.models.targetpolicies import TargetPolicy
+from app.core.services.purge_policies import ApplyOnceCronologicalOrderedPurgePolicy, \
+    CompiledApplyOnceCronologicalOrderedPurgePolicy
+from app.utils.common import matches_selector
+from app.utils.enums import Operation
+from app.utils.label_store import ColumnarLabelStore
+
+REGIONS = [f"region{i}" for i in range(20)]
+TIERS = ["gold", "silver", "bronze"]
+
+
+def clusters(count: int, rng: random.Random) -> list[Cluster]:
+    return [Cluster(_id=f"c{i}", name=f"cluster{i}", environment="dev",
+                    metadata={"name": f"cluster{i}", "region": rng.choice(REGIONS), "tier": rng.choice(TIERS),
+                              "zone": f"zone{rng.randint(0, 99)}"})
+            for i in range(count)]
+
+
+def policies(rng: random.Random, operation: Operation, count: int, updated_on: float) -> list[TargetPolicy]:
+    return [TargetPolicy(_id=f"{operation.value}{i}", name=f"{operation.value}{i}", operation=operation,
+                         updated_on=updated_on, app_selector={"tier": "gold"},
+                         cluster_selector={"region": ",".join(rng.sample(REGIONS, 3)), "tier": rng.choice(TIERS)})
+            for i in range(count)]
+
+
+def per_document(evaluator, fleet, create_policies, purge_policies):
+    already_evaluate_purged_policies = []
+    return [evaluator.filter_purged(
+        metadata_based_resources=[cluster for cluster in fleet if matches_selector(cluster.metadata,
+                                                                                   policy.cluster_selector)],
+        purge_policies=purge_policies, policy_under_evaluation=policy,
+        already_evaluate_purged_policies=already_evaluate_purged_policies) for policy in create_policies]
+
+
+def vectorized(fleet, create_policies, purge_policies):
+    store = ColumnarLabelStore(fleet)
+    evaluator = CompiledApplyOnceCronologicalOrderedPurgePolicy()
+    already_evaluate_purged_policies = []
+    return [store.select(evaluator.filter_purged_mask(store, store.mask(policy.cluster_selector), purge_policies,
+                                                      policy, "cluster_selector", already_evaluate_purged_policies))
+            for policy in create_policies]
+
+
+def main(sizes: list[int]):
+    asyncio.run(init_beanie(database=AsyncMongoMockClient().get_database(name="benchmark"),
+                            document_models=[Cluster, TargetPolicy]))
+    rng = random.Random(1)
+    create_policies = policies(rng, Operation.CREATE, 10, 1.0)
+    purge_policies = set(policies(rng, Operation.PURGE, 30, 2.0))
+    for size in sizes:
+        fleet = clusters(size, rng)
+        candidates = {"reference": lambda: per_document(ApplyOnceCronologicalOrderedPurgePolicy(), fleet,
+                                                        create_policies, purge_policies),
+                      "compiled": lambda: per_document(CompiledApplyOnceCronologicalOrderedPurgePolicy(), fleet,
+                                                       create_policies, purge_policies),
+                      "numpy": lambda: vectorized(fleet, create_policies, purge_policies)}
+        if size > 10000:
+            # Deep copies a policy per cluster and purge policy, minutes at this size
+            del candidates["reference"]
+        for name, candidate in candidates.items():
+            elapsed = min(timeit.repeat(candidate, number=1, repeat=3))
+            print(f"{size:>7} clusters {name:>9}: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 100000])
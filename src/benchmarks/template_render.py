@@ -0,0 +1,42 @@
+"""Compares the jinja and native renderers of the ArgoCD Application manifest.
+
+Run from the src folder: python -m benchmarks.template_render [pairs]
+"""
+import os
+import sys
+import timeit
+
+from app.core.schemas.applications import ApplicationResponse
+from app.core.schemas.clusters import ClusterResponse
+from app.utils.constants import TEMPLATES_BASE_PATH, ARGOCD_APPLICATION_TEMPLATE_NAME
+from app.utils.manifest import prepare_consumer_application_data
+from app.utils.template import TemplateFactory
+
+template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../app/templates')
+template_name = f"{TEMPLATES_BASE_PATH}/{ARGOCD_APPLICATION_TEMPLATE_NAME}"
+
+
+def render_data(pairs: int) -> list[dict]:
+    """Render data of pairs app x cluster combinations"""
+    data = []
+    for i in range(pairs):
+        application = ApplicationResponse(_id=f"a{i}", name=f"app{i % 100}", repo_url="https://github.com/org/repo.git",
+                                          repo_branch="main", repo_path=f"apps/app{i % 100}", namespace="apps")
+        cluster = ClusterResponse(_id=f"c{i}", name=f"cluster{i // 100}", environment="dev")
+        data.append(prepare_consumer_application_data(application, cluster, "tp1"))
+    return data
+
+
+def main(pairs: int):
+    data = render_data(pairs)
+    for template_type in ("jinja", "native"):
+        template = TemplateFactory.create_template(template_type, template_dir)
+        template.render_to_string(template_name, data[0])
+        elapsed = min(timeit.repeat(lambda: [template.render_to_string(template_name, item) for item in data],
+                                    number=1, repeat=5))
+        print(f"{template_type:>6}: {pairs} manifests in {elapsed * 1000:.1f} ms, "
+              f"{elapsed / pairs * 1e6:.2f} us per manifest")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -69,6 +69,31 @@ Feature: Cluster Management
     When I hit the v1/clusters to get all cluster
     Then There should be 0 items in response
 
+  Scenario: Get clusters page by page
+    Given I am part of below groups
+      | group                  |
+      | plat-pagedcluster-admin |
+    When I hit the v1/clusters to create a cluster with below data
+      | name          | short_name | metadata.label | environment  |
+      | pagedcluster1 | mc         | pagedcluster1  | pagedcluster |
+      | pagedcluster2 | mc         | pagedcluster2  | pagedcluster |
+      | pagedcluster3 | mc         | pagedcluster3  | pagedcluster |
+    And I page through the v1/clusters 2 at a time
+    Then There should be 2 pages holding the names below
+      | name          |
+      | pagedcluster1 |
+      | pagedcluster2 |
+      | pagedcluster3 |
+    When I hit the v1/clusters?fields=name,metadata.label to get all cluster
+    Then There should be 3 items in response
+    And The items should only have the fields id,name,metadata.label
+    When I stream the v1/clusters as NDJSON
+    Then There should be 1 pages holding the names below
+      | name          |
+      | pagedcluster1 |
+      | pagedcluster2 |
+      | pagedcluster3 |
+
   Scenario: Get single clusters scenario
     Given I am part of below groups
       | group              |
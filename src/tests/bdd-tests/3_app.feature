@@ -117,6 +117,12 @@ Feature: App Management
       | items.0.name   | myapp  |
       | items.1.name   | myapp2 |
       | items.2.name   | myapp3 |
+    When I stream the v1/applications as NDJSON
+    Then There should be 1 pages holding the names below
+      | name   |
+      | myapp  |
+      | myapp2 |
+      | myapp3 |
 
   Scenario: Find Application by id with user
     Given I am part of below groups
@@ -9,6 +9,7 @@ import tests.common.common
 from app.core.config import get_settings
 from app.utils import git_handler
 from app.utils.git_handler import GitManager
+from app.utils.manifest_sink import FileSystemManifestSink
 from tests.common.common import temp_dir_name, commit_dir_path, delete_temp_on_exit
 from tests.steps import utils
 
@@ -61,9 +62,10 @@ def before_all(context):
 
 
 class FakeGitManager(GitManager):
-    def __init__(self, repo_url, local_folder, branch_name):
+    def __init__(self, repo_url, local_folder, branch_name, sparse_paths=None, working_tree=True):
         self.local_folder = local_folder
         self.repo = None
+        self.manifest_sink = FileSystemManifestSink()
         self.checkout()
 
     def clone_repo(self):
@@ -80,9 +82,17 @@ class FakeGitManager(GitManager):
         shutil.copytree(self.local_folder, commit_dir_path)
         return True
 
+    def stage_changes(self):
+        pass
+
+    def discard_unstaged_changes(self):
+        pass
+
     def create_pull_request(self, feature_branch: str, title: str, description: str):
         pass
 
 
 if not is_running_end_to_end:
     git_handler.GitManager = FakeGitManager
+    # FakeGitManager starts every request from checkout_dir_path, a long-lived working copy would leak files between scenarios
+    settings.GIT_WARM_CLONE_ENABLED = False
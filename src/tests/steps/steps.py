@@ -38,10 +38,48 @@ setting = get_settings()
 def step_impl(context, endpoint, model_type):
     file_path, final_url = get_url_and_file_path(endpoint)
     c_headers = context.c_headers
+    final_url += f"{'&' if '?' in final_url else '?'}unpaginated=true"
     response = run_in_client(execute_get, c_headers, final_url)
     context.resp = response
 
 
+@step("I page through the {endpoint} {limit:d} at a time")
+def step_impl(context, endpoint, limit):
+    file_path, final_url = get_url_and_file_path(endpoint)
+    context.pages = []
+    cursor = None
+    while True:
+        page_url = f"{final_url}?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        response = run_in_client(execute_get, context.c_headers, page_url)
+        assert response.status_code == 200, response.text
+        context.pages.append([item["name"] for item in response.json()["items"]])
+        cursor = response.json().get("next_cursor")
+        if cursor is None:
+            break
+
+
+@then("The items should only have the fields {fields}")
+def step_impl(context, fields):
+    for item in context.resp.json()["items"]:
+        assert set(utils.flatten_object(item)) == set(fields.split(",")), "Got {}".format(item)
+
+
+@step("I stream the {endpoint} as NDJSON")
+def step_impl(context, endpoint):
+    file_path, final_url = get_url_and_file_path(endpoint)
+    response = run_in_client(execute_get, {**context.c_headers, "Accept": "application/x-ndjson"}, final_url)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    context.pages = [[json.loads(line)["name"] for line in response.text.splitlines()]]
+
+
+@then("There should be {number_of_pages:d} pages holding the names below")
+def step_impl(context, number_of_pages):
+    assert len(context.pages) == number_of_pages, "Expected {} pages, got {}".format(number_of_pages, context.pages)
+    names = [name for page in context.pages for name in page]
+    assert sorted(names) == sorted(row["name"] for row in context.table), "Got {}".format(names)
+
+
 @step("I have a pipeline access token")
 def step_impl(context):
     """